@@ -5,9 +5,6 @@ import threading
 from flask import Flask, redirect, url_for,render_template
 from extensions import db
 from config import Config
-from routes import api  # 🔥 이 줄 추가
-from routes import auth, dashboard, video
-from sockets.ws_server import start_ws_server  # ✅ WS 서버 스타터 import
 import time
 
 APP_BOOT_ID = str(int(time.time()))  # 서버 프로세스 시작 시각
@@ -33,15 +30,25 @@ def yolo_debug_page():
 
 
 # 블루프린트 등록
-app.register_blueprint(auth.bp)
-app.register_blueprint(dashboard.bp)
-app.register_blueprint(video.bp)
-app.register_blueprint(api.bp)  # 🔥 이 줄 추가
+# spawn 자식 프로세스(ingest 워커 / 경로 분석 풀)는 이 파일을 __mp_main__ 으로 다시 실행함
+# → 거기선 블루프린트(ws_server → YOLO·torch·S3 까지 import)를 건너뜀
+#   (ingest 워커는 sockets.ingest_worker 에서 from app import app 으로 따로 로드)
+if __name__ != "__mp_main__":
+    from routes import api  # 🔥 이 줄 추가
+    from routes import auth, dashboard, video, metrics
+
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(dashboard.bp)
+    app.register_blueprint(video.bp)
+    app.register_blueprint(api.bp)  # 🔥 이 줄 추가
+    app.register_blueprint(metrics.bp)
 
 def run_ws():
     """
     WebSocket 서버를 Flask 앱 컨텍스트 안에서 실행
     """
+    from sockets.ws_server import start_ws_server  # ✅ WS 서버 스타터 import
+
     with app.app_context():
         start_ws_server()
 
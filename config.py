@@ -7,3 +7,35 @@ class Config:
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(basedir, "test.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # --- WebSocket 서버 ---
+    WS_HOST = "0.0.0.0"
+    WS_PORT = int(os.environ.get("WS_PORT", "5000"))
+    # 0 이면 단일 프로세스, N 이면 차량별로 샤딩된 ingest 워커 프로세스 N개 (워커 i 포트 = WS_PORT+1+i)
+    WS_INGEST_WORKERS = int(os.environ.get("WS_INGEST_WORKERS", "0"))
+    WS_BRIDGE_SOCKET = os.environ.get("WS_BRIDGE_SOCKET", "/tmp/capstone_ws_bridge.sock")
+    # ingest 워커가 허브로 지표 / 클라이언트 통계를 보내는 주기 (초, 허브 /metrics 에 worker 라벨로 합쳐짐)
+    WS_WORKER_METRICS_INTERVAL = float(os.environ.get("WS_WORKER_METRICS_INTERVAL", "5"))
+
+    # --- 경로 분석 ---
+    # route 수신 시 교차로 분석을 돌릴 프로세스 수 (0 이면 프로세스 대신 전용 스레드 1개)
+    ROUTE_ANALYSIS_WORKERS = int(os.environ.get("ROUTE_ANALYSIS_WORKERS", "1"))
+
+    # --- YOLO ---
+    # 한 번에 추론할 최대 프레임 수 (여러 차량 프레임을 묶음, 1 이면 배치 없음)
+    YOLO_BATCH_SIZE = int(os.environ.get("YOLO_BATCH_SIZE", "4"))
+    # 배치를 채우려고 첫 프레임 이후 기다리는 최대 시간 (ms)
+    YOLO_BATCH_WAIT_MS = float(os.environ.get("YOLO_BATCH_WAIT_MS", "10"))
+    # 추론 워커 스레드 수 (워커마다 모델 1개, 차량은 워커 하나에 고정)
+    YOLO_WORKERS = int(os.environ.get("YOLO_WORKERS", "1"))
+    # 차량별 tracker 설정 (ultralytics tracker yaml: botsort.yaml / bytetrack.yaml)
+    YOLO_TRACKER = os.environ.get("YOLO_TRACKER", "botsort.yaml")
+    # 가중치 / 추론 백엔드 (torch / onnx / openvino — GPU 없는 서버는 onnx·openvino 권장)
+    # onnx / openvino 는 requirements-cpu.txt 설치 필요 (준비 실패 시 torch 로 동작)
+    # 변환 모델은 가중치 옆에 캐시됨, 백엔드별 속도 / 검출 일치율은 python -m utils.yolo_bench 로 비교
+    YOLO_WEIGHTS = os.environ.get("YOLO_WEIGHTS", "best.pt")
+    YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "torch")
+    # 추론 입력 크기 (작을수록 빠름, 작은 물체 검출↓)
+    YOLO_IMGSZ = int(os.environ.get("YOLO_IMGSZ", "640"))
+    # INT8 양자화 (onnx: 동적 양자화, openvino: YOLO_INT8_DATA 데이터셋 yaml 로 보정)
+    YOLO_INT8 = os.environ.get("YOLO_INT8", "0") == "1"
+    YOLO_INT8_DATA = os.environ.get("YOLO_INT8_DATA", "")
@@ -1,9 +1,12 @@
 # routes/api.py
 from flask import Blueprint, jsonify, request
+from config import Config
 from sockets.ambulance_state import (
     get_ambulance_position,
     get_all_ambulance_positions,
 )
+from sockets.bridge import shard_for_car
+from sockets.ws_server import get_client_stats
 
 bp = Blueprint("api", __name__, url_prefix="/api")
 
@@ -23,3 +26,30 @@ def get_ambulance_position_api():
     else:
         # car 파라미터 없으면 전체 목록 반환
         return jsonify(get_all_ambulance_positions())
+
+
+@bp.get("/ws/clients")
+def get_ws_client_stats_api():
+    """
+    WebSocket 클라이언트별 송신 큐 상태
+    (queue_depth / queue_max_depth / sent / replaced / dropped)
+    멀티 프로세스 모드면 ingest 워커에 직접 붙은 클라이언트도 worker 필드와 함께 포함
+    """
+    stats = get_client_stats()
+    return jsonify({"count": len(stats), "clients": stats})
+
+
+@bp.get("/ws/shard")
+def get_ws_shard_api():
+    """
+    /api/ws/shard?car=1234 → 해당 차량을 담당하는 ingest 워커 번호와 직접 접속 포트
+    (단일 프로세스 모드면 worker=null, 기본 포트)
+    """
+    car_no = request.args.get("car")
+    if not car_no:
+        return jsonify({"error": "car_required"}), 400
+    n_workers = Config.WS_INGEST_WORKERS
+    if n_workers <= 0:
+        return jsonify({"car": car_no, "worker": None, "port": Config.WS_PORT})
+    worker = shard_for_car(car_no, n_workers)
+    return jsonify({"car": car_no, "worker": worker, "port": Config.WS_PORT + 1 + worker})
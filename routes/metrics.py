@@ -0,0 +1,15 @@
+# routes/metrics.py
+from flask import Blueprint, Response
+
+from utils.metrics import CONTENT_TYPE, render_all
+
+bp = Blueprint("metrics", __name__)
+
+
+@bp.get("/metrics")
+def metrics():
+    """
+    Prometheus 스크레이프용 실시간 파이프라인 지표
+    (WS 메시지/핸들러 지연, 브로드캐스트, YOLO 큐/처리율, 녹화, S3 업로드, 클라이언트 수)
+    """
+    return Response(render_all(), content_type=CONTENT_TYPE)
@@ -0,0 +1,308 @@
+# sockets/bridge.py
+# -*- coding: utf-8 -*-
+"""
+멀티 프로세스 WS ingest 용 로컬 pub/sub 브리지 (Unix 도메인 소켓)
+
+    [허브 프로세스]  ws://:5000  ← 대시보드 + 차량 연결
+        │  차량 연결은 첫 car 필드로 워커에 고정(pin) 후 원본 메시지를 그대로 전달
+        │  워커가 보낸 broadcast 는 구독 라우팅 후 대시보드로 송출
+        ▼
+    [ingest 워커 0..N-1]  (차량별 처리: DB / 녹화 / YOLO / 경로 분석)
+        - 차량 단말은 ws://:5000+1+i 로 직접 붙어도 됨 (/api/ws/shard?car=...)
+
+프레임 형식: [4바이트 길이(big endian)][1바이트 종류][본문]
+    F 허브→워커  conn_id(8) + 원본 WS 메시지
+    C 허브→워커  conn_id(8)                     연결 종료
+    R 워커→허브  conn_id(8) + payload           해당 연결에 응답 (ack 등)
+    B 워커→허브  헤더길이(2) + {"event","car","tier"} + payload   브로드캐스트
+    S 양방향     {"op","car","value"}           공유 상태 동기화 (경로/예상 교차로/위치)
+    I 허브→워커  {event: [car, ...] | null}     대시보드 구독 관심 목록
+    H 워커→허브  {"worker": i}                  접속 인사
+    M 워커→허브  {"samples", "clients"}          지표 스냅샷 (주기적, 허브 /metrics · /api/ws/clients 에 합침)
+"""
+
+import asyncio
+import os
+import struct
+import zlib
+from typing import Callable, Dict, Optional
+
+from utils.json_codec import dumps_bytes, loads
+from utils.log import get_logger
+
+logger = get_logger("ws.bridge")
+
+_HEADER = struct.Struct(">IB")
+_CONN = struct.Struct(">Q")
+_BCAST_HEAD = struct.Struct(">H")
+
+# 허브가 느려서 송신 버퍼가 이만큼 쌓이면 영상 브로드캐스트는 버림 (제어 이벤트는 유지)
+MAX_WRITE_BUFFER = 8 * 1024 * 1024
+
+
+def shard_for_car(car_no, n_workers: int) -> int:
+    """차량 번호 → 워커 번호 (프로세스 간 동일한 값이 나오도록 crc32 사용)"""
+    if n_workers <= 1:
+        return 0
+    return zlib.crc32(str(car_no).encode("utf-8")) % n_workers
+
+
+def _frame(kind: bytes, body: bytes) -> bytes:
+    return _HEADER.pack(len(body) + 1, kind[0]) + body
+
+
+async def _read_frames(reader: asyncio.StreamReader):
+    while True:
+        head = await reader.readexactly(_HEADER.size)
+        size, kind = _HEADER.unpack(head)
+        body = await reader.readexactly(size - 1)
+        yield bytes((kind,)), body
+
+
+class _Peer:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def send(self, kind: bytes, body: bytes, droppable: bool = False) -> bool:
+        if self.writer.is_closing():
+            return False
+        if droppable and self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            return False
+        self.writer.write(_frame(kind, body))
+        return True
+
+
+# ================================================================
+# 허브 (메인 프로세스)
+# ================================================================
+
+class BridgeHub:
+    role = "hub"
+
+    def __init__(
+        self,
+        path: str,
+        n_workers: int,
+        on_reply: Callable[[int, bytes], None],
+        on_broadcast: Callable[[bytes, Optional[str], Optional[str], Optional[str]], None],
+        on_state: Callable[[dict], None],
+        on_metrics: Optional[Callable[[int, Optional[dict]], None]] = None,
+    ):
+        self.path = path
+        self.n_workers = n_workers
+        self._on_reply = on_reply
+        self._on_broadcast = on_broadcast
+        self._on_state = on_state
+        # (워커 번호, 지표 스냅샷) — 워커 연결이 끊기면 스냅샷 None 으로 호출
+        self._on_metrics = on_metrics
+        self._workers: Dict[int, _Peer] = {}
+        self._interest: bytes = dumps_bytes({})
+        # 워커가 (재)접속하면 지금까지의 공유 상태를 다시 보내주기 위한 보관소
+        self._state_log: Dict[tuple, bytes] = {}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_worker, path=self.path)
+        logger.info("🔗 브리지 허브 대기: %s (워커 %d개)", self.path, self.n_workers)
+
+    async def _handle_worker(self, reader, writer):
+        peer = _Peer(writer)
+        worker_id = None
+        try:
+            async for kind, body in _read_frames(reader):
+                if kind == b"B":
+                    (hlen,) = _BCAST_HEAD.unpack_from(body)
+                    head = loads(body[2:2 + hlen])
+                    self._on_broadcast(body[2 + hlen:], head.get("event"), head.get("car"), head.get("tier"))
+                elif kind == b"R":
+                    (conn_id,) = _CONN.unpack_from(body)
+                    self._on_reply(conn_id, body[_CONN.size:])
+                elif kind == b"S":
+                    self._apply_state(body, source=worker_id)
+                elif kind == b"M":
+                    if worker_id is not None and self._on_metrics is not None:
+                        self._on_metrics(worker_id, loads(body))
+                elif kind == b"H":
+                    worker_id = loads(body)["worker"]
+                    self._workers[worker_id] = peer
+                    logger.info("🔗 ingest 워커 %s 접속", worker_id)
+                    peer.send(b"I", self._interest)
+                    for state in self._state_log.values():
+                        peer.send(b"S", state)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if worker_id is not None and self._workers.get(worker_id) is peer:
+                self._workers.pop(worker_id, None)
+                if self._on_metrics is not None:
+                    self._on_metrics(worker_id, None)
+            logger.warning("⚠️ ingest 워커 %s 연결 끊김", worker_id)
+            writer.close()
+
+    def _apply_state(self, body: bytes, source):
+        state = loads(body)
+        op, car = state.get("op"), state.get("car")
+        if op == "arrival":
+            self._state_log.pop(("crossroads", car), None)
+            self._state_log.pop(("route", car), None)
+        elif op != "position":
+            self._state_log[(op, car)] = body
+        self._on_state(state)
+        # 다른 워커들에게 중계
+        for wid, peer in list(self._workers.items()):
+            if wid != source:
+                peer.send(b"S", body)
+
+    # ---------- 허브 → 워커 ----------
+
+    def worker_for(self, car_no) -> int:
+        return shard_for_car(car_no, self.n_workers)
+
+    def forward(self, worker_id: int, conn_id: int, raw) -> bool:
+        peer = self._workers.get(worker_id)
+        if peer is None:
+            return False
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        return peer.send(b"F", _CONN.pack(conn_id) + raw)
+
+    def close_conn(self, worker_id: int, conn_id: int) -> None:
+        peer = self._workers.get(worker_id)
+        if peer is not None:
+            peer.send(b"C", _CONN.pack(conn_id))
+
+    def publish_interest(self, interest: dict) -> None:
+        self._interest = dumps_bytes(interest)
+        for peer in list(self._workers.values()):
+            peer.send(b"I", self._interest)
+
+
+# ================================================================
+# 워커 (ingest 프로세스)
+# ================================================================
+
+class BridgedConnection:
+    """허브가 받은 차량 연결을 워커 쪽에서 websocket 처럼 다루기 위한 대리 객체"""
+
+    remote_address = None
+
+    def __init__(self, client: "BridgeClient", conn_id: int):
+        self._client = client
+        self.conn_id = conn_id
+
+    async def send(self, message, text: bool | None = None):
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        self._client.reply(self.conn_id, message)
+
+    def __repr__(self):
+        return f"<BridgedConnection {self.conn_id}>"
+
+
+class BridgeClient:
+    role = "worker"
+
+    def __init__(
+        self,
+        path: str,
+        worker_id: int,
+        on_message: Callable[[BridgedConnection, bytes], "asyncio.Future"],
+        on_close: Callable[[BridgedConnection], None],
+        on_state: Callable[[dict], None],
+        on_interest: Callable[[dict], None],
+    ):
+        self.path = path
+        self.worker_id = worker_id
+        self._on_message = on_message
+        self._on_close = on_close
+        self._on_state = on_state
+        self._on_interest = on_interest
+        self._peer: Optional[_Peer] = None
+        self._conns: Dict[int, BridgedConnection] = {}
+        # 연결별 메시지 순서 보장을 위한 큐 (연결 하나당 처리 task 하나)
+        self._inbox: Dict[int, asyncio.Queue] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self):
+        """허브에 접속해서 프레임 수신 (허브가 재시작하면 재접속)"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionError):
+                await asyncio.sleep(0.5)
+                continue
+
+            self._peer = _Peer(writer)
+            self._peer.send(b"H", dumps_bytes({"worker": self.worker_id}))
+            logger.info("🔗 워커 %d → 허브 접속 완료", self.worker_id)
+            try:
+                async for kind, body in _read_frames(reader):
+                    if kind == b"F":
+                        (conn_id,) = _CONN.unpack_from(body)
+                        self._deliver(conn_id, body[_CONN.size:])
+                    elif kind == b"C":
+                        (conn_id,) = _CONN.unpack_from(body)
+                        self._deliver(conn_id, None)
+                    elif kind == b"S":
+                        self._on_state(loads(body))
+                    elif kind == b"I":
+                        self._on_interest(loads(body))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("⚠️ 워커 %d: 허브 연결 끊김 → 재접속", self.worker_id)
+            finally:
+                self._peer = None
+                writer.close()
+                for conn_id in list(self._inbox):
+                    self._deliver(conn_id, None)
+
+    def _deliver(self, conn_id: int, raw):
+        inbox = self._inbox.get(conn_id)
+        if inbox is None:
+            if raw is None:
+                return
+            inbox = self._inbox[conn_id] = asyncio.Queue()
+            conn = self._conns[conn_id] = BridgedConnection(self, conn_id)
+            task = asyncio.create_task(self._conn_loop(conn, inbox))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        inbox.put_nowait(raw)
+
+    async def _conn_loop(self, conn: BridgedConnection, inbox: asyncio.Queue):
+        try:
+            while True:
+                raw = await inbox.get()
+                if raw is None:
+                    break
+                try:
+                    await self._on_message(conn, raw)
+                except Exception as e:
+                    logger.error("❌ 워커 %d 메시지 처리 오류: %s", self.worker_id, e)
+        finally:
+            self._inbox.pop(conn.conn_id, None)
+            self._conns.pop(conn.conn_id, None)
+            self._on_close(conn)
+
+    # ---------- 워커 → 허브 ----------
+
+    def reply(self, conn_id: int, payload: bytes) -> None:
+        if self._peer is not None:
+            self._peer.send(b"R", _CONN.pack(conn_id) + payload)
+
+    def publish_broadcast(
+        self, payload: bytes, event: Optional[str], car: Optional[str], droppable: bool, tier: Optional[str] = None
+    ) -> None:
+        if self._peer is None:
+            return
+        head = dumps_bytes({"event": event, "car": car, "tier": tier})
+        body = b"".join((_BCAST_HEAD.pack(len(head)), head, payload))
+        self._peer.send(b"B", body, droppable=droppable)
+
+    def publish_state(self, state: dict) -> None:
+        if self._peer is not None:
+            self._peer.send(b"S", dumps_bytes(state))
+
+    def publish_metrics(self, snapshot: dict) -> None:
+        # 모니터링용 → 허브가 밀려 있으면 버림 (다음 주기에 다시 보냄)
+        if self._peer is not None:
+            self._peer.send(b"M", dumps_bytes(snapshot), droppable=True)
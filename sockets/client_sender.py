@@ -0,0 +1,150 @@
+# sockets/client_sender.py
+# -*- coding: utf-8 -*-
+"""
+클라이언트별 송신 큐 + writer task
+
+- broadcast 는 큐에 넣기만 하고 바로 리턴 → 느린 대시보드가 수신 루프를 막지 않음
+- 영상/디버그 프레임: 같은 (event, car) 가 큐에 남아 있으면 최신 프레임으로 교체,
+  큐가 가득 차면 가장 오래된 영상 프레임부터 버림
+- 제어 이벤트(출발/도착/교차로 등): 절대 버리지 않음 (큐 상한을 넘어도 적재)
+- 영상 교체/드롭 누적으로 시청자별 영상 티어를 조정 (sockets.video_tiers)
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Dict
+
+from sockets.subscriptions import HEAVY_EVENTS
+from sockets.video_tiers import TierState
+from utils.log import get_logger
+
+logger = get_logger("ws.sender")
+
+# 클라이언트별 송신 큐 최대 길이 (영상 프레임 기준)
+SEND_QUEUE_MAX = 32
+
+
+class ClientSender:
+    def __init__(self, ws, maxsize: int = SEND_QUEUE_MAX):
+        self.ws = ws
+        self.maxsize = maxsize
+
+        # 큐 항목: [msg, event, car] (영상 프레임 교체를 위해 list 로 보관)
+        self._queue: deque[list] = deque()
+        # (event, car) → 큐에 대기 중인 영상 프레임 항목
+        self._pending_frames: Dict[tuple, list] = {}
+        self._wakeup = asyncio.Event()
+        self._closed = False
+
+        # 통계
+        self.sent = 0
+        self.replaced = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+        # 영상 품질 티어 (요청 / 현재)
+        self.tier = TierState()
+
+        self._task = asyncio.create_task(self._writer_loop())
+
+    # ---------- 외부: 큐 적재 ----------
+
+    def enqueue(self, msg: Any, event: str | None = None, car: str | None = None) -> None:
+        if self._closed:
+            return
+
+        if event in HEAVY_EVENTS:
+            key = (event, car)
+            pending = self._pending_frames.get(key)
+            if pending is not None:
+                # 아직 안 나간 프레임이 있으면 최신 프레임으로 교체 (latest wins)
+                pending[0] = msg
+                self.replaced += 1
+                return
+
+            if len(self._queue) >= self.maxsize and not self._drop_oldest_frame():
+                # 큐가 제어 이벤트로만 가득 참 → 이번 프레임 버림
+                self.dropped += 1
+                return
+
+            item = [msg, event, car]
+            self._pending_frames[key] = item
+            self._queue.append(item)
+        else:
+            # 제어 이벤트는 버리지 않음. 자리가 없으면 영상 프레임을 대신 버림
+            if len(self._queue) >= self.maxsize:
+                self._drop_oldest_frame()
+            self._queue.append([msg, event, car])
+
+        depth = len(self._queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self._wakeup.set()
+
+    def _drop_oldest_frame(self) -> bool:
+        for item in self._queue:
+            if item[1] in HEAVY_EVENTS:
+                self._queue.remove(item)
+                self._pending_frames.pop((item[1], item[2]), None)
+                self.dropped += 1
+                return True
+        return False
+
+    # ---------- 내부: writer task ----------
+
+    async def _writer_loop(self):
+        try:
+            while not self._closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                item = self._queue.popleft()
+                if item[1] in HEAVY_EVENTS:
+                    self._pending_frames.pop((item[1], item[2]), None)
+
+                msg = item[0]
+                if isinstance(msg, bytes):
+                    # 미리 인코딩된 UTF-8 payload → 텍스트 프레임으로 그대로 전송
+                    await self.ws.send(msg, text=True)
+                else:
+                    await self.ws.send(msg)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # 연결 끊김 등 → 이 클라이언트 송신만 중단
+            logger.warning("⚠️ [ClientSender] 송신 중단: %s", e)
+        finally:
+            self._closed = True
+            self._queue.clear()
+            self._pending_frames.clear()
+
+    def close(self) -> None:
+        self._closed = True
+        self._task.cancel()
+
+    def adapt_tier(self, now: float) -> bool:
+        """송신 밀림에 따라 현재 영상 티어 조정 (바뀌었으면 True)"""
+        return self.tier.adapt(self.replaced + self.dropped, len(self._queue), self.maxsize, now)
+
+    # ---------- 통계 ----------
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        remote = getattr(self.ws, "remote_address", None)
+        return {
+            "client": id(self.ws),
+            "remote": f"{remote[0]}:{remote[1]}" if remote else None,
+            "queue_depth": self.depth,
+            "queue_max_depth": self.max_depth,
+            "sent": self.sent,
+            "replaced": self.replaced,
+            "dropped": self.dropped,
+            "tier": self.tier.current,
+            "tier_requested": self.tier.requested,
+        }
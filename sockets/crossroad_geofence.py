@@ -0,0 +1,148 @@
+# sockets/crossroad_geofence.py
+# -*- coding: utf-8 -*-
+"""
+구급차별 예상 교차로 지오펜스
+
+- 예상 교차로를 경로상 위치(offset, m) 순으로 정렬해 두고
+  current 갱신마다 활성 교차로(approaching/arrived) + 바로 다음 pending 교차로만 거리 계산
+  → 경로가 길고 교차로가 많아도 갱신 1회 비용은 일정
+- 상태 전이: pending → approaching(≤300m) → arrived(≤50m) → passed(>70m)
+  도착/통과 반경 사이 20m 는 히스테리시스 (GPS 흔들림으로 도착/통과가 반복되지 않도록)
+- 교차로에 들르지 않고 지나친 경우 (우회, GPS 튐)
+    - approaching 상태에서 350m 밖으로 멀어짐
+    - 차량의 경로상 위치(route_progress 가 계산)가 교차로 위치 + 100m 를 넘어감
+    - 경로상 위치로 판정할 수 없으면 (교차로 offset 없음 / 차량 위치 모름)
+      뒤 교차로 몇 개 중 하나에 먼저 도착(≤50m)
+  → skipped=True 로 passed 처리 (뒤 교차로 감시가 막히지 않도록)
+- 교차로 / 차량 위치는 로컬 평면(m)으로 투영해서 평면 거리로 판정
+"""
+
+import math
+from typing import List, NamedTuple, Optional
+
+from utils.geo import project_point
+from sockets.route_matcher import RouteIndex
+
+# 접근 알림 반경 (m)
+APPROACH_RADIUS = 300.0
+# 도착 판정 반경 (m)
+ARRIVE_RADIUS = 50.0
+# 통과 판정 반경 (m) — 도착 반경보다 넓게 잡아서 경계에서 상태가 떨리지 않게
+PASS_RADIUS = 70.0
+# approaching 상태에서 이만큼 멀어지면 도착 없이 지나친 것으로 봄 (m)
+APPROACH_EXIT_RADIUS = 350.0
+# 경로상 위치가 교차로보다 이만큼 앞서면 지나친 것으로 봄 (m)
+SKIP_OFFSET_MARGIN = 100.0
+# offset 으로 판정할 수 없는 교차로는 뒤 교차로 이만큼까지 도착했는지 확인
+SKIP_LOOKAHEAD = 3
+
+_ACTIVE = ("approaching", "arrived")
+
+
+class GeofenceEvent(NamedTuple):
+    kind: str          # approach / arrived / passed
+    crossroad: dict    # expected_crossroads 의 항목 (status 는 이미 갱신됨)
+    distance: float    # 차량 ~ 교차로 거리 (m)
+
+
+def order_along_route(crossroads: List[dict], index: Optional[RouteIndex]) -> List[dict]:
+    """
+    교차로마다 경로상 위치(offset, m)를 붙이고 경로 순서로 정렬 (제자리, 같은 위치면 원래 순서 유지)
+    경로 인덱스가 없으면 원래 순서 그대로
+    """
+    if index is None or not crossroads:
+        return crossroads
+    for c in crossroads:
+        m = index.nearest_xy(*project_point(c["lat"], c["lon"]))
+        c["offset"] = round(m.offset, 1)
+    crossroads.sort(key=lambda c: c["offset"])
+    return crossroads
+
+
+class CrossroadGeofence:
+    """
+    차량 한 대의 예상 교차로 감시
+    crossroads 리스트의 status 를 직접 갱신하고, 바뀐 것만 GeofenceEvent 로 돌려줌
+    (리스트는 order_along_route 로 정렬된 상태라고 가정)
+    """
+
+    def __init__(self, crossroads: List[dict]):
+        self.crossroads = crossroads
+        # 교차로 평면 좌표 (id(dict) → (x, y))
+        self._xy = {id(c): project_point(c["lat"], c["lon"]) for c in crossroads}
+        # 이미 진행된 상태에서 다시 만들어도 (프로세스 간 동기화) 이어서 감시
+        self._active: List[dict] = [c for c in crossroads if c.get("status") in _ACTIVE]
+        self._next = 0
+        for i, c in enumerate(crossroads):
+            if c.get("status", "pending") == "pending":
+                self._next = i
+                break
+        else:
+            self._next = len(crossroads)
+
+    @property
+    def done(self) -> bool:
+        return not self._active and self._next >= len(self.crossroads)
+
+    def update(self, lat: float, lon: float, offset: Optional[float] = None) -> List[GeofenceEvent]:
+        """
+        offset: 차량의 경로상 위치 (m, 모르면 None → 거리 기준으로만 판정)
+        """
+        events: List[GeofenceEvent] = []
+        if self.done:
+            return events
+        x, y = project_point(lat, lon)
+
+        # 1) 활성 교차로 (보통 1~2개)
+        for c in list(self._active):
+            d = self._distance(c, x, y)
+            if c["status"] == "approaching":
+                if d <= ARRIVE_RADIUS:
+                    c["status"] = "arrived"
+                    events.append(GeofenceEvent("arrived", c, d))
+                elif d > APPROACH_EXIT_RADIUS or self._overshot(c, offset):
+                    self._pass(c, d, events, skipped=True)
+            elif d > PASS_RADIUS:
+                self._pass(c, d, events)
+
+        # 2) 다음 pending 교차로 (접근/지나침 판정되면 그다음 것도 이어서 확인)
+        while self._next < len(self.crossroads):
+            c = self.crossroads[self._next]
+            d = self._distance(c, x, y)
+            if d <= APPROACH_RADIUS:
+                c["status"] = "approaching"
+                self._active.append(c)
+                events.append(GeofenceEvent("approach", c, d))
+            elif self._overshot(c, offset) or self._reached_later(c, x, y, offset):
+                self._pass(c, d, events, skipped=True)
+            else:
+                break
+            self._next += 1
+
+        return events
+
+    def _distance(self, c: dict, x: float, y: float) -> float:
+        cx, cy = self._xy[id(c)]
+        return math.hypot(x - cx, y - cy)
+
+    @staticmethod
+    def _overshot(c: dict, offset: Optional[float]) -> bool:
+        c_offset = c.get("offset")
+        return offset is not None and c_offset is not None and offset > c_offset + SKIP_OFFSET_MARGIN
+
+    def _reached_later(self, c: dict, x: float, y: float, offset: Optional[float]) -> bool:
+        """offset 으로 지나침을 판정할 수 없는 교차로 → 뒤 교차로에 먼저 도착했거나 지나쳤으면 True"""
+        if offset is not None and c.get("offset") is not None:
+            return False
+        start = self._next + 1
+        for later in self.crossroads[start:start + SKIP_LOOKAHEAD]:
+            if self._distance(later, x, y) <= ARRIVE_RADIUS or self._overshot(later, offset):
+                return True
+        return False
+
+    def _pass(self, c: dict, d: float, events: List[GeofenceEvent], skipped: bool = False) -> None:
+        c["status"] = "passed"
+        if skipped:
+            c["skipped"] = True
+        self._active = [a for a in self._active if a is not c]
+        events.append(GeofenceEvent("passed", c, d))
@@ -0,0 +1,14 @@
+# sockets/ingest_worker.py
+# -*- coding: utf-8 -*-
+"""
+멀티 프로세스 모드의 ingest 워커 프로세스 진입점 (spawn 으로 시작)
+Flask 앱을 새로 만들고 앱 컨텍스트 안에서 차량 메시지 처리 루프를 돌린다.
+"""
+
+
+def run_ingest_worker(worker_id: int):
+    from app import app
+    from sockets.ws_server import start_ingest_worker
+
+    with app.app_context():
+        start_ingest_worker(worker_id)
@@ -0,0 +1,234 @@
+# sockets/messages.py
+# -*- coding: utf-8 -*-
+"""
+WS 수신 메시지 스키마 + type 별 핸들러 레지스트리
+
+- 각 메시지 타입은 slots dataclass 하나. decode() 가 검증과 형 변환을 한 번에 수행
+- "%Y-%m-%d %H:%M:%S" 시각 문자열은 슬라이싱으로 파싱 + 캐시 (strptime 재호출 없음)
+- @handler("type", Schema) 로 등록하면 ws_handler 가 테이블 조회로 디스패치
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class MessageError(ValueError):
+    """스키마 검증 실패"""
+
+
+# ================================================================
+# 공용 변환기
+# ================================================================
+
+@lru_cache(maxsize=1024)
+def parse_ts(value: str) -> datetime:
+    """
+    "YYYY-MM-DD HH:MM:SS" → datetime
+    고정 위치 슬라이싱으로 파싱하고, 형식이 다르면 strptime 으로 fallback
+    """
+    if (
+        len(value) == 19
+        and value[4] == "-" and value[7] == "-" and value[10] == " "
+        and value[13] == ":" and value[16] == ":"
+    ):
+        try:
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+            )
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError) as e:
+        raise MessageError(f"시각 형식 오류: {value!r}") from e
+
+
+def _ts(value, field: str) -> datetime:
+    if not isinstance(value, str):
+        raise MessageError(f"{field} 누락 또는 문자열 아님: {value!r}")
+    return parse_ts(value)
+
+
+def _opt_ts(value) -> Optional[datetime]:
+    return parse_ts(value) if isinstance(value, str) and value else None
+
+
+def _opt_float(value, field: str) -> Optional[float]:
+    if value is None:
+        return None
+    if type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError) as e:
+        raise MessageError(f"{field} 숫자 아님: {value!r}") from e
+
+
+def _opt_car(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return value if type(value) is str else str(value)
+
+
+def _current_latlng(data: dict) -> tuple[Optional[float], Optional[float]]:
+    current = data.get("current")
+    if not isinstance(current, dict):
+        return None, None
+    return _opt_float(current.get("lat"), "lat"), _opt_float(current.get("lng"), "lng")
+
+
+def _route_points(raw) -> list[dict]:
+    """route_points / path 를 [{"lat", "lng"}, ...] 로 정규화 ([lat, lng] 리스트 또는 dict 허용)"""
+    if not raw:
+        return []
+    if not isinstance(raw, list):
+        raise MessageError("route_points 가 리스트가 아님")
+    out = []
+    append = out.append
+    try:
+        for p in raw:
+            if isinstance(p, dict):
+                append({"lat": float(p["lat"]), "lng": float(p["lng"])})
+            elif isinstance(p, (list, tuple)) and len(p) >= 2:
+                append({"lat": float(p[0]), "lng": float(p[1])})
+    except (KeyError, TypeError, ValueError) as e:
+        raise MessageError(f"route 좌표 형식 오류: {e}") from e
+    return out
+
+
+# ================================================================
+# 메시지 스키마
+# ================================================================
+
+@dataclass(slots=True)
+class StartMsg:
+    car: Optional[str]
+    start_time: datetime
+
+    @classmethod
+    def decode(cls, data: dict) -> "StartMsg":
+        return cls(
+            car=_opt_car(data.get("car")),
+            start_time=_ts(data.get("start_time") or data.get("time"), "start_time"),
+        )
+
+
+@dataclass(slots=True)
+class ArrivalMsg:
+    car: Optional[str]
+    start_time: Optional[datetime]
+    arrival_time: datetime
+
+    @classmethod
+    def decode(cls, data: dict) -> "ArrivalMsg":
+        return cls(
+            car=_opt_car(data.get("car")),
+            start_time=_opt_ts(data.get("start_time")),
+            arrival_time=_ts(data.get("arrival_time") or data.get("time"), "arrival_time"),
+        )
+
+
+@dataclass(slots=True)
+class RouteMsg:
+    car: Optional[str]
+    points: list
+    duration: Optional[float]
+
+    @classmethod
+    def decode(cls, data: dict) -> "RouteMsg":
+        return cls(
+            car=_opt_car(data.get("car")),
+            points=_route_points(data.get("route_points") or data.get("path")),
+            duration=_opt_float(data.get("duration"), "duration"),
+        )
+
+
+@dataclass(slots=True)
+class CurrentMsg:
+    car: Optional[str]
+    lat: Optional[float]
+    lng: Optional[float]
+    speed: Optional[float]
+
+    @classmethod
+    def decode(cls, data: dict) -> "CurrentMsg":
+        lat, lng = _current_latlng(data)
+        return cls(
+            car=_opt_car(data.get("car")),
+            lat=lat,
+            lng=lng,
+            speed=_opt_float(data.get("speed"), "speed"),
+        )
+
+
+@dataclass(slots=True)
+class NormalCurrentMsg:
+    car: Optional[str]
+    lat: Optional[float]
+    lng: Optional[float]
+
+    @classmethod
+    def decode(cls, data: dict) -> "NormalCurrentMsg":
+        lat, lng = _current_latlng(data)
+        return cls(car=_opt_car(data.get("car")), lat=lat, lng=lng)
+
+
+@dataclass(slots=True)
+class VideoMsg:
+    car: Optional[str]
+    frame: Optional[str]
+
+    @classmethod
+    def decode(cls, data: dict) -> "VideoMsg":
+        frame = data.get("frame")
+        return cls(
+            car=_opt_car(data.get("car")),
+            frame=frame if isinstance(frame, str) and frame else None,
+        )
+
+
+@dataclass(slots=True)
+class SubscribeMsg:
+    events: Any
+    cars: Any
+    tier: Optional[str]
+
+    @classmethod
+    def decode(cls, data: dict) -> "SubscribeMsg":
+        tier = data.get("tier")
+        return cls(
+            events=data.get("events"),
+            cars=data.get("cars"),
+            tier=tier if isinstance(tier, str) else None,
+        )
+
+
+# ================================================================
+# 핸들러 레지스트리
+# ================================================================
+
+class HandlerEntry(NamedTuple):
+    fn: Callable[..., Awaitable[None]]
+    schema: Optional[type]
+    # 스키마 검증 실패 시 보낸 쪽에 {"type": "error"} 응답할지
+    reply_errors: bool
+
+
+HANDLERS: Dict[str, HandlerEntry] = {}
+
+
+def handler(msg_type: str, schema: Optional[type] = None, reply_errors: bool = False):
+    """
+    async def fn(websocket, msg, data) 를 msg_type 핸들러로 등록
+        msg  : schema.decode(data) 결과 (schema 없으면 data 그대로)
+        data : 원본 dict (브로드캐스트에 그대로 실을 때 사용)
+    """
+    def deco(fn):
+        HANDLERS[msg_type] = HandlerEntry(fn, schema, reply_errors)
+        return fn
+    return deco
@@ -0,0 +1,210 @@
+# sockets/offload.py
+# -*- coding: utf-8 -*-
+"""
+WS 이벤트 루프 밖에서 돌려야 하는 블로킹 작업 모음
+
+- DB (SQLAlchemy)        : 단일 스레드 executor (SQLite 쓰기 직렬화 + 호출 순서 보장)
+- CSV 로깅 / 업로드       : 단일 스레드 executor (csv_logger 전역 상태 보호)
+- VideoRecorder          : 차량별 단일 스레드 stage (프레임 순서 유지, 종료/ffmpeg/S3 도 같은 스레드)
+- 경로 분석 (기하 연산)    : 프로세스 풀 (ROUTE_ANALYSIS_WORKERS 개, 0 이면 전용 스레드 1개)
+- 루프 지연 감시          : 루프가 LOOP_BLOCK_WARN_MS 이상 막히면 경고
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import Config
+from extensions import db
+from utils.log import get_logger
+from utils.metrics import RECORDER_FRAMES_DROPPED
+
+logger = get_logger("ws.offload")
+
+# 루프 블로킹 경고 기준 (ms)
+LOOP_BLOCK_WARN_MS = 5.0
+# 루프 지연 측정 주기 (초)
+LOOP_MONITOR_INTERVAL = 0.1
+
+# 차량별 레코더 stage 에 쌓일 수 있는 최대 미처리 프레임 수 (넘치면 드롭)
+RECORDER_MAX_BACKLOG = 60
+
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ws-db")
+_csv_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ws-csv")
+
+# DB 작업에서 push 할 Flask 앱 (start_ws_server 에서 바인딩)
+_flask_app = None
+
+# fire-and-forget 으로 띄운 task 가 GC 되지 않도록 보관
+_background_tasks: set[asyncio.Task] = set()
+
+
+def bind_app(app) -> None:
+    global _flask_app
+    _flask_app = app
+
+
+# ---------- DB ----------
+
+
+def _call_in_app_context(fn, args):
+    if _flask_app is None:
+        return fn(*args)
+    with _flask_app.app_context():
+        try:
+            return fn(*args)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+async def run_db(fn, *args):
+    """DB 함수를 전용 스레드에서 실행하고 결과를 await"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, _call_in_app_context, fn, args)
+
+
+# ---------- CSV ----------
+
+
+def _call_logged(fn, args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        logger.warning("⚠️ CSV 작업 실패 (%s): %s", fn.__name__, e)
+
+
+def submit_csv(fn, *args):
+    """CSV 작업을 순서대로 백그라운드 실행 (결과 필요하면 반환된 future 를 await)"""
+    return asyncio.wrap_future(_csv_executor.submit(_call_logged, fn, args))
+
+
+# ---------- 경로 분석 (프로세스 풀) ----------
+
+# 처음 쓸 때 생성 (ingest 워커 프로세스도 각자 하나씩)
+_route_executor: Executor | None = None
+
+
+def _get_route_executor() -> Executor:
+    global _route_executor
+    if _route_executor is None:
+        n = Config.ROUTE_ANALYSIS_WORKERS
+        if n > 0:
+            # 서버 프로세스엔 스레드가 많아서 fork 대신 spawn (ingest 워커와 동일)
+            # 자식은 app.py 를 __mp_main__ 으로 다시 실행하지만 무거운 import 는 거기서 건너뜀 (app.py 참고)
+            # → 풀 프로세스에는 경로 분석에 필요한 numpy / pandas 만 로드됨
+            _route_executor = ProcessPoolExecutor(
+                max_workers=n, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _route_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ws-route")
+        logger.info("🧭 경로 분석 executor 생성: %s", "process x%d" % n if n > 0 else "thread")
+    return _route_executor
+
+
+async def run_route_analysis(fn, *args):
+    """
+    경로 기하 연산을 루프 밖(프로세스 풀)에서 실행하고 결과를 await
+    await 중인 task 가 취소되면 아직 시작 안 한 작업은 풀에서도 취소됨
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_route_executor(), fn, *args)
+
+
+async def warm_route_executor():
+    """첫 route 가 프로세스 기동 시간(수 초)을 기다리지 않도록 서버 시작 시 미리 띄움"""
+    try:
+        await run_route_analysis(os.getpid)
+    except Exception as e:
+        logger.warning("⚠️ 경로 분석 executor 준비 실패: %s", e)
+
+
+# ---------- 백그라운드 task ----------
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+# ---------- VideoRecorder stage ----------
+
+
+class RecorderStage:
+    """
+    VideoRecorder 를 전용 스레드 하나에서만 다루는 래퍼
+    - write(): 공유 Frame 의 디코드/리사이즈/기록을 큐에 넣고 바로 리턴
+    - close_and_upload(): 남은 프레임 기록 후 ffmpeg + S3 업로드 완료까지 await
+    """
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"rec-{recorder.base_name}"
+        )
+        # 제출/완료 카운터를 각 스레드가 따로 증가 → 락 없이 backlog 계산
+        self._submitted = 0
+        self._completed = 0
+        self.dropped = 0
+
+    @property
+    def backlog(self) -> int:
+        return self._submitted - self._completed
+
+    def _write(self, frame):
+        try:
+            self.recorder.write_frame(frame)
+        finally:
+            frame.release()
+            self._completed += 1
+
+    def write(self, frame) -> None:
+        """공유 Frame 을 기록 큐에 넣음 (호출 전에 retain 된 참조 1개를 넘겨받음)"""
+        if self.backlog >= RECORDER_MAX_BACKLOG:
+            self.dropped += 1
+            RECORDER_FRAMES_DROPPED.inc()
+            frame.release()
+            return
+        self._submitted += 1
+        self._executor.submit(self._write, frame)
+
+    async def close_and_upload(self):
+        loop = asyncio.get_running_loop()
+        try:
+            # 같은 단일 스레드 executor → 이미 제출된 프레임이 모두 기록된 뒤 실행됨
+            await loop.run_in_executor(self._executor, self.recorder.close_and_upload)
+        finally:
+            self._executor.shutdown(wait=False)
+        if self.dropped:
+            logger.warning("[RecorderStage] ⚠️ backlog 초과로 드롭된 프레임: %d", self.dropped)
+
+
+# ---------- 루프 지연 감시 ----------
+
+
+async def monitor_loop_lag(
+    warn_ms: float = LOOP_BLOCK_WARN_MS,
+    interval: float = LOOP_MONITOR_INTERVAL,
+):
+    """
+    interval 마다 깨어나서 예정 시각 대비 지연을 측정.
+    WS_LOOP_DEBUG=1 이면 asyncio debug 모드로 느린 콜백 위치까지 출력.
+    """
+    loop = asyncio.get_running_loop()
+    if os.environ.get("WS_LOOP_DEBUG") == "1":
+        loop.set_debug(True)
+        loop.slow_callback_duration = warn_ms / 1000.0
+
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = (time.perf_counter() - t0 - interval) * 1000.0
+        if lag_ms > warn_ms:
+            logger.warning(
+                "⚠️ [WS 루프] %.1fms 블로킹 감지 (기준 %.0fms)", lag_ms, warn_ms,
+                extra={"rate_limit": 1},
+            )
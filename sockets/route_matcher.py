@@ -2,74 +2,200 @@
 # -*- coding: utf-8 -*-
 
 import math
+import time
 from collections import defaultdict, deque
-from typing import List, Dict, Tuple
-from utils.crossroad_utils import haversine
+from typing import List, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from utils.geo import as_latlng_array, planar_bearing, project, project_point
 
 
 # ================================================================
 # 차량 좌표 저장 공간
 # ================================================================
+# 일반 차량 최근 좌표 (수신 시 1회 평면 투영한 (x, y) m)
 normal_car_tracks: Dict[str, deque] = defaultdict(lambda: deque(maxlen=10))
 
-# 구급차 경로 저장 공간 (car_no → polyline)
-ambulance_routes: Dict[str, List[dict]] = {}
+# 구급차 경로 저장 공간 (car_no → (N, 2) [lat, lng] float64 배열)
+ambulance_routes: Dict[str, np.ndarray] = {}
+
+
+def add_normal_car_point(car_id: str, lat: float, lng: float) -> deque:
+    """일반 차량 좌표 1개 저장 (평면 좌표로 변환해서)"""
+    track = normal_car_tracks[car_id]
+    track.append(project_point(lat, lng))
+    return track
 
 # ================================================================
-# polyline 비교 유틸 함수
+# 경로 선분 인덱스 (선분 투영 매칭)
 # ================================================================
 
-def point_to_polyline_distance(lat: float, lon: float, poly: List[dict]):
-    """
-    점(lat, lon)과 polyline 각 점까지의 거리 중 최소값과 인덱스 반환
-    """
-    min_d = float("inf")
-    min_idx = 0
-    for i, p in enumerate(poly):
-        d = haversine(lat, lon, p["lat"], p["lng"])
-        if d < min_d:
-            min_d = d
-            min_idx = i
-    return min_d, min_idx
-
-
-def is_on_same_road(
-    ambulance_route: List[dict],
-    car_points: List[dict],
-    dist_threshold: float = 25.0,
-    ratio_threshold: float = 0.7,
-):
+# 선분 격자 칸 크기 (m)
+SEGMENT_CELL = 50.0
+
+
+class RouteMatch(NamedTuple):
+    distance: float   # 경로(선분)까지 최단 거리 (m)
+    segment: int      # 선분 번호 i → route[i] ~ route[i+1]
+    offset: float     # 경로 시작점부터 투영점까지 경로상 거리 (m)
+    t: float          # 선분 안에서의 위치 (0~1)
+
+
+class RouteIndex:
     """
-    차량 좌표 중 dist_threshold(m) 이내인 비율이 ratio_threshold 이상이면 같은 도로로 판단
+    경로 polyline 을 로컬 평면(m)에 투영하고 선분들을 균일 격자에 등록
+    - match(): 점 주변 칸의 선분에만 수직 투영 → 거리 / 선분 번호 / 경로상 거리
+    - 경로가 성겨도(꼭짓점 간격이 멀어도) 선분까지 거리로 판정
     """
-    if not ambulance_route or not car_points:
-        return False, []
 
-    close_count = 0
-    near_idx_list = []
+    def __init__(self, route_points, cell: float = SEGMENT_CELL):
+        xy = project(route_points)
+        if len(xy) == 1:
+            # 점 하나짜리 경로 → 길이 0 선분 하나
+            xy = np.vstack([xy, xy])
+        self.cell = cell
+        self.n_points = len(xy)
+        self.start = xy[:-1]
+        self.vec = xy[1:] - xy[:-1]
+        self.seg_len = np.hypot(self.vec[:, 0], self.vec[:, 1])
+        self._len2 = np.where(self.seg_len > 0, self.seg_len ** 2, 1.0)
+        # cum[i] = 꼭짓점 i 까지 경로상 거리
+        self.cum = np.concatenate(([0.0], np.cumsum(self.seg_len)))
+        # 선분 방위각 (0°=북, 시계방향) — 평면 벡터 기준
+        self.seg_bearing = (np.degrees(np.arctan2(self.vec[:, 0], self.vec[:, 1])) + 360) % 360
+        self.length = float(self.cum[-1])
+        self._grid = self._build_grid()
+
+    @property
+    def n_segments(self) -> int:
+        return len(self.seg_len)
+
+    def _build_grid(self) -> Dict[tuple, np.ndarray]:
+        # 선분마다 cell/2 간격 샘플점이 지나는 칸에 등록
+        step = self.cell * 0.5
+        counts = np.maximum(1, np.ceil(self.seg_len / step).astype(np.int64)) + 1
+        seg_ids = np.repeat(np.arange(self.n_segments), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        ts = (np.arange(len(seg_ids)) - first) / np.repeat(counts - 1, counts)
+        pts = self.start[seg_ids] + self.vec[seg_ids] * ts[:, None]
+        cx = np.floor(pts[:, 0] / self.cell).astype(np.int64)
+        cy = np.floor(pts[:, 1] / self.cell).astype(np.int64)
+
+        pairs = np.unique(np.stack([cx, cy, seg_ids], axis=1), axis=0)
+        grid: Dict[tuple, np.ndarray] = {}
+        keys = pairs[:, :2]
+        bounds = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        for chunk in np.split(pairs, bounds):
+            grid[(int(chunk[0, 0]), int(chunk[0, 1]))] = chunk[:, 2]
+        return grid
+
+    # ---------- 질의 ----------
+
+    def _candidates(self, x: float, y: float, rings: int) -> Optional[np.ndarray]:
+        cx, cy = math.floor(x / self.cell), math.floor(y / self.cell)
+        found = [
+            segs
+            for gx in range(cx - rings, cx + rings + 1)
+            for gy in range(cy - rings, cy + rings + 1)
+            if (segs := self._grid.get((gx, gy))) is not None
+        ]
+        if not found:
+            return None
+        return np.unique(np.concatenate(found))
+
+    def project_onto(self, x: float, y: float, segs: np.ndarray) -> RouteMatch:
+        """평면 좌표 (x, y) 를 주어진 선분들에 수직 투영해서 가장 가까운 것 (거리 같으면 앞 선분)"""
+        sx = self.start[segs, 0]
+        sy = self.start[segs, 1]
+        vx = self.vec[segs, 0]
+        vy = self.vec[segs, 1]
+        t = np.clip(((x - sx) * vx + (y - sy) * vy) / self._len2[segs], 0.0, 1.0)
+        d = np.hypot(sx + t * vx - x, sy + t * vy - y)
+        k = int(np.argmin(d))
+        seg = int(segs[k])
+        tk = float(t[k])
+        return RouteMatch(float(d[k]), seg, float(self.cum[seg] + tk * self.seg_len[seg]), tk)
+
+    def match(self, lat: float, lng: float, max_dist: float) -> Optional[RouteMatch]:
+        """max_dist(m) 안의 가장 가까운 선분 (없으면 None). 주변 격자 칸만 검사"""
+        return self.match_xy(*project_point(lat, lng), max_dist)
 
-    for p in car_points:
-        d, idx = point_to_polyline_distance(p["lat"], p["lng"], ambulance_route)
-        near_idx_list.append(idx)
-        if d <= dist_threshold:
-            close_count += 1
+    def match_xy(self, x: float, y: float, max_dist: float) -> Optional[RouteMatch]:
+        """match() 의 평면 좌표 버전 (이미 투영해 둔 점용)"""
+        # 샘플 간격(cell/2) 때문에 생기는 칸 누락까지 덮는 링 수
+        rings = int((max_dist + self.cell * 0.25) // self.cell) + 1
+        segs = self._candidates(x, y, rings)
+        if segs is None:
+            return None
+        m = self.project_onto(x, y, segs)
+        return m if m.distance <= max_dist else None
 
-    ratio = close_count / len(car_points)
-    return ratio >= ratio_threshold, near_idx_list
+    def match_window(self, lat: float, lng: float, seg: int, window: int, max_dist: float) -> Optional[RouteMatch]:
+        """선분 seg 앞뒤 window 개 선분만 검사 (직전 매칭 위치를 아는 차량용, 경로 길이와 무관)"""
+        return self.match_window_xy(*project_point(lat, lng), seg, window, max_dist)
 
+    def match_window_xy(self, x: float, y: float, seg: int, window: int, max_dist: float) -> Optional[RouteMatch]:
+        lo = max(0, seg - window)
+        hi = min(self.n_segments, seg + window + 1)
+        m = self.project_onto(x, y, np.arange(lo, hi))
+        return m if m.distance <= max_dist else None
 
-def bearing(lat1, lon1, lat2, lon2):
+    def nearest(self, lat: float, lng: float) -> RouteMatch:
+        """거리 제한 없이 가장 가까운 선분 (가까우면 격자, 멀면 전체 선분 벡터 연산)"""
+        return self.nearest_xy(*project_point(lat, lng))
+
+    def nearest_xy(self, x: float, y: float) -> RouteMatch:
+        m = self.match_xy(x, y, self.cell * 4)
+        if m is not None:
+            return m
+        return self.project_onto(x, y, np.arange(self.n_segments))
+
+
+# 경로(list 객체) → RouteIndex 캐시. route 메시지 수신 시 set_ambulance_route 에서 미리 생성
+_route_indexes: Dict[int, tuple] = {}
+
+
+def route_index(route) -> RouteIndex:
+    cached = _route_indexes.get(id(route))
+    if cached is not None and cached[0] is route:
+        return cached[1]
+    index = RouteIndex(route)
+    # 교체된 경로의 인덱스는 버림 (현재 저장된 경로 + 이번 것만 유지)
+    live = {id(r) for r in ambulance_routes.values()}
+    for key in [k for k in _route_indexes if k not in live]:
+        _route_indexes.pop(key, None)
+    _route_indexes[id(route)] = (route, index)
+    return index
+
+
+def set_ambulance_route(car_no: str, route) -> Optional[RouteIndex]:
     """
-    방향각 계산 (0~360)
+    구급차 경로 저장 + 선분 인덱스 1회 생성 + 통합 인덱스 갱신
+    route 는 [{"lat", "lng"}, ...] 또는 (N, 2) 배열 → (N, 2) float64 배열로 저장
     """
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dlambda = math.radians(lon2 - lon1)
+    route = np.array(as_latlng_array(route), dtype=np.float64)
+    ambulance_routes[car_no] = route
+    if not len(route):
+        active_routes.remove(car_no)
+        return None
+    index = route_index(route)
+    active_routes.set_route(car_no, index)
+    return index
+
+# ================================================================
+# polyline 비교 유틸 함수
+# (경로는 [{"lat", "lng"}, ...] / (N, 2) 배열 모두 가능)
+# ================================================================
 
-    x = math.sin(dlambda) * math.cos(phi2)
-    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1)*math.cos(phi2)*math.cos(dlambda)
-    brng = math.degrees(math.atan2(x, y))
-    return (brng + 360) % 360
+def point_to_polyline_distance(lat: float, lon: float, poly):
+    """
+    점(lat, lon)과 polyline 사이 최단 거리(선분 투영)와 가장 가까운 선분 번호 반환
+    """
+    if len(poly) == 0:
+        return float("inf"), 0
+    m = route_index(poly).nearest(lat, lon)
+    return m.distance, m.segment
 
 
 def angle_diff(a, b):
@@ -79,46 +205,256 @@ def angle_diff(a, b):
     return diff
 
 
-def is_same_direction(
-    ambulance_route: List[dict],
-    car_points: List[dict],
-    nearest_indices: List[int],
-    angle_threshold: float = 45.0,
-):
-    if len(car_points) < 2 or not ambulance_route or not nearest_indices:
-        return False
+# ================================================================
+# 여러 구급차 경로 통합 선분 인덱스
+# ================================================================
+
+class MultiRouteIndex:
+    """
+    활성 구급차 경로 전체의 선분을 한 격자에 모은 인덱스
+    - route 수신 시 갱신, arrival 시 제거 (둘 다 드문 이벤트 → 통째로 재구성)
+    - query(): 점 주변 칸의 모든 경로 선분을 한 번에 투영해서 구급차별 최근접 선분 반환
+    - version: 재구성할 때마다 증가 (경로 목록이 바뀌었는지 확인용)
+    """
+
+    def __init__(self, cell: float = SEGMENT_CELL):
+        self.cell = cell
+        self.routes: Dict[str, RouteIndex] = {}
+        self.version = 0
+        self._rebuild()
 
-    # 차량 방향
-    p1, p2 = car_points[-2], car_points[-1]
-    car_heading = bearing(p1["lat"], p1["lng"], p2["lat"], p2["lng"])
+    def set_route(self, car_no: str, index: RouteIndex) -> None:
+        self.routes[car_no] = index
+        self._rebuild()
 
-    # 구급차 방향
-    idx = nearest_indices[-1]
-    if idx >= len(ambulance_route) - 1:
-        idx = len(ambulance_route) - 2
+    def remove(self, car_no: str) -> None:
+        if self.routes.pop(car_no, None) is not None:
+            self._rebuild()
 
-    a1 = ambulance_route[idx]
-    a2 = ambulance_route[idx + 1]
-    amb_heading = bearing(a1["lat"], a1["lng"], a2["lat"], a2["lng"])
+    def _rebuild(self) -> None:
+        self.version += 1
+        cars = list(self.routes)
+        indexes = [self.routes[c] for c in cars]
+        self._cars = cars
+        if not indexes:
+            self._grid: Dict[tuple, np.ndarray] = {}
+            return
 
-    diff = angle_diff(car_heading, amb_heading)
-    return diff <= angle_threshold
+        counts = [ix.n_segments for ix in indexes]
+        bases = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self._start = np.concatenate([ix.start for ix in indexes])
+        self._vec = np.concatenate([ix.vec for ix in indexes])
+        self._len2 = np.concatenate([ix._len2 for ix in indexes])
+        self._owner = np.repeat(np.arange(len(indexes)), counts)
+        self._local = np.concatenate([np.arange(n) for n in counts])
 
+        merged: Dict[tuple, list] = {}
+        for ix, base in zip(indexes, bases):
+            for key, segs in ix._grid.items():
+                merged.setdefault(key, []).append(segs + base)
+        self._grid = {key: np.concatenate(parts) for key, parts in merged.items()}
 
-def check_same_road_and_direction(ambulance_route, car_points):
-    same_road, idxs = is_on_same_road(ambulance_route, car_points)
-    if not same_road:
-        return False, False
+    def query(self, lat: float, lng: float, max_dist: float) -> Dict[str, RouteMatch]:
+        """max_dist(m) 안에 경로가 지나는 구급차 → 그 경로의 최근접 선분"""
+        return self.query_xy(*project_point(lat, lng), max_dist)
 
-    same_dir = is_same_direction(ambulance_route, car_points, idxs)
-    return same_road, same_dir
+    def query_xy(self, x: float, y: float, max_dist: float) -> Dict[str, RouteMatch]:
+        if not self._grid:
+            return {}
+        rings = int((max_dist + self.cell * 0.25) // self.cell) + 1
+        cx, cy = math.floor(x / self.cell), math.floor(y / self.cell)
+        found = [
+            segs
+            for gx in range(cx - rings, cx + rings + 1)
+            for gy in range(cy - rings, cy + rings + 1)
+            if (segs := self._grid.get((gx, gy))) is not None
+        ]
+        if not found:
+            return {}
+        segs = np.unique(np.concatenate(found))
 
+        sx = self._start[segs, 0]
+        sy = self._start[segs, 1]
+        vx = self._vec[segs, 0]
+        vy = self._vec[segs, 1]
+        t = np.clip(((x - sx) * vx + (y - sy) * vy) / self._len2[segs], 0.0, 1.0)
+        d = np.hypot(sx + t * vx - x, sy + t * vy - y)
+        hit = np.flatnonzero(d <= max_dist)
+        if not len(hit):
+            return {}
 
-def get_any_ambulance_route():
+        out: Dict[str, RouteMatch] = {}
+        owners = self._owner[segs[hit]]
+        for owner in np.unique(owners).tolist():
+            sel = hit[owners == owner]
+            k = int(sel[np.argmin(d[sel])])
+            index = self.routes[self._cars[owner]]
+            seg = int(self._local[segs[k]])
+            tk = float(t[k])
+            out[self._cars[owner]] = RouteMatch(
+                float(d[k]), seg, float(index.cum[seg] + tk * index.seg_len[seg]), tk
+            )
+        return out
+
+
+# 활성 구급차 경로 통합 인덱스 (set_ambulance_route / remove_ambulance_route 로 관리)
+active_routes = MultiRouteIndex()
+
+
+def remove_ambulance_route(car_no: str) -> None:
+    """도착한 구급차 경로를 매칭 대상에서 제거"""
+    ambulance_routes.pop(car_no, None)
+    active_routes.remove(car_no)
+
+
+# ================================================================
+# 일반 차량별 점진 매칭 상태 (normal_current)
+# ================================================================
+
+# 직전 매칭 선분 기준 앞뒤로 먼저 볼 선분 수
+MATCH_WINDOW = 6
+# 이 시간 동안 위치가 안 온 일반 차량 상태는 정리 (초)
+NORMAL_CAR_IDLE_SEC = 300.0
+_PURGE_INTERVAL = 60.0
+
+
+class AmbulanceMatch(NamedTuple):
+    car: str            # 구급차 번호
+    same_dir: bool
+    distance: float     # 경로까지 거리 (m)
+    offset: float       # 구급차 경로상 위치 (m, 경로 시작점 기준)
+
+
+class _RouteTrack:
+    """일반 차량 1대 × 구급차 경로 1개 의 최근 매칭 기록"""
+
+    __slots__ = ("index", "flags", "close_count", "last")
+
+    def __init__(self, index: RouteIndex, maxlen: int):
+        self.index = index
+        self.flags: deque = deque(maxlen=maxlen)
+        self.close_count = 0
+        self.last: Optional[RouteMatch] = None
+
+    def push(self, m: Optional[RouteMatch]) -> None:
+        if len(self.flags) == self.flags.maxlen and self.flags[0]:
+            self.close_count -= 1
+        self.flags.append(m is not None)
+        if m is not None:
+            self.close_count += 1
+        self.last = m
+
+
+class NormalCarMatcher:
+    """
+    일반 차량 1대의 구급차 경로별 매칭 상태
+    - 이미 따라가던 경로는 직전 선분 앞뒤 window 만 봐서 선분 연속성 유지
+    - 통합 인덱스 조회(근처를 지나는 구급차 경로 전체 탐색)는 필요할 때만
+        잠긴 경로가 없을 때 / window 에서 놓쳤을 때 / 경로 목록이 바뀌었을 때(새 구급차 경로)
+    - 새로 잡힌 경로(또는 바뀐 경로)만 버퍼의 이전 점들을 다시 매칭 → 갱신당 O(1)
+    """
+
+    __slots__ = ("tracks", "updated_at", "routes_version")
+
+    def __init__(self):
+        self.tracks: Dict[str, _RouteTrack] = {}
+        self.updated_at = time.monotonic()
+        self.routes_version = -1
+
+    def update(self, track: deque, dist_threshold: float) -> None:
+        x, y = track[-1]
+        routes = active_routes.routes
+
+        # 1) 따라가던 경로 → 직전 선분 앞뒤 window
+        window: Dict[str, Optional[RouteMatch]] = {}
+        for amb, tr in self.tracks.items():
+            if tr.last is not None and routes.get(amb) is tr.index:
+                window[amb] = tr.index.match_window_xy(x, y, tr.last.segment, MATCH_WINDOW, dist_threshold)
+
+        # 2) 모든 경로가 window 로 잡혔고 경로 목록도 그대로면 통합 인덱스 조회 생략
+        found: Optional[Dict[str, RouteMatch]] = None
+        if (
+            not window
+            or len(window) < len(self.tracks)
+            or None in window.values()
+            or self.routes_version != active_routes.version
+        ):
+            found = active_routes.query_xy(x, y, dist_threshold)
+            self.routes_version = active_routes.version
+
+        for amb, index in routes.items():
+            tr = self.tracks.get(amb)
+            if tr is None or tr.index is not index:
+                if found is None or amb not in found:
+                    self.tracks.pop(amb, None)
+                    continue
+                # 처음 잡힌 경로 → 버퍼의 이전 점들도 이 경로에 대해 매칭
+                tr = self.tracks[amb] = _RouteTrack(index, track.maxlen)
+                for qx, qy in list(track)[:-1]:
+                    tr.push(index.match_xy(qx, qy, dist_threshold))
+
+            m = window.get(amb)
+            if m is None and found is not None:
+                m = found.get(amb)
+            tr.push(m)
+            if not tr.close_count:
+                self.tracks.pop(amb, None)
+
+        # 제거된(도착한) 경로 정리
+        for amb in [a for a in self.tracks if a not in active_routes.routes]:
+            self.tracks.pop(amb, None)
+        self.updated_at = time.monotonic()
+
+
+_normal_states: Dict[str, NormalCarMatcher] = {}
+_last_purge = time.monotonic()
+
+
+def _purge_idle_normal_cars(now: float) -> None:
+    global _last_purge
+    if now - _last_purge < _PURGE_INTERVAL:
+        return
+    _last_purge = now
+    for car_id in [c for c, s in _normal_states.items() if now - s.updated_at > NORMAL_CAR_IDLE_SEC]:
+        _normal_states.pop(car_id, None)
+        normal_car_tracks.pop(car_id, None)
+
+
+def match_normal_car(
+    car_id: str,
+    dist_threshold: float = 25.0,
+    ratio_threshold: float = 0.7,
+    angle_threshold: float = 45.0,
+) -> List[AmbulanceMatch]:
     """
-    구급차가 여러 대여도 일단 첫 번째 경로 반환
+    normal_car_tracks[car_id] 에 방금 추가된 점 하나(add_normal_car_point)로 매칭 상태 갱신 후
+    같은 도로인 구급차 목록 반환
+    - 같은 도로: 최근 좌표 중 구급차 경로에서 dist_threshold(m) 이내인 점 비율이 ratio_threshold 이상
+    - 같은 방향: 차량의 마지막 두 점 방위각과 매칭된 경로 선분 방위각 차이가 angle_threshold(°) 이하
     """
-    for car_no, route in ambulance_routes.items():
-        if route:
-            return car_no, route
-    return None, None
+    track = normal_car_tracks[car_id]
+    if not track:
+        return []
+
+    state = _normal_states.get(car_id)
+    if state is None:
+        state = _normal_states[car_id] = NormalCarMatcher()
+    state.update(track, dist_threshold)
+    _purge_idle_normal_cars(state.updated_at)
+
+    out = []
+    for amb, tr in state.tracks.items():
+        if tr.close_count / len(track) < ratio_threshold:
+            continue
+        last = tr.last
+        if last is None:
+            last = tr.index.nearest_xy(*track[-1])
+        same_dir = False
+        if len(track) >= 2:
+            (x1, y1), (x2, y2) = track[-2], track[-1]
+            car_heading = float(planar_bearing(x2 - x1, y2 - y1))
+            amb_heading = float(tr.index.seg_bearing[last.segment])
+            same_dir = angle_diff(car_heading, amb_heading) <= angle_threshold
+        out.append(AmbulanceMatch(amb, same_dir, round(last.distance, 1), round(last.offset, 1)))
+    return out
+
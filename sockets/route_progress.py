@@ -0,0 +1,123 @@
+# sockets/route_progress.py
+# -*- coding: utf-8 -*-
+"""
+구급차 경로 진행률 / 실시간 ETA
+
+- 경로 위치: RouteIndex 누적 거리(cum) 기준 offset(m)
+  직전 선분 앞뒤 MATCH_WINDOW 개만 투영 → 놓치면 격자 재탐색 → 경로 재스캔 없음
+- 속도: 경로상 이동거리 / 경과 시간 을 지수 이동 평균 (단말 speed 필드는 단위가 제각각이라 쓰지 않음)
+  첫 속도는 route 의 duration(경로 길이 / 예상 소요시간), 없으면 DEFAULT_SPEED
+- ETA = 남은 거리 / 평활 속도, 교차로별 도착 예상 시간도 같은 속도로 계산
+- 브로드캐스트는 차량당 ETA_BROADCAST_INTERVAL 초에 1번 (due() 로 판단)
+"""
+
+import time
+from typing import List, Optional
+
+from utils.geo import project_point
+from sockets.route_matcher import MATCH_WINDOW, RouteIndex
+
+# 차량 위치를 경로에 매칭할 최대 거리 (m) — 벗어나면 직전 위치 유지
+ROUTE_MATCH_DIST = 100.0
+# 속도 지수 이동 평균 계수 (클수록 최근 값 반영)
+SPEED_ALPHA = 0.3
+# 초기 속도 (m/s, duration 을 모를 때) ≈ 40km/h
+DEFAULT_SPEED = 11.0
+# ETA 계산에 쓸 최저 속도 (m/s) — 신호 대기 중에도 ETA 가 무한대로 튀지 않게
+MIN_SPEED = 2.0
+# 속도 갱신에 쓸 최소 경과 시간 (초) — 같은 시각 중복 좌표로 속도가 튀는 것 방지
+MIN_SPEED_DT = 0.5
+# ETA 브로드캐스트 최소 간격 (초)
+ETA_BROADCAST_INTERVAL = 2.0
+# ETA 이벤트에 실을 앞쪽 교차로 최대 개수
+ETA_MAX_CROSSROADS = 5
+
+
+class RouteProgress:
+    """구급차 1대의 경로 진행 상태"""
+
+    def __init__(self, index: RouteIndex, duration_sec: Optional[float] = None):
+        self.index = index
+        self.length = index.length
+        if duration_sec and duration_sec > 0 and self.length > 0:
+            self.speed = max(MIN_SPEED, self.length / float(duration_sec))
+        else:
+            self.speed = DEFAULT_SPEED
+        self.offset: Optional[float] = None
+        self.off_route_distance: Optional[float] = None
+        self._last_seg: Optional[int] = None
+        self._last_t: Optional[float] = None
+        self._last_offset: Optional[float] = None
+        self._last_emit: Optional[float] = None
+
+    def update(self, lat: float, lon: float, now: Optional[float] = None) -> Optional[float]:
+        """새 위치로 경로상 위치 / 속도 갱신 → offset(m) (경로에서 벗어나 있으면 None)"""
+        now = time.monotonic() if now is None else now
+        x, y = project_point(lat, lon)
+
+        m = None
+        if self._last_seg is not None:
+            m = self.index.match_window_xy(x, y, self._last_seg, MATCH_WINDOW, ROUTE_MATCH_DIST)
+        if m is None:
+            m = self.index.match_xy(x, y, ROUTE_MATCH_DIST)
+        if m is None:
+            self.off_route_distance = None
+            return None
+
+        self._last_seg = m.segment
+        self.offset = m.offset
+        self.off_route_distance = m.distance
+
+        if self._last_t is None:
+            self._last_t, self._last_offset = now, m.offset
+        elif now - self._last_t >= MIN_SPEED_DT:
+            v = max(0.0, m.offset - self._last_offset) / (now - self._last_t)
+            self.speed = SPEED_ALPHA * v + (1 - SPEED_ALPHA) * self.speed
+            self._last_t, self._last_offset = now, m.offset
+        return m.offset
+
+    @property
+    def remaining(self) -> Optional[float]:
+        if self.offset is None:
+            return None
+        return max(0.0, self.length - self.offset)
+
+    def eta_seconds(self, distance: float) -> float:
+        return distance / max(self.speed, MIN_SPEED)
+
+    def due(self, now: Optional[float] = None) -> bool:
+        """ETA 브로드캐스트 시점인지 (맞으면 시각 기록)"""
+        if self.offset is None:
+            return False
+        now = time.monotonic() if now is None else now
+        if self._last_emit is not None and now - self._last_emit < ETA_BROADCAST_INTERVAL:
+            return False
+        self._last_emit = now
+        return True
+
+    def snapshot(self, crossroads: List[dict]) -> dict:
+        """ETA 이벤트 본문 (남은 거리 / 진행률 / 속도 / 앞쪽 교차로별 도착 예상)"""
+        remaining = self.remaining or 0.0
+        upcoming = []
+        for c in crossroads:
+            c_offset = c.get("offset")
+            if c.get("status") == "passed" or c_offset is None:
+                continue
+            ahead = c_offset - self.offset
+            if ahead < 0:
+                continue
+            upcoming.append({
+                "crossroad_id": c["id"],
+                "crossroad_name": c["name"],
+                "distance": round(ahead, 1),
+                "eta_sec": round(self.eta_seconds(ahead), 1),
+            })
+            if len(upcoming) >= ETA_MAX_CROSSROADS:
+                break
+        return {
+            "remaining_m": round(remaining, 1),
+            "progress": round(self.offset / self.length, 4) if self.length > 0 else 1.0,
+            "speed_mps": round(self.speed, 2),
+            "eta_sec": round(self.eta_seconds(remaining), 1),
+            "crossroads": upcoming,
+        }
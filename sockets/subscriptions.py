@@ -0,0 +1,164 @@
+# sockets/subscriptions.py
+# -*- coding: utf-8 -*-
+"""
+WebSocket 클라이언트 구독(topic/car) 라우팅 테이블
+
+클라이언트는 연결 직후 아래 형식으로 구독을 등록한다.
+    {"type": "subscribe", "events": ["video", "ambulance_current"], "cars": ["119다119"]}
+    - events 생략 / "*" → 영상 이외 모든 이벤트 (영상은 "video"/"yolo_debug" 명시 필요)
+    - cars 생략 / 빈 리스트 → 모든 차량
+구독하지 않은 클라이언트(차량 단말 등)는 제어 이벤트만 받고 영상은 받지 않는다.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+# 프레임 단위로 쏟아지는 무거운 이벤트 (명시적으로 구독한 클라이언트에게만 전송)
+HEAVY_EVENTS = frozenset({"video", "yolo_debug"})
+
+# 모든 이벤트 구독용 와일드카드
+WILDCARD = "*"
+
+# event → 구독 소켓 집합
+_event_routes: Dict[str, Set[Any]] = {}
+
+# 소켓 → 구독 필터 (events, cars). cars=None 이면 모든 차량
+_client_filters: Dict[Any, tuple[frozenset, Optional[frozenset]]] = {}
+
+# 멀티 프로세스 ingest 워커용: 허브 대시보드들의 구독 관심 목록 (event → cars, None=전체)
+_remote_interest: Dict[str, Optional[frozenset]] = {}
+
+
+def _as_str_set(values) -> Optional[frozenset]:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    out = frozenset(str(v) for v in values if v is not None and str(v) != "")
+    return out or None
+
+
+def subscribe(ws, events: Iterable[str] | None, cars: Iterable[str] | None) -> dict:
+    """
+    구독 등록 (같은 소켓이 다시 보내면 기존 구독을 교체)
+    반환값은 클라이언트에게 돌려줄 ack 내용
+    """
+    unsubscribe(ws)
+
+    event_set = _as_str_set(events) or frozenset({WILDCARD})
+    car_set = _as_str_set(cars)
+    if car_set is not None and WILDCARD in car_set:
+        car_set = None
+
+    _client_filters[ws] = (event_set, car_set)
+    for ev in event_set:
+        _event_routes.setdefault(ev, set()).add(ws)
+
+    return {
+        "type": "subscribed",
+        "events": sorted(event_set),
+        "cars": sorted(car_set) if car_set is not None else [],
+    }
+
+
+def unsubscribe(ws) -> None:
+    """구독 해제 (연결 종료 시에도 호출)"""
+    flt = _client_filters.pop(ws, None)
+    if flt is None:
+        return
+    for ev in flt[0]:
+        subs = _event_routes.get(ev)
+        if subs is None:
+            continue
+        subs.discard(ws)
+        if not subs:
+            _event_routes.pop(ev, None)
+
+
+def is_subscribed(ws) -> bool:
+    return ws in _client_filters
+
+
+def _car_match(ws, car_key: str | None) -> bool:
+    cars = _client_filters[ws][1]
+    return cars is None or car_key is None or car_key in cars
+
+
+def get_recipients(event: str | None, car: str | None, clients: Iterable[Any]) -> list:
+    """
+    이벤트/차량 번호에 맞는 수신 소켓 목록
+    - 영상 이벤트: 라우팅 테이블(event → 구독자)만 조회 → 전체 소켓 순회 없음
+    - 제어 이벤트: 구독 안 한 소켓 + events/cars 필터가 일치하는 구독 소켓
+    """
+    car_key = str(car) if car is not None else None
+
+    if event in HEAVY_EVENTS:
+        subs = _event_routes.get(event)
+        if not subs:
+            return []
+        return [ws for ws in subs if _car_match(ws, car_key)]
+
+    out = []
+    for ws in clients:
+        flt = _client_filters.get(ws)
+        if flt is None:
+            out.append(ws)
+            continue
+        events = flt[0]
+        if event not in events and WILDCARD not in events:
+            continue
+        if _car_match(ws, car_key):
+            out.append(ws)
+    return out
+
+
+def has_subscribers(event: str, car: str | None = None) -> bool:
+    """해당 이벤트(+차량)를 명시적으로 구독한 클라이언트가 있는지"""
+    car_key = str(car) if car is not None else None
+    subs = _event_routes.get(event)
+    if subs and (car_key is None or any(_car_match(ws, car_key) for ws in subs)):
+        return True
+
+    if event in _remote_interest:
+        cars = _remote_interest[event]
+        return cars is None or car_key is None or car_key in cars
+    return False
+
+
+def interest_snapshot(tier_of: Callable[[Any], Optional[str]] | None = None) -> dict:
+    """
+    명시 구독된 event 별 차량 목록 (None = 모든 차량)
+    tier_of 를 주면 영상 이벤트는 "video@<tier>" 키로 티어별 목록도 추가
+    """
+    groups: Dict[str, list] = {}
+    for ev, subs in _event_routes.items():
+        groups[ev] = list(subs)
+        if tier_of is not None and ev in HEAVY_EVENTS:
+            for ws in subs:
+                tier = tier_of(ws)
+                if tier is not None:
+                    groups.setdefault(f"{ev}@{tier}", []).append(ws)
+
+    out: Dict[str, Optional[list]] = {}
+    for key, subs in groups.items():
+        cars: set = set()
+        for ws in subs:
+            ws_cars = _client_filters[ws][1]
+            if ws_cars is None:
+                cars = None
+                break
+            cars |= ws_cars
+        out[key] = sorted(cars) if cars is not None else None
+    return out
+
+
+def remote_interest() -> dict:
+    return _remote_interest
+
+
+def set_remote_interest(interest: dict) -> None:
+    """워커 쪽: 허브에서 받은 관심 목록으로 교체"""
+    global _remote_interest
+    _remote_interest = {
+        ev: (frozenset(cars) if cars is not None else None)
+        for ev, cars in interest.items()
+    }
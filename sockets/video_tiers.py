@@ -0,0 +1,156 @@
+# sockets/video_tiers.py
+# -*- coding: utf-8 -*-
+"""
+영상 품질 티어 (해상도 + fps) 와 시청자별 적응
+
+    full  : 원본 해상도, 최대 15fps (video 는 수신한 base64 그대로 → 재인코딩 없음)
+    half  : 가로 640px,  최대 8fps
+    thumb : 가로 320px,  최대 2fps
+
+- 시청자는 subscribe 때 "tier" 로 원하는 티어를 지정 (기본 full)
+- 송신 큐에서 프레임이 계속 교체/드롭되면 한 단계씩 낮추고,
+  밀림이 TIER_UP_IDLE_SEC 동안 없으면 요청한 티어까지 한 단계씩 복귀
+- 티어 변환(리사이즈 + JPEG)은 그 티어를 보는 시청자가 있고 fps 간격이 됐을 때만 수행
+"""
+
+import base64
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+
+class VideoTier(NamedTuple):
+    name: str
+    max_width: int | None   # None = 원본 해상도
+    fps: float
+    jpeg_quality: int
+
+
+# 화질 높은 순서
+TIERS = (
+    VideoTier("full", None, 15.0, 70),
+    VideoTier("half", 640, 8.0, 65),
+    VideoTier("thumb", 320, 2.0, 60),
+)
+TIER_BY_NAME = {t.name: t for t in TIERS}
+_TIER_INDEX = {t.name: i for i, t in enumerate(TIERS)}
+DEFAULT_TIER = "full"
+
+# 송신 밀림 평가 주기 (초)
+TIER_EVAL_SEC = 1.0
+# 평가 주기 동안 교체/드롭된 영상 프레임이 이 이상이면 한 단계 낮춤
+TIER_DOWN_LOSS = 3
+# 이 시간 동안 밀림이 없으면 한 단계 올림 (요청 티어까지)
+TIER_UP_IDLE_SEC = 5.0
+# fps 간격 판정 여유 (수신 간격이 조금 흔들려도 프레임을 건너뛰지 않도록)
+FPS_SLACK = 0.9
+
+
+def normalize_tier(name) -> str:
+    return name if name in TIER_BY_NAME else DEFAULT_TIER
+
+
+def tier_key(event: str, tier: str) -> str:
+    """구독 관심 목록에서 티어별 키 (예: "video@thumb")"""
+    return f"{event}@{tier}"
+
+
+class TierState:
+    """시청자(ClientSender) 하나의 요청 티어 / 현재 티어"""
+
+    __slots__ = ("requested", "current", "_eval_at", "_mark", "_clean_since")
+
+    def __init__(self, requested: str = DEFAULT_TIER):
+        self.requested = normalize_tier(requested)
+        self.current = self.requested
+        self._eval_at = 0.0
+        self._mark = 0
+        self._clean_since = time.monotonic()
+
+    def request(self, name) -> None:
+        self.requested = self.current = normalize_tier(name)
+        self._clean_since = time.monotonic()
+
+    def adapt(self, lost: int, depth: int, maxsize: int, now: float) -> bool:
+        """
+        lost  : 지금까지 교체/드롭된 영상 프레임 누적 수
+        depth : 현재 송신 큐 길이
+        현재 티어가 바뀌었으면 True
+        """
+        if now - self._eval_at < TIER_EVAL_SEC:
+            return False
+        delta = lost - self._mark
+        self._mark = lost
+        self._eval_at = now
+
+        cur = _TIER_INDEX[self.current]
+        if delta >= TIER_DOWN_LOSS or depth >= maxsize // 2:
+            self._clean_since = now
+            if cur < len(TIERS) - 1:
+                self.current = TIERS[cur + 1].name
+                return True
+            return False
+
+        if delta:
+            self._clean_since = now
+            return False
+
+        if cur > _TIER_INDEX[self.requested] and now - self._clean_since >= TIER_UP_IDLE_SEC:
+            self.current = TIERS[cur - 1].name
+            self._clean_since = now
+            return True
+        return False
+
+
+# ---------- 송출 측: 티어 선택 / fps 솎아내기 / 변환 ----------
+
+# (event, car, tier) → 마지막 송출 시각
+_last_emit: dict[tuple, float] = {}
+
+
+def tiers_in(interest: dict, event: str, car) -> list[VideoTier]:
+    """관심 목록({"video@thumb": [car, ...] | None, ...})에서 해당 차량을 보는 티어들"""
+    car_key = str(car) if car is not None else None
+    out = []
+    for t in TIERS:
+        key = tier_key(event, t.name)
+        if key not in interest:
+            continue
+        cars = interest[key]
+        if cars is None or car_key is None or car_key in cars:
+            out.append(t)
+    return out
+
+
+def due_tiers(event: str, car, tiers: list[VideoTier], now: float | None = None) -> list[VideoTier]:
+    """fps 간격이 지난 티어만 골라서 송출 시각 갱신"""
+    if not tiers:
+        return []
+    now = time.monotonic() if now is None else now
+    out = []
+    for t in tiers:
+        key = (event, car, t.name)
+        last = _last_emit.get(key)
+        if last is None or now - last >= FPS_SLACK / t.fps:
+            _last_emit[key] = now
+            out.append(t)
+    return out
+
+
+def forget_car(car) -> None:
+    for key in [k for k in _last_emit if k[1] == car]:
+        _last_emit.pop(key, None)
+
+
+def render(image: np.ndarray, tier: VideoTier) -> str | None:
+    """BGR 이미지 → 티어 해상도로 축소 후 JPEG base64 (실패 시 None)"""
+    h, w = image.shape[:2]
+    if tier.max_width is not None and w > tier.max_width:
+        new_h = max(1, int(round(h * tier.max_width / w)))
+        image = cv2.resize(image, (tier.max_width, new_h), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), tier.jpeg_quality])
+    if not ok:
+        return None
+    return base64.b64encode(buf).decode("ascii")
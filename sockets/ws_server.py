@@ -1,544 +1,1154 @@
 # sockets/ws_server.py
 # -*- coding: utf-8 -*-
-import json
 import asyncio
+import itertools
+import logging
+import multiprocessing
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from sockets.ambulance_state import update_ambulance_position
+import numpy as np
 import websockets
+from flask import current_app
+from config import Config
 from extensions import db
 from models.ambulance_log import AmbulanceLog
 from utils.car_utils import normalize_car_no
+from utils.json_codec import dumps_bytes, loads, encode_frame_envelope
+from utils.log import get_logger
+from utils.metrics import (
+    WS_MESSAGES,
+    WS_HANDLER_SECONDS,
+    WS_CLIENTS,
+    WS_BROADCAST_SECONDS,
+    WS_BROADCAST_BYTES,
+    WS_BROADCAST_RECIPIENTS,
+    render_samples,
+    set_remote_samples,
+)
 from utils.crossroad_utils import (
     load_crossroad_csv,
-    compute_crossroad_directions,
-    haversine,
+    get_crossroad_index,
 )
-
+from utils.geo import as_latlng_array
+from utils.route_cache import RouteAnalysis, analyze_route_job, lookup as route_cache_lookup, store as route_cache_store
+
+from sockets.subscriptions import (
+    HEAVY_EVENTS,
+    subscribe,
+    unsubscribe,
+    get_recipients,
+    interest_snapshot,
+    set_remote_interest,
+    remote_interest,
+)
+from sockets import video_tiers
+from sockets.bridge import BridgeHub, BridgeClient
+from sockets.messages import (
+    HANDLERS,
+    TIME_FORMAT,
+    MessageError,
+    handler,
+    StartMsg,
+    ArrivalMsg,
+    RouteMsg,
+    CurrentMsg,
+    NormalCurrentMsg,
+    VideoMsg,
+    SubscribeMsg,
+)
+from sockets.client_sender import ClientSender
 from sockets.route_matcher import (
-    normal_car_tracks,
     ambulance_routes,
-    check_same_road_and_direction,
-    get_any_ambulance_route,
+    add_normal_car_point,
+    route_index,
+    set_ambulance_route,
+    remove_ambulance_route,
+    match_normal_car,
+)
+from sockets.crossroad_geofence import CrossroadGeofence, order_along_route
+from sockets.route_progress import RouteProgress
+
+from sockets.offload import (
+    bind_app,
+    run_db,
+    submit_csv,
+    spawn,
+    monitor_loop_lag,
+    run_route_analysis,
+    warm_route_executor,
+    RecorderStage,
 )
-
 from utils.video_recorder import VideoRecorder
+from utils.frame_pipeline import Frame
 from utils.csv_logger import start_csv_logging, log_position, stop_csv_logging, set_eta_time
 # 🔽 YOLO 워커 관련 추가
-from utils.yolo_worker import start_yolo_worker, enqueue_frame, update_car_gps,set_run_start_time
+from utils.yolo_worker import start_yolo_worker, enqueue_frame, update_car_gps,set_run_start_time, release_car
 
-# 차량별 비디오 레코더
-recorders: dict[str, VideoRecorder] = {}
+logger = get_logger("ws")
+
+# 차량별 비디오 레코더 (전용 스레드 stage 로 감쌈)
+recorders: dict[str, RecorderStage] = {}
 
 # 차량별 예상 교차로 (경로 기반 분석 결과)
 expected_crossroads: dict[str, list[dict]] = {}
 
+# 차량별 예상 교차로 지오펜스 (current 갱신마다 활성/다음 교차로만 검사)
+crossroad_geofences: dict[str, CrossroadGeofence] = {}
+
+# 차량별 경로 진행률 / 실시간 ETA
+route_progress: dict[str, RouteProgress] = {}
+
+# 차량별 진행 중인 경로 분석 task (새 경로가 오면 이전 것은 취소)
+_route_jobs: dict[str, asyncio.Task] = {}
+
 # 교차로 정보
-crossroad_df = load_crossroad_csv("static/crossroad_map/CrossroadMap.csv")
+CROSSROAD_CSV = "static/crossroad_map/CrossroadMap.csv"
+# 경로가 교차로를 지난다고 볼 반경 (m)
+CROSSROAD_RADIUS = 50
+crossroad_df = load_crossroad_csv(CROSSROAD_CSV)
+# 교차로 공간 인덱스 (서버 시작 시 1회 생성)
+crossroad_index = get_crossroad_index(crossroad_df)
 
 # WebSocket 서버
 clients: set[websockets.WebSocketServerProtocol] = set()
 
+WS_CLIENTS.set_function(lambda: len(clients))
+
+# ✅ 클라이언트별 송신 큐 (writer task)
+senders: dict[websockets.WebSocketServerProtocol, ClientSender] = {}
+
 # ✅ 각 WebSocket 연결이 어떤 차량인지 매핑
 ws_car_map: dict[websockets.WebSocketServerProtocol, str] = {}
 
 # ✅ YOLO 워커 같은 다른 스레드에서 쓸 이벤트 루프 저장용
 _ws_loop: asyncio.AbstractEventLoop | None = None
 
+# ✅ 멀티 프로세스 모드 브리지 (허브: BridgeHub / ingest 워커: BridgeClient / 단일 프로세스: None)
+_bridge: BridgeHub | BridgeClient | None = None
+
+# 허브: ingest 워커별 최근 클라이언트 통계 (워커가 M 프레임으로 주기적으로 보냄)
+_worker_clients: dict[int, list] = {}
+
+# 허브: conn_id → 차량 연결 websocket (워커 응답을 돌려줄 대상)
+_hub_conns: dict[int, websockets.WebSocketServerProtocol] = {}
+_hub_conn_ids = itertools.count(1)
+
+# ✅ 로컬 시청자들의 구독 관심 목록 (영상 티어별 키 포함, 구독/티어 변경 시 루프에서 통째로 교체)
+_local_interest: dict = {}
+
+# 축소 티어 변환(디코드 공유 + 리사이즈 + JPEG) 전용 스레드
+_tier_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ws-tier")
+
 # ⬇⬇⬇ 여기 추가
 def broadcast_from_thread(data: dict):
     global _ws_loop
     if _ws_loop is None:
-        print("⚠️ broadcast_from_thread: 이벤트 루프 준비 안 됨")
+        logger.warning("⚠️ broadcast_from_thread: 이벤트 루프 준비 안 됨")
         return
     asyncio.run_coroutine_threadsafe(broadcast_dict(data), _ws_loop)
 
-async def broadcast_dict(data: dict):
+
+def active_frame_tiers(event: str, car_no: str) -> list:
+    """
+    지금 프레임을 만들어야 하는 영상 티어 (보는 사람이 있고 fps 간격이 지난 것만)
+    다른 스레드에서 불러도 됨 (관심 목록은 통째로 교체되는 dict)
+    """
+    tiers = video_tiers.tiers_in(_local_interest, event, car_no)
+    if _bridge is not None and _bridge.role == "worker":
+        for t in video_tiers.tiers_in(remote_interest(), event, car_no):
+            if t not in tiers:
+                tiers.append(t)
+    return video_tiers.due_tiers(event, car_no, tiers)
+
+
+def broadcast_frame_from_thread(event: str, car_no: str, image, tiers: list):
+    """
+    YOLO 워커 등 다른 스레드에서 영상 프레임 송출
+    - tiers: active_frame_tiers() 결과 (비어 있으면 그리기/인코딩 자체를 생략할 수 있음)
+    - 티어별 축소/JPEG/envelope 직렬화는 호출한 스레드에서 끝내고 루프에는 bytes 만 넘김
+    """
+    if _ws_loop is None:
+        logger.warning("⚠️ broadcast_frame_from_thread: 이벤트 루프 준비 안 됨")
+        return
+    for t in tiers:
+        b64 = video_tiers.render(image, t)
+        if b64 is None:
+            continue
+        payload = encode_frame_envelope(event, car_no, b64, t.name)
+        _ws_loop.call_soon_threadsafe(broadcast_encoded, payload, event, car_no, t.name)
+
+
+def broadcast_encoded(payload: bytes, event: str | None, car: str | None, tier: str | None = None):
+    """
+    이미 직렬화된 payload(bytes)를 구독자 큐에 그대로 적재
+    (모든 수신자가 같은 bytes 객체를 공유 → 수신자 수와 무관하게 인코딩 1회)
+    ingest 워커에서는 허브로도 같은 bytes 를 넘겨 허브 쪽 대시보드에 송출
+    """
+    if _bridge is not None and _bridge.role == "worker":
+        _bridge.publish_broadcast(payload, event, car, droppable=event in HEAVY_EVENTS, tier=tier)
     if not clients:
         return
-    msg = json.dumps(data, ensure_ascii=False)
-    await asyncio.gather(
-        *[c.send(msg) for c in list(clients)],
-        return_exceptions=True,
-    )
+    targets = get_recipients(event, car, list(clients))
+    if event in HEAVY_EVENTS:
+        targets = _tier_targets(targets, tier)
+    _fanout(targets, payload, event, car)
+
+
+def _tier_targets(targets: list, tier: str | None) -> list:
+    """영상 시청자 중 현재 티어가 tier 인 소켓만 (송신 밀림에 따른 티어 조정도 여기서)"""
+    now = time.monotonic()
+    changed = False
+    out = []
+    for ws in targets:
+        sender = senders.get(ws)
+        if sender is None:
+            continue
+        if sender.adapt_tier(now):
+            changed = True
+            logger.info(
+                "📉 영상 티어 조정: client=%s → %s (요청 %s)",
+                id(ws), sender.tier.current, sender.tier.requested,
+            )
+        if tier is None or sender.tier.current == tier:
+            out.append(ws)
+    if changed:
+        _publish_interest()
+    return out
+
+
+def _fanout(targets: list, payload: bytes, event: str | None, car: str | None):
+    if not targets:
+        return
+    t0 = time.perf_counter()
+    # ✅ 클라이언트별 큐에 넣기만 함 (실제 전송은 각 writer task)
+    n = 0
+    for c in targets:
+        sender = senders.get(c)
+        if sender is not None:
+            sender.enqueue(payload, event, car)
+            n += 1
+    ev = event or "none"
+    WS_BROADCAST_SECONDS.labels(ev).time_since(t0)
+    WS_BROADCAST_BYTES.labels(ev).inc(len(payload) * n)
+    WS_BROADCAST_RECIPIENTS.labels(ev).inc(n)
 
 
-async def ws_handler(websocket):
-    print("🔌 WebSocket Client Connected")
-    clients.add(websocket)
+async def broadcast_dict(data: dict):
+    event = data.get("event")
+    car = data.get("car")
+    if _bridge is not None and _bridge.role == "worker":
+        broadcast_encoded(dumps_bytes(data), event, car)
+        return
+    if not clients:
+        return
+    # ✅ 구독 라우팅: event / car 가 맞는 클라이언트에게만 전송
+    targets = get_recipients(event, car, list(clients))
+    if not targets:
+        return
+    _fanout(targets, dumps_bytes(data), event, car)
+
 
+async def broadcast_frame(event: str, car_no: str, frame: Frame):
+    """
+    수신 영상 프레임 송출 (보는 사람이 있는 티어만)
+    - 원본 티어: base64 문자열을 복사/escape 없이 envelope 만 씌워서 1회 인코딩
+    - 축소 티어: 공유 Frame 디코드 결과로 티어 스레드에서 리사이즈 + JPEG
+    """
+    tiers = active_frame_tiers(event, car_no)
+    if not tiers:
+        return
+    scaled = []
+    for t in tiers:
+        if t.max_width is None:
+            payload = encode_frame_envelope(event, car_no, frame.b64, t.name)
+            broadcast_encoded(payload, event, car_no, t.name)
+        else:
+            scaled.append(t)
+    if scaled:
+        _tier_executor.submit(_render_scaled_tiers, event, car_no, frame.retain(), scaled)
+
+
+def _render_scaled_tiers(event: str, car_no: str, frame: Frame, tiers: list):
     try:
-        async for msg in websocket:
-            try:
-                data = json.loads(msg)
-            except Exception as e:
-                print("⚠️ JSON 파싱 실패:", e, msg[:120])
-                continue
+        image = frame.image()
+        if image is not None:
+            broadcast_frame_from_thread(event, car_no, image, tiers)
+    except Exception as e:
+        logger.warning("⚠️ 영상 티어 변환 실패: %s", e, extra={"rate_limit": 5})
+    finally:
+        frame.release()
+
+
+def get_client_stats() -> list[dict]:
+    """
+    클라이언트별 송신 큐 깊이 / 드롭 통계
+    허브면 ingest 워커에 직접 붙은 클라이언트도 포함 (worker 필드, 최대 WS_WORKER_METRICS_INTERVAL 초 전 값)
+    """
+    out = []
+    for ws, sender in list(senders.items()):
+        st = sender.stats()
+        st["car"] = ws_car_map.get(ws)
+        out.append(st)
+    for worker_id, stats in list(_worker_clients.items()):
+        out.extend({**st, "worker": worker_id} for st in stats)
+    return out
+
+
+def _hub_on_metrics(worker_id: int, snapshot: dict | None):
+    """워커 지표 스냅샷 수신 (None = 워커 연결 끊김 → 이전 값 제거)"""
+    if snapshot is None:
+        _worker_clients.pop(worker_id, None)
+        set_remote_samples(str(worker_id), None)
+        return
+    _worker_clients[worker_id] = snapshot.get("clients") or []
+    set_remote_samples(str(worker_id), snapshot.get("samples") or {})
 
-            t = data.get("type")
 
-            if t != "video":
-                print("📥 WS 메시지 수신:", msg[:120])
-                print(f"📡 [WS 수신] type={t}, keys={list(data.keys())}")
+async def publish_worker_metrics(worker_id: int, interval: float):
+    """ingest 워커: interval 초마다 지표 샘플(worker 라벨) + 클라이언트 통계를 허브로"""
+    while True:
+        await asyncio.sleep(interval)
+        if _bridge is not None and _bridge.role == "worker":
+            _bridge.publish_metrics({
+                "samples": render_samples("worker", worker_id),
+                "clients": get_client_stats(),
+            })
 
-            # --------------------------------------------------
-            # 1) 출발 이벤트
-            # --------------------------------------------------
-            if t == "start":
-                try:
-                    car_no = data.get("car")
-                    start_time_str = data.get("start_time") or data.get("time")
 
-                    start_time = datetime.strptime(
-                        start_time_str, "%Y-%m-%d %H:%M:%S"
-                    )
+# ---------- 프로세스 간 공유 상태 (멀티 프로세스 모드) ----------
 
-                    normalized_car_no = normalize_car_no(car_no)
-                    timestamp = start_time.strftime("%Y%m%d_%H%M%S")
-                    file_name = f"{normalized_car_no}_{timestamp}.mp4"
 
-                    log = AmbulanceLog(
-                        car_no=car_no,
-                        start_time=start_time,
-                        video_url=file_name,
-                    )
-                    db.session.merge(log)
-                    db.session.commit()
-
-                    print(f"✅ DB INSERT: {car_no}, 출발={start_time}, 파일명={file_name}")
-
-                    # VideoRecorder
-                    try:
-                        rec = VideoRecorder(car_no, start_time)
-                        recorders[car_no] = rec
-                        print(f"🎥 VideoRecorder 생성 완료: {car_no}")
-                    except Exception as e:
-                        print("❌ VideoRecorder 생성 실패:", e)
-
-                    # ✅ 이 WebSocket이 어떤 차량인지 매핑
-                    if car_no:
-                        ws_car_map[websocket] = car_no
-                        print(f"🔗 WebSocket ↔ 차량 매핑: {websocket} -> {car_no}")
-
-                    # CSV 로깅 시작
-                    try:
-                        start_csv_logging(car_no, start_time, eta_time=None)
-                    except Exception as e:
-                        print("⚠️ CSV start 실패:", e)
-
-                    # 🔥 YOLO 워커 출동 시작 시간 설정 (여기가 핵심)
-                    try:
-                        set_run_start_time(car_no, start_time)
-                    except Exception as e:
-                        print("⚠️ YOLO set_run_start_time 실패:", e)
-
-
-                    out = {
-                        "event": "ambulance_start",
-                        **data,
-                    }
-                    await broadcast_dict(out)
-
-                except Exception as e:
-                    print("❌ start 처리 오류:", e)
-
-            # --------------------------------------------------
-            # 2) 도착 이벤트
-            # --------------------------------------------------
-            elif t == "arrival":
-                try:
-                    car_no = data.get("car")
-                    start_time_str = data.get("start_time")  # or latest 찾기
-                    arrival_time_str = data.get("arrival_time") or data.get("time")
-
-                    arrival_time = datetime.strptime(
-                        arrival_time_str, "%Y-%m-%d %H:%M:%S"
-                    )
+def _sync_state(op: str, car: str, value=None):
+    """
+    차량 상태 변경을 허브로 전파 (허브가 다른 워커들에게 중계)
+    op: route / crossroads / arrival / position
+    """
+    if _bridge is not None and _bridge.role == "worker":
+        _bridge.publish_state({"op": op, "car": car, "value": value})
 
-                    start_time = None
 
-                    if start_time_str:
-                        start_time = datetime.strptime(
-                            start_time_str, "%Y-%m-%d %H:%M:%S"
-                        )
-                        log = db.session.get(AmbulanceLog, (car_no, start_time))
-                    else:
-                        log = (
-                            db.session.query(AmbulanceLog)
-                            .filter(AmbulanceLog.car_no == car_no)
-                            .order_by(AmbulanceLog.start_time.desc())
-                            .first()
-                        )
-                        if log:
-                            start_time = log.start_time
-
-                    if log:
-                        log.arrival_time = arrival_time
-                        db.session.commit()
-                        print(f"✅ DB UPDATE(도착): {car_no}, 도착={arrival_time}")
-                    else:
-                        print("⚠️ 도착 로그 업데이트 대상 없음:", car_no)
-
-                    # VideoRecorder 종료
-                    rec = recorders.pop(car_no, None)
-                    if rec:
-                        print(f"🎥 {car_no} VideoRecorder 종료 및 업로드")
-                        rec.close_and_upload()
-                    else:
-                        print(f"⚠️ {car_no} 에 대한 VideoRecorder 없음")
-
-                    # CSV summary + 업로드
-                    try:
-                        stop_csv_logging(arrival_time)
-                    except Exception as e:
-                        print("⚠️ CSV stop 실패:", e)
-
-                    if car_no:
-                        expected_crossroads.pop(car_no, None)
-
-                    out = {
-                        "event": "ambulance_arrival",
-                        "car": car_no,
-                        "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S") if start_time else None,
-                        "arrival_time": arrival_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    }
-                    await broadcast_dict(out)
-
-                except Exception as e:
-                    print("❌ arrival 처리 오류:", e)
-
-            # --------------------------------------------------
-            # 3) 경로 이벤트
-            # --------------------------------------------------
-            elif t == "route":
-                try:
-                    route_points = data.get("route_points") or data.get("path") or []
-                    norm_points = []
-                    for p in route_points:
-                        if isinstance(p, (list, tuple)) and len(p) >= 2:
-                            norm_points.append({"lat": float(p[0]), "lng": float(p[1])})
-                        elif isinstance(p, dict):
-                            norm_points.append(
-                                {
-                                    "lat": float(p.get("lat")),
-                                    "lng": float(p.get("lng")),
-                                }
-                            )
-
-                    data["route_points"] = norm_points
-
-                    print("🚑 경로 좌표 샘플:", norm_points[:2])
-
-                    car_no = data.get("car")
-
-                    # ✅ 여기서 구급차 polyline 저장
-                    if car_no:
-                        ambulance_routes[car_no] = norm_points
-                        print(f"🗺 구급차 경로 저장 완료: car={car_no}, points={len(norm_points)}")
-
-                    # duration(초) → ETA 계산
-                    duration_sec = data.get("duration")
-
-                    if car_no and duration_sec is not None:
-                        try:
-                            log = (
-                                db.session.query(AmbulanceLog)
-                                .filter(AmbulanceLog.car_no == car_no)
-                                .order_by(AmbulanceLog.start_time.desc())
-                                .first()
-                            )
-
-                            if log and log.start_time:
-                                eta_time = log.start_time + timedelta(seconds=int(duration_sec))
-                                set_eta_time(eta_time)
-                                print(
-                                    f"🕒 ETA 설정 완료: car={car_no}, "
-                                    f"start={log.start_time}, duration={duration_sec}s, eta={eta_time}"
-                                )
-                            else:
-                                print("⚠️ ETA 계산용 start_time 로그를 찾지 못함:", car_no)
-                        except Exception as e:
-                            print("⚠️ ETA 계산/저장 실패:", e)
-
-                    if car_no:
-                        crossroads = compute_crossroad_directions(
-                            norm_points,
-                            crossroad_df,
-                            radius=50,
-                        )
+def _apply_shared_state(state: dict):
+    """다른 프로세스에서 온 상태 변경을 로컬 사본에 반영"""
+    op = state.get("op")
+    car = state.get("car")
+    value = state.get("value")
+    if not car:
+        return
+    if op == "route":
+        set_ambulance_route(car, value)
+    elif op == "crossroads":
+        expected_crossroads[car] = value
+    elif op == "arrival":
+        expected_crossroads.pop(car, None)
+        crossroad_geofences.pop(car, None)
+        route_progress.pop(car, None)
+        remove_ambulance_route(car)
+    elif op == "position":
+        update_ambulance_position(car, value["lat"], value["lng"], value.get("speed"), lane=value.get("lane"))
+
+
+def _sender_tier(ws):
+    sender = senders.get(ws)
+    return sender.tier.current if sender is not None else None
+
+
+def _publish_interest():
+    """
+    구독/영상 티어가 바뀌면 관심 목록 갱신
+    허브는 워커들에게도 전달 (아무도 안 보는 영상/티어는 워커가 인코딩 안 함)
+    """
+    global _local_interest
+    _local_interest = interest_snapshot(_sender_tier)
+    if _bridge is not None and _bridge.role == "hub":
+        _bridge.publish_interest(_local_interest)
+
+
+def _geofence_for(car_no: str, crossroads: list[dict]) -> CrossroadGeofence:
+    """
+    차량의 지오펜스 (예상 교차로 리스트가 바뀌었으면 다시 생성)
+    다른 프로세스에서 동기화된 리스트도 현재 status 에서 이어서 감시
+    """
+    fence = crossroad_geofences.get(car_no)
+    if fence is None or fence.crossroads is not crossroads:
+        fence = crossroad_geofences[car_no] = CrossroadGeofence(crossroads)
+    return fence
+
+
+def _progress_for(car_no: str) -> RouteProgress | None:
+    """차량의 경로 진행 상태 (경로가 없으면 None, 다른 프로세스에서 경로가 바뀌었으면 새로 생성)"""
+    route = ambulance_routes.get(car_no)
+    if route is None or not len(route):
+        route_progress.pop(car_no, None)
+        return None
+    index = route_index(route)
+    progress = route_progress.get(car_no)
+    if progress is None or progress.index is not index:
+        progress = route_progress[car_no] = RouteProgress(index)
+    return progress
+
+
+# ---------- DB 작업 (offload 스레드에서 실행) ----------
+
+
+def _db_insert_start_log(car_no: str, start_time: datetime, file_name: str):
+    log = AmbulanceLog(
+        car_no=car_no,
+        start_time=start_time,
+        video_url=file_name,
+    )
+    db.session.merge(log)
+    db.session.commit()
+
+
+def _db_latest_log_start(car_no: str):
+    log = (
+        db.session.query(AmbulanceLog)
+        .filter(AmbulanceLog.car_no == car_no)
+        .order_by(AmbulanceLog.start_time.desc())
+        .first()
+    )
+    return log.start_time if log else None
+
+
+def _db_update_arrival(car_no: str, start_time: datetime | None, arrival_time: datetime):
+    """
+    도착 시각 기록. (log 존재 여부, start_time) 반환
+    start_time 이 없으면 해당 차량의 최신 출동 로그를 찾음
+    """
+    if start_time:
+        log = db.session.get(AmbulanceLog, (car_no, start_time))
+    else:
+        log = (
+            db.session.query(AmbulanceLog)
+            .filter(AmbulanceLog.car_no == car_no)
+            .order_by(AmbulanceLog.start_time.desc())
+            .first()
+        )
+        if log:
+            start_time = log.start_time
+
+    if log:
+        log.arrival_time = arrival_time
+        db.session.commit()
+    return log is not None, start_time
+
+
+async def _finish_recording(car_no: str, stage: RecorderStage):
+    """도착 후 녹화 종료 + ffmpeg + S3 업로드 (다른 연결을 막지 않도록 백그라운드)"""
+    try:
+        await stage.close_and_upload()
+        logger.info("🎥 %s 녹화 종료/업로드 처리 완료", car_no)
+    except Exception as e:
+        logger.error("❌ %s 녹화 종료/업로드 실패: %s", car_no, e)
+
+
+# ================================================================
+# 메시지 타입별 핸들러 (sockets.messages.HANDLERS 에 등록)
+# ================================================================
+
+# --------------------------------------------------
+# 0) 구독 등록 / 해제 (대시보드, YOLO 디버그 페이지)
+# --------------------------------------------------
+@handler("subscribe", SubscribeMsg)
+async def on_subscribe(websocket, msg: SubscribeMsg, data: dict):
+    ack = subscribe(websocket, msg.events, msg.cars)
+    sender = senders.get(websocket)
+    if sender is not None:
+        sender.tier.request(msg.tier)
+        ack["tier"] = sender.tier.requested
+    logger.info("📮 구독 등록: events=%s, cars=%s, tier=%s", ack["events"], ack["cars"] or "*", ack.get("tier"))
+    _publish_interest()
+    await websocket.send(dumps_bytes(ack), text=True)
+
+
+@handler("unsubscribe")
+async def on_unsubscribe(websocket, msg: dict, data: dict):
+    unsubscribe(websocket)
+    _publish_interest()
+
+
+# --------------------------------------------------
+# 1) 출발 이벤트
+# --------------------------------------------------
+@handler("start", StartMsg)
+async def on_start(websocket, msg: StartMsg, data: dict):
+    try:
+        car_no = msg.car
+        start_time = msg.start_time
+
+        normalized_car_no = normalize_car_no(car_no)
+        timestamp = start_time.strftime("%Y%m%d_%H%M%S")
+        file_name = f"{normalized_car_no}_{timestamp}.mp4"
+
+        await run_db(_db_insert_start_log, car_no, start_time, file_name)
+
+        logger.info("✅ DB INSERT: %s, 출발=%s, 파일명=%s", car_no, start_time, file_name)
+
+        # VideoRecorder
+        try:
+            rec = VideoRecorder(car_no, start_time)
+            recorders[car_no] = RecorderStage(rec)
+            logger.info("🎥 VideoRecorder 생성 완료: %s", car_no)
+        except Exception as e:
+            logger.error("❌ VideoRecorder 생성 실패: %s", e)
+
+        # ✅ 이 WebSocket이 어떤 차량인지 매핑
+        if car_no:
+            ws_car_map[websocket] = car_no
+            logger.info("🔗 WebSocket ↔ 차량 매핑: %s -> %s", websocket, car_no)
+
+        # CSV 로깅 시작 (파일 생성은 CSV 스레드에서)
+        submit_csv(start_csv_logging, car_no, start_time, None)
+
+        # 🔥 YOLO 워커 출동 시작 시간 설정 (여기가 핵심)
+        try:
+            set_run_start_time(car_no, start_time)
+        except Exception as e:
+            logger.warning("⚠️ YOLO set_run_start_time 실패: %s", e)
+
+        out = {
+            "event": "ambulance_start",
+            **data,
+        }
+        await broadcast_dict(out)
+
+    except Exception as e:
+        logger.error("❌ start 처리 오류: %s", e)
+
+
+# --------------------------------------------------
+# 2) 도착 이벤트
+# --------------------------------------------------
+@handler("arrival", ArrivalMsg)
+async def on_arrival(websocket, msg: ArrivalMsg, data: dict):
+    try:
+        car_no = msg.car
+        arrival_time = msg.arrival_time
+
+        # start_time 이 없으면 DB 에서 최신 출동 로그 찾기
+        found, start_time = await run_db(
+            _db_update_arrival, car_no, msg.start_time, arrival_time
+        )
+
+        if found:
+            logger.info("✅ DB UPDATE(도착): %s, 도착=%s", car_no, arrival_time)
+        else:
+            logger.warning("⚠️ 도착 로그 업데이트 대상 없음: %s", car_no)
+
+        # VideoRecorder 종료 (ffmpeg + S3 는 백그라운드에서)
+        rec = recorders.pop(car_no, None)
+        if rec:
+            logger.info("🎥 %s VideoRecorder 종료 및 업로드", car_no)
+            spawn(_finish_recording(car_no, rec))
+        else:
+            logger.warning("⚠️ %s 에 대한 VideoRecorder 없음", car_no)
+
+        # CSV summary + 업로드 (CSV 스레드에서)
+        submit_csv(stop_csv_logging, arrival_time)
+
+        if car_no:
+            job = _route_jobs.pop(car_no, None)
+            if job is not None:
+                job.cancel()
+            expected_crossroads.pop(car_no, None)
+            crossroad_geofences.pop(car_no, None)
+            route_progress.pop(car_no, None)
+            remove_ambulance_route(car_no)
+            _sync_state("arrival", car_no)
+            video_tiers.forget_car(car_no)
+            # YOLO 차량별 tracker / 신고 상태 해제
+            release_car(car_no)
+
+        out = {
+            "event": "ambulance_arrival",
+            "car": car_no,
+            "start_time": start_time.strftime(TIME_FORMAT) if start_time else None,
+            "arrival_time": arrival_time.strftime(TIME_FORMAT),
+        }
+        await broadcast_dict(out)
+
+    except Exception as e:
+        logger.error("❌ arrival 처리 오류: %s", e)
+
+
+# --------------------------------------------------
+# 3) 경로 이벤트
+# --------------------------------------------------
+async def _analyze_route_for(car_no: str, points: np.ndarray, duration_sec):
+    """
+    경로 분석 (캐시 → 없으면 프로세스 풀) 후 차량 상태 반영 + 예상 교차로 브로드캐스트
+    같은 차량의 새 route / arrival 이 오면 이 task 는 취소되거나 결과를 버림
+    """
+    try:
+        key, result = route_cache_lookup(points, CROSSROAD_RADIUS)
+        if result is None:
+            result = route_cache_store(
+                key,
+                await run_route_analysis(analyze_route_job, points, CROSSROAD_CSV, CROSSROAD_RADIUS),
+            )
+    except asyncio.CancelledError:
+        logger.info("🧭 이전 경로 분석 취소: car=%s", car_no)
+        raise
+    except Exception as e:
+        logger.warning("⚠️ 경로 분석 실패: car=%s, %s", car_no, e)
+        return
 
-                        for c in crossroads:
-                            c["status"] = "pending"
+    if _route_jobs.get(car_no) is not asyncio.current_task():
+        return
+    _apply_route_analysis(car_no, result, duration_sec, len(points))
+
+    await broadcast_dict(
+        {
+            "event": "ambulance_expected_crossroads",
+            "car": car_no,
+            "crossroads": expected_crossroads[car_no],
+        }
+    )
 
-                        expected_crossroads[car_no] = crossroads
 
-                        print("🚦 예상 교차로 및 접근 방향:")
-                        for c in crossroads:
-                            print(
-                                f"  - {c['name']}: {c['explain']} "
-                                f"(진입={c['in_dir']} → 이탈={c['out_dir']}, turn={c['turn']})"
-                            )
-                    else:
-                        print("⚠️ route 데이터에 car 필드가 없음:", data)
+def _apply_route_analysis(car_no: str, result: RouteAnalysis, duration_sec, n_raw: int):
+    # ✅ 구급차 polyline 저장 (+ 선분 인덱스 생성)
+    #    교차로 반경 안의 점은 유지하고 단순화 + 등간격 보간한 배열
+    route_idx = set_ambulance_route(car_no, result.route)
+    _sync_state("route", car_no, result.route.tolist())
+    logger.info("🗺 구급차 경로 저장 완료: car=%s, points=%d → %d", car_no, n_raw, len(result.route))
 
-                    ack = {
-                        "type": "success",
-                        "status": "success",
-                    }
-                    await websocket.send(json.dumps(ack, ensure_ascii=False))
+    # 실시간 ETA 는 경로 진행률 엔진이 갱신 (초기 속도 = 경로 길이 / duration)
+    if route_idx is not None:
+        route_progress[car_no] = RouteProgress(route_idx, duration_sec)
+    else:
+        route_progress.pop(car_no, None)
 
-                    out = {
-                        "event": "ambulance_route",
-                        **data,
-                    }
-                    await broadcast_dict(out)
+    crossroads = result.crossroads
+    for c in crossroads:
+        c["status"] = "pending"
+
+    # 경로상 위치 순으로 정렬 → 지오펜스는 앞에서부터 차례로 감시
+    order_along_route(crossroads, route_idx)
+    expected_crossroads[car_no] = crossroads
+    crossroad_geofences[car_no] = CrossroadGeofence(crossroads)
+    _sync_state("crossroads", car_no, crossroads)
+
+    logger.info("🚦 예상 교차로 및 접근 방향: car=%s, %d개", car_no, len(crossroads))
+    for c in crossroads:
+        logger.debug(
+            "  - %s: %s (진입=%s → 이탈=%s, turn=%s)",
+            c["name"], c["explain"], c["in_dir"], c["out_dir"], c["turn"],
+        )
+
+
+def _forget_route_job(car_no: str, task: asyncio.Task):
+    if _route_jobs.get(car_no) is task:
+        _route_jobs.pop(car_no, None)
+
+
+@handler("route", RouteMsg, reply_errors=True)
+async def on_route(websocket, msg: RouteMsg, data: dict):
+    try:
+        norm_points = msg.points
+        data["route_points"] = norm_points
+
+        logger.info("🚑 경로 좌표 샘플: %s", norm_points[:2])
+
+        car_no = msg.car
+        duration_sec = msg.duration
+
+        # ✅ 기하 연산은 루프 밖에서 → ack / 경로 브로드캐스트 먼저
+        ack = {
+            "type": "success",
+            "status": "success",
+        }
+        await websocket.send(dumps_bytes(ack), text=True)
+
+        out = {
+            "event": "ambulance_route",
+            **data,
+        }
+        await broadcast_dict(out)
+
+        if car_no:
+            # 같은 차량의 이전 경로 분석은 취소 (재탐색으로 새 경로가 온 경우)
+            prev = _route_jobs.pop(car_no, None)
+            if prev is not None and not prev.done():
+                prev.cancel()
+            task = _route_jobs[car_no] = spawn(
+                _analyze_route_for(car_no, as_latlng_array(norm_points), duration_sec)
+            )
+            task.add_done_callback(lambda t, car=car_no: _forget_route_job(car, t))
+        else:
+            logger.warning("⚠️ route 데이터에 car 필드가 없음: %s", data)
+
+        # duration(초) → ETA 계산
+        if car_no and duration_sec is not None:
+            try:
+                log_start = await run_db(_db_latest_log_start, car_no)
+
+                if log_start:
+                    eta_time = log_start + timedelta(seconds=int(duration_sec))
+                    submit_csv(set_eta_time, eta_time)
+                    logger.info(
+                        f"🕒 ETA 설정 완료: car={car_no}, "
+                        f"start={log_start}, duration={duration_sec}s, eta={eta_time}"
+                    )
+                else:
+                    logger.warning("⚠️ ETA 계산용 start_time 로그를 찾지 못함: %s", car_no)
+            except Exception as e:
+                logger.warning("⚠️ ETA 계산/저장 실패: %s", e)
+
+    except Exception as e:
+        logger.warning("⚠️ route 처리 오류: %s", e)
+        err_msg = {
+            "type": "error",
+            "error": str(e),
+        }
+        await websocket.send(dumps_bytes(err_msg), text=True)
+
+
+# --------------------------------------------------
+# 4) 앰뷸런스 현재 위치
+# --------------------------------------------------
+@handler("current", CurrentMsg)
+async def on_current(websocket, msg: CurrentMsg, data: dict):
+    logger.debug("🚑 current 수신: %s", data)
+    car_no = msg.car
+    lat = msg.lat
+    lon = msg.lng
+    speed = msg.speed
+
+    # ✅ YOLO 워커에 GPS 업데이트
+    if car_no:
+        update_car_gps(car_no, lat, lon)
+
+    # ✅ HTTP 폴링용 최신 위치 저장
+    if car_no and lat is not None and lon is not None:
+        update_ambulance_position(car_no, lat, lon, speed, lane=2)
+        _sync_state("position", car_no, {"lat": lat, "lng": lon, "speed": speed, "lane": 2})
+
+    # CSV 로그 기록 (파일 쓰기는 CSV 스레드에서)
+    if car_no and lat is not None and lon is not None:
+        try:
+            ts = datetime.now()
+            submit_csv(log_position, ts, car_no, lat, lon, speed)
+        except Exception as e:
+            logger.warning("⚠️ CSV 위치 로그 실패: %s", e)
+
+    if lat is not None and lon is not None and car_no:
+        try:
+            # 경로상 위치 / 평활 속도 갱신 (직전 위치 주변 선분만 검사)
+            progress = _progress_for(car_no)
+            offset = progress.update(lat, lon) if progress is not None else None
+
+            crossroads = expected_crossroads.get(car_no, [])
+            if not crossroads:
+                logger.debug("🚦 차량 %s에 대해 저장된 expected_crossroads 없음", car_no)
+            else:
+                # 활성 + 다음 교차로만 검사 (경로 길이와 무관)
+                events = _geofence_for(car_no, crossroads).update(lat, lon, offset)
+                for kind, c, d in events:
+
+                    if kind == "approach":
+                        logger.info(
+                            f"⚠️ 교차로 접근 알림: {c['name']} "
+                            f"(진입={c['in_dir']} → 이탈={c['out_dir']}, "
+                            f"turn={c['turn']}, 거리={d:.1f}m)"
+                        )
 
-                    if car_no:
                         await broadcast_dict(
                             {
-                                "event": "ambulance_expected_crossroads",
+                                "event": "ambulance_crossroad_approach",
                                 "car": car_no,
-                                "crossroads": expected_crossroads[car_no],
+                                "crossroad_id": c["id"],
+                                "crossroad_name": c["name"],
+                                "turn": c.get("turn"),
+                                "in_dir": c.get("in_dir"),
+                                "out_dir": c.get("out_dir"),
+                                "explain": c.get("explain"),
+                                "distance": round(d, 1),
+                                "timestamp": datetime.now().isoformat(),
                             }
                         )
 
-                except Exception as e:
-                    print("⚠️ route 처리 오류:", e)
-                    err_msg = {
-                        "type": "error",
-                        "error": str(e),
-                    }
-                    await websocket.send(json.dumps(err_msg, ensure_ascii=False))
-
-            # --------------------------------------------------
-            # 4) 앰뷸런스 현재 위치
-            # --------------------------------------------------
-            elif t == "current":
-                print("🚑 current 수신:", data)
-                current = data.get("current", {})
-                lat_raw = current.get("lat")
-                lon_raw = current.get("lng")
-                speed = data.get("speed")
-                car_no = data.get("car")
-
-                # ✅ 숫자 변환
-                lat = float(lat_raw) if lat_raw is not None else None
-                lon = float(lon_raw) if lon_raw is not None else None
-
-                # ✅ YOLO 워커에 GPS 업데이트
-                if car_no:
-                    update_car_gps(car_no, lat, lon)
-
-                # ✅ HTTP 폴링용 최신 위치 저장
-                if car_no and lat is not None and lon is not None:
-                    update_ambulance_position(
-                        car_no,
-                        lat,
-                        lon,
-                        float(speed) if speed is not None else None,
-                        lane=2,
-                    )
+                    elif kind == "arrived":
+                        logger.info("🚦 교차로 도착: %s (거리=%.1fm)", c["name"], d)
 
-                # CSV 로그 기록
-                if car_no and lat is not None and lon is not None:
-                    try:
-                        ts = datetime.now()
-                        log_position(
-                            ts,
-                            car_no,
-                            lat,
-                            lon,
-                            float(speed) if speed is not None else None,
+                        await broadcast_dict(
+                            {
+                                "event": "ambulance_crossroad_arrived",
+                                "car": car_no,
+                                "crossroad_id": c["id"],
+                                "crossroad_name": c["name"],
+                                "distance": round(d, 1),
+                                "timestamp": datetime.now().isoformat(),
+                            }
                         )
-                    except Exception as e:
-                        print("⚠️ CSV 위치 로그 실패:", e)
-
-                if lat is not None and lon is not None and car_no:
-                    try:
-                        lat_f, lon_f = lat, lon
-
-                        crossroads = expected_crossroads.get(car_no, [])
-                        if not crossroads:
-                            print(
-                                f"🚦 차량 {car_no}에 대해 저장된 expected_crossroads 없음"
-                            )
-                        else:
-                            for c in crossroads:
-                                d = haversine(lat_f, lon_f, c["lat"], c["lon"])
-
-                                if c["status"] == "pending" and d <= 300:
-                                    print(
-                                        f"⚠️ 교차로 접근 알림: {c['name']} "
-                                        f"(진입={c['in_dir']} → 이탈={c['out_dir']}, "
-                                        f"turn={c['turn']}, 거리={d:.1f}m)"
-                                    )
-                                    c["status"] = "approaching"
-
-                                    await broadcast_dict(
-                                        {
-                                            "event": "ambulance_crossroad_approach",
-                                            "car": car_no,
-                                            "crossroad_id": c["id"],
-                                            "crossroad_name": c["name"],
-                                            "turn": c.get("turn"),
-                                            "in_dir": c.get("in_dir"),
-                                            "out_dir": c.get("out_dir"),
-                                            "explain": c.get("explain"),
-                                            "distance": round(d, 1),
-                                            "timestamp": datetime.now().isoformat(),
-                                        }
-                                    )
-
-                                elif c["status"] == "approaching" and d <= 50:
-                                    print(f"🚦 교차로 도착: {c['name']} (거리={d:.1f}m)")
-                                    c["status"] = "arrived"
-
-                                    await broadcast_dict(
-                                        {
-                                            "event": "ambulance_crossroad_arrived",
-                                            "car": car_no,
-                                            "crossroad_id": c["id"],
-                                            "crossroad_name": c["name"],
-                                            "distance": round(d, 1),
-                                            "timestamp": datetime.now().isoformat(),
-                                        }
-                                    )
-
-                                elif c["status"] == "arrived" and d > 50:
-                                    print(f"✅ 교차로 통과 완료: {c['name']}")
-                                    c["status"] = "passed"
-
-                                    await broadcast_dict(
-                                        {
-                                            "event": "ambulance_crossroad_passed",
-                                            "car": car_no,
-                                            "crossroad_id": c["id"],
-                                            "crossroad_name": c["name"],
-                                            "distance": round(d, 1),
-                                            "timestamp": datetime.now().isoformat(),
-                                        }
-                                    )
-
-                    except Exception as e:
-                        print("⚠️ 교차로/거리 계산 오류:", e)
-                else:
-                    print("⚠️ current 좌표 또는 car 번호 없음:", data)
-
-                out = {
-                    "event": "ambulance_current",
-                    **data,
-                }
-                await broadcast_dict(out)
-
-            # --------------------------------------------------
-            # 5) 일반 차량 현재 위치
-            # --------------------------------------------------
-            elif t == "normal_current":
-                print("🚗 일반 차량 현재 위치 수신:", data)
-
-                car_id = data.get("car")
-                current = data.get("current", {})
-                lat_raw = current.get("lat")
-                lon_raw = current.get("lng")
-
-                same_road = False
-                same_dir = False
-                ref_amb_car = None
-
-                try:
-                    # ✅ 방어 로직 추가
-                    if car_id is None or lat_raw is None or lon_raw is None:
-                        print("⚠️ normal_current 좌표/차량 정보 부족:", data)
-                    else:
-                        lat = float(lat_raw)
-                        lon = float(lon_raw)
-
-                        # 1) 차량별 좌표 저장
-                        normal_car_tracks[car_id].append({"lat": lat, "lng": lon})
-                        track_points = list(normal_car_tracks[car_id])
-
-                        # 2) 구급차 경로 하나 가져오기
-                        ref_amb_car, amb_route = get_any_ambulance_route()
-
-                        if amb_route:
-                            same_road, same_dir = check_same_road_and_direction(
-                                amb_route,
-                                track_points,
-                            )
-                            print(
-                                f"🔍 일반차 {car_id} vs 구급차 {ref_amb_car}: "
-                                f"same_road={same_road}, same_dir={same_dir}"
-                            )
+
+                    elif kind == "passed":
+                        if c.get("skipped"):
+                            logger.info("↪️ 교차로 미경유 통과 처리: %s (거리=%.1fm)", c["name"], d)
                         else:
-                            print("⚠️ 비교할 구급차 경로 없음")
-
-                except Exception as e:
-                    print("⚠️ normal_current 처리 오류:", e)
-
-                out = {
-                    "event": "normalcar_current",
-                    "same_road": same_road,
-                    "same_dir": same_dir,
-                    "same_road_and_dir": same_road and same_dir,
-                    "ref_ambulance_car": ref_amb_car,
-                    **data,
-                }
-                await broadcast_dict(out)
-
-
-            # --------------------------------------------------
-            # 6) 영상 프레임
-            # --------------------------------------------------
-            elif t == "video":
-                car_no = data.get("car")
-                frame_b64 = data.get("frame")
-
-                # ✅ 메시지에 car가 없으면 WebSocket 매핑에서 가져오기
-                if not car_no:
-                    car_no = ws_car_map.get(websocket)
-
-                if not car_no:
-                    # print("[video] ⚠ car_no를 찾을 수 없음 (메시지에도 없고 ws_car_map에도 없음)")
-                    continue
-
-                if frame_b64:
-                    # 1) 대시보드에 브로드캐스트
-                    out = {
-                        "event": "video",
+                            logger.info("✅ 교차로 통과 완료: %s", c["name"])
+
+                        await broadcast_dict(
+                            {
+                                "event": "ambulance_crossroad_passed",
+                                "car": car_no,
+                                "crossroad_id": c["id"],
+                                "crossroad_name": c["name"],
+                                "distance": round(d, 1),
+                                "skipped": bool(c.get("skipped")),
+                                "timestamp": datetime.now().isoformat(),
+                            }
+                        )
+
+                if events:
+                    _sync_state("crossroads", car_no, crossroads)
+
+            # 실시간 ETA (차량당 ETA_BROADCAST_INTERVAL 초에 1번)
+            if progress is not None and progress.due():
+                snap = progress.snapshot(crossroads)
+                now = datetime.now()
+                await broadcast_dict(
+                    {
+                        "event": "ambulance_eta",
                         "car": car_no,
-                        "frame": frame_b64,
+                        **snap,
+                        "eta": (now + timedelta(seconds=snap["eta_sec"])).isoformat(),
+                        "timestamp": now.isoformat(),
                     }
-                    await broadcast_dict(out)
+                )
+
+        except Exception as e:
+            logger.warning("⚠️ 교차로/거리 계산 오류: %s", e)
+    else:
+        logger.warning("⚠️ current 좌표 또는 car 번호 없음: %s", data, extra={"rate_limit": 5})
+
+    out = {
+        "event": "ambulance_current",
+        **data,
+    }
+    await broadcast_dict(out)
+
+
+# --------------------------------------------------
+# 5) 일반 차량 현재 위치
+# --------------------------------------------------
+@handler("normal_current", NormalCurrentMsg)
+async def on_normal_current(websocket, msg: NormalCurrentMsg, data: dict):
+    logger.debug("🚗 일반 차량 현재 위치 수신: %s", data)
+
+    car_id = msg.car
+
+    same_road = False
+    same_dir = False
+    ref_amb_car = None
+    ambulances: list[dict] = []
+
+    try:
+        # ✅ 방어 로직 추가
+        if car_id is None or msg.lat is None or msg.lng is None:
+            logger.warning("⚠️ normal_current 좌표/차량 정보 부족: %s", data, extra={"rate_limit": 5})
+        else:
+            # 1) 차량별 좌표 저장 (평면 좌표로 1회 변환)
+            add_normal_car_point(car_id, msg.lat, msg.lng)
+
+            # 2) 활성 구급차 경로 전체에 대해 같은 도로인 구급차 찾기
+            #    (통합 인덱스 1회 조회 + 차량별 매칭 상태 유지)
+            matches = match_normal_car(car_id)
+            ambulances = [m._asdict() for m in matches]
+
+            if matches:
+                # 하위 호환 필드: 같은 방향 우선, 그다음 가장 가까운 구급차 기준
+                best = min(matches, key=lambda m: (not m.same_dir, m.distance))
+                same_road, same_dir, ref_amb_car = True, best.same_dir, best.car
+                logger.debug("🔍 일반차 %s 와 같은 도로의 구급차: %s", car_id, ambulances)
+
+    except Exception as e:
+        logger.warning("⚠️ normal_current 처리 오류: %s", e)
+
+    out = {
+        "event": "normalcar_current",
+        "same_road": same_road,
+        "same_dir": same_dir,
+        "same_road_and_dir": same_road and same_dir,
+        "ref_ambulance_car": ref_amb_car,
+        # 같은 도로를 지나는 구급차 전체 [{"car", "same_dir", "distance", "offset"}, ...]
+        "ambulances": ambulances,
+        **data,
+    }
+    await broadcast_dict(out)
+
+
+# --------------------------------------------------
+# 6) 영상 프레임
+# --------------------------------------------------
+@handler("video", VideoMsg)
+async def on_video(websocket, msg: VideoMsg, data: dict):
+    # ✅ 메시지에 car가 없으면 WebSocket 매핑에서 가져오기
+    car_no = msg.car or ws_car_map.get(websocket)
+    frame_b64 = msg.frame
+
+    if not car_no or not frame_b64:
+        return
+
+    # ✅ 디코드는 Frame 이 1회만 수행 → 축소 티어 / YOLO 워커 / VideoRecorder 가 공유
+    frame = Frame(car_no, frame_b64)
+    rec = recorders.get(car_no)
+    # 소비자 수만큼 먼저 참조를 잡아둠 (한쪽이 먼저 끝나도 디코드 결과 유지)
+    # +1 은 이 핸들러 몫 → 축소 티어 변환이 먼저 끝나도 캐시가 풀리지 않게
+    frame.retain(3 if rec else 2)
+
+    # 1) 대시보드에 브로드캐스트 (보는 사람이 있는 티어만, 원본 티어는 base64 그대로)
+    await broadcast_frame("video", car_no, frame)
 
-                    # 2) ✅ YOLO 워커 큐에 프레임 전달 (백그라운드에서 분석/이미지 저장)
-                    enqueue_frame(car_no, frame_b64)
+    # 2) ✅ YOLO 워커 큐에 프레임 전달 (백그라운드에서 분석/이미지 저장)
+    enqueue_frame(car_no, frame)
+
+    # 3) 기존 VideoRecorder 녹화 유지 (기록은 차량별 레코더 스레드에서)
+    if rec:
+        rec.write(frame)
+
+    frame.release()
+
+
+# ================================================================
+# WebSocket 연결 처리 (type → 핸들러 테이블 디스패치)
+# ================================================================
+
+async def dispatch(websocket, data: dict):
+    t = data.get("type")
+    entry = HANDLERS.get(t)
+    if entry is None:
+        WS_MESSAGES.labels("unknown").inc()
+        logger.warning("❓ 알 수 없는 type 수신: %s, data=%s", t, data, extra={"rate_limit": 5})
+        return
+
+    if entry.schema is not None:
+        try:
+            msg = entry.schema.decode(data)
+        except MessageError as e:
+            logger.warning("⚠️ %s 메시지 형식 오류: %s", t, e, extra={"rate_limit": 1})
+            if entry.reply_errors:
+                await websocket.send(dumps_bytes({"type": "error", "error": str(e)}), text=True)
+            return
+    else:
+        msg = data
+
+    WS_MESSAGES.labels(t).inc()
+    t0 = time.perf_counter()
+    try:
+        await entry.fn(websocket, msg, data)
+    finally:
+        WS_HANDLER_SECONDS.labels(t).time_since(t0)
+
+
+async def ws_handler(websocket):
+    logger.info("🔌 WebSocket Client Connected")
+    _add_client(websocket)
+
+    try:
+        async for raw in websocket:
+            try:
+                data = loads(raw)
+            except Exception as e:
+                logger.warning("⚠️ JSON 파싱 실패: %s %s", e, raw[:120], extra={"rate_limit": 1})
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            t = data.get("type")
+            if t != "video" and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📡 [WS 수신] type=%s, keys=%s, raw=%s", t, list(data.keys()), raw[:120])
 
-                    # 3) 기존 VideoRecorder 녹화 유지
-                    rec = recorders.get(car_no)
-                    if rec:
-                        rec.write_frame_b64(frame_b64)
-                    else:
-                        pass
+            await dispatch(websocket, data)
 
+    except websockets.exceptions.ConnectionClosed:
+        logger.info("❌ WebSocket Client Disconnected")
+    finally:
+        _drop_client(websocket)
+
+
+def _add_client(websocket):
+    clients.add(websocket)
+    senders[websocket] = ClientSender(websocket)
+
+
+def _drop_client(websocket):
+    clients.discard(websocket)
+    unsubscribe(websocket)
+    _publish_interest()
+    sender = senders.pop(websocket, None)
+    if sender is not None:
+        sender.close()
+    ws_car_map.pop(websocket, None)  # ✅ 연결 끊길 때 매핑 제거
+
+
+# ================================================================
+# 멀티 프로세스 모드 (WS_INGEST_WORKERS > 0)
+#   허브: 대시보드 연결 + 차량 연결을 차량 번호로 워커에 고정해서 원본 메시지 전달
+#   워커: 차량별 처리 (DB / 녹화 / YOLO / 경로 분석) 후 브로드캐스트를 허브로 publish
+# ================================================================
+
+def _hub_reply(conn_id: int, payload: bytes):
+    """워커가 보낸 응답(ack 등)을 해당 차량 연결로 전달"""
+    websocket = _hub_conns.get(conn_id)
+    sender = senders.get(websocket) if websocket is not None else None
+    if sender is not None:
+        sender.enqueue(payload, None, None)
+
+
+async def hub_ws_handler(websocket):
+    logger.info("🔌 WebSocket Client Connected (hub)")
+    _add_client(websocket)
+    conn_id = next(_hub_conn_ids)
+    _hub_conns[conn_id] = websocket
+    # 차량이 고정된 워커 번호 (첫 car 필드로 결정, 이후로는 파싱 없이 원본 그대로 전달)
+    pinned: int | None = None
+    # 이 연결의 메시지를 한 번이라도 받은 워커 (종료 시 전부에게 C 를 보내 워커 쪽 inbox / task 정리)
+    forwarded: set[int] = set()
+
+    try:
+        while True:
+            # UTF-8 디코드 없이 bytes 그대로 받아서 전달
+            raw = await websocket.recv(decode=False)
+
+            if pinned is not None:
+                if _bridge.forward(pinned, conn_id, raw):
+                    forwarded.add(pinned)
+                else:
+                    logger.warning("⚠️ 워커 %d 미접속 → 메시지 버림", pinned, extra={"rate_limit": 5})
+                continue
+
+            try:
+                data = loads(raw)
+            except Exception as e:
+                logger.warning("⚠️ JSON 파싱 실패: %s %s", e, raw[:120], extra={"rate_limit": 1})
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            # 구독 관리는 허브에서 처리 (대시보드 연결)
+            if data.get("type") in ("subscribe", "unsubscribe"):
+                await dispatch(websocket, data)
+                continue
+
+            car = data.get("car")
+            if car:
+                pinned = _bridge.worker_for(str(car))
+                ws_car_map[websocket] = str(car)
+                logger.info("🔗 차량 %s → ingest 워커 %d 고정", car, pinned)
+                target = pinned
             else:
-                print(f"❓ 알 수 없는 type 수신: {t}, data={data}")
+                # 고정 전 car 없는 메시지는 워커 0 이 처리
+                target = 0
+            if _bridge.forward(target, conn_id, raw):
+                forwarded.add(target)
+            else:
+                logger.warning("⚠️ 워커 %d 미접속 → 메시지 버림", target, extra={"rate_limit": 5})
 
     except websockets.exceptions.ConnectionClosed:
-        print("❌ WebSocket Client Disconnected")
+        logger.info("❌ WebSocket Client Disconnected")
     finally:
-        clients.remove(websocket)
-        ws_car_map.pop(websocket, None)  # ✅ 연결 끊길 때 매핑 제거
+        _hub_conns.pop(conn_id, None)
+        for worker_id in forwarded:
+            _bridge.close_conn(worker_id, conn_id)
+        _drop_client(websocket)
+
+
+async def _worker_on_message(conn, raw: bytes):
+    try:
+        data = loads(raw)
+    except Exception as e:
+        logger.warning("⚠️ JSON 파싱 실패: %s %s", e, raw[:120], extra={"rate_limit": 1})
+        return
+    if isinstance(data, dict):
+        await dispatch(conn, data)
+
+
+def _worker_on_close(conn):
+    ws_car_map.pop(conn, None)
+
+
+async def hub_main(n_workers: int):
+    global _ws_loop, _bridge
+    _ws_loop = asyncio.get_running_loop()
+    spawn(monitor_loop_lag())
+
+    _bridge = BridgeHub(
+        Config.WS_BRIDGE_SOCKET,
+        n_workers,
+        on_reply=_hub_reply,
+        on_broadcast=broadcast_encoded,
+        on_state=_apply_shared_state,
+        on_metrics=_hub_on_metrics,
+    )
+    await _bridge.start()
+
+    logger.info("🌐 WebSocket Hub running ws://%s:%d (ingest 워커 %d개)", Config.WS_HOST, Config.WS_PORT, n_workers)
+    async with websockets.serve(hub_ws_handler, Config.WS_HOST, Config.WS_PORT, ping_interval=None):
+        await asyncio.Future()  # run forever
+
+
+async def ingest_worker_main(worker_id: int):
+    global _ws_loop, _bridge
+    _ws_loop = asyncio.get_running_loop()
+    bind_app(current_app._get_current_object())
+    spawn(monitor_loop_lag())
+    spawn(warm_route_executor())
+
+    _bridge = BridgeClient(
+        Config.WS_BRIDGE_SOCKET,
+        worker_id,
+        on_message=_worker_on_message,
+        on_close=_worker_on_close,
+        on_state=_apply_shared_state,
+        on_interest=set_remote_interest,
+    )
+    spawn(publish_worker_metrics(worker_id, Config.WS_WORKER_METRICS_INTERVAL))
+
+    # 차량 단말은 허브를 거치지 않고 담당 워커에 직접 붙을 수도 있음 (/api/ws/shard)
+    port = Config.WS_PORT + 1 + worker_id
+    logger.info("🌐 Ingest worker %d running ws://%s:%d", worker_id, Config.WS_HOST, port)
+    async with websockets.serve(ws_handler, Config.WS_HOST, port, ping_interval=None):
+        await _bridge.run()
+
+
+def start_ingest_worker(worker_id: int):
+    """ingest 워커 프로세스 본체 (sockets.ingest_worker 에서 앱 컨텍스트 안에서 호출)"""
+    logger.info("🔧 Ingest worker %d starting...", worker_id)
+    start_yolo_worker()
+    asyncio.run(ingest_worker_main(worker_id))
 
 
 async def ws_main():
     global _ws_loop        
-    print("🌐 WebSocket Server running ws://0.0.0.0:5000")
+    logger.info("🌐 WebSocket Server running ws://%s:%d", Config.WS_HOST, Config.WS_PORT)
     _ws_loop = asyncio.get_running_loop()  # ⬅ 이 줄 추가
-    async with websockets.serve(ws_handler, "0.0.0.0", 5000, ping_interval=None):
+    # ✅ DB 스레드에서 push 할 Flask 앱 (run_ws 의 app_context 에서 가져옴)
+    bind_app(current_app._get_current_object())
+    # ✅ 루프 블로킹 감시
+    spawn(monitor_loop_lag())
+    # ✅ 경로 분석 프로세스 미리 기동
+    spawn(warm_route_executor())
+    async with websockets.serve(ws_handler, Config.WS_HOST, Config.WS_PORT, ping_interval=None):
         await asyncio.Future()  # run forever
 
 
 def start_ws_server():
-    print("🔧 WebSocket Server starting...")
+    logger.info("🔧 WebSocket Server starting...")
+    n_workers = Config.WS_INGEST_WORKERS
+    if n_workers > 0 and hasattr(socket, "AF_UNIX"):
+        # ✅ 멀티 프로세스: 차량별 처리는 ingest 워커 프로세스에서, 이 프로세스는 허브 역할만
+        from sockets.ingest_worker import run_ingest_worker
+
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(n_workers):
+            ctx.Process(target=run_ingest_worker, args=(i,), name=f"ws-ingest-{i}", daemon=True).start()
+        asyncio.run(hub_main(n_workers))
+        return
+
     #YOLO 워커 스레드 시작
     start_yolo_worker()
     asyncio.run(ws_main())
@@ -10,6 +10,9 @@ const camSocket = new WebSocket(`ws://${CAM_WS_HOST}:5000`);
 
 camSocket.onopen = () => {
   console.log("✅ camera.js WebSocket 연결됨");
+  // 📮 영상 프레임 구독 (구독하지 않으면 서버가 video 이벤트를 보내지 않음)
+  //    tier: 화면에 보이는 크기에 맞춰 요청 (서버가 송신 밀림에 따라 더 낮출 수 있음)
+  camSocket.send(JSON.stringify({ type: "subscribe", events: ["video"], tier: pickVideoTier() }));
 };
 
 camSocket.onclose = (ev) => {
@@ -21,6 +24,17 @@ camSocket.onerror = (err) => {
   console.error("⚠️ camera.js WebSocket 에러:", err);
 };
 
+// ------------------------
+//  영상 티어 선택 (full: 원본 15fps / half: 640px 8fps / thumb: 320px 2fps)
+// ------------------------
+function pickVideoTier() {
+  const img = document.getElementById("cam1");
+  const width = img ? img.clientWidth * (window.devicePixelRatio || 1) : 0;
+  if (width && width <= 360) return "thumb";
+  if (width && width <= 720) return "half";
+  return "full";
+}
+
 // ------------------------
 //  No signal 기본 이미지
 // ------------------------
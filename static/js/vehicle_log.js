@@ -120,6 +120,11 @@ document.addEventListener("DOMContentLoaded", () => {
 // ---------------------
 logSocket.onopen = () => {
   console.log("✅ vehicle_log.js WebSocket 연결됨");
+  // 📮 출발/도착 이벤트만 구독
+  logSocket.send(JSON.stringify({
+    type: "subscribe",
+    events: ["ambulance_start", "ambulance_arrival"],
+  }));
 };
 
 logSocket.onclose = (ev) => {
@@ -0,0 +1,67 @@
+# tests/test_crossroad_geofence.py
+# -*- coding: utf-8 -*-
+"""sockets.crossroad_geofence 교차로 상태 전이 / 미경유 통과 처리"""
+
+import numpy as np
+
+from sockets.crossroad_geofence import CrossroadGeofence, order_along_route
+from sockets.route_matcher import route_index
+from utils.geo import M_PER_DEG_LAT
+
+LNG = 127.0
+
+
+def _crossroad(cid, lat, lon=LNG, **extra):
+    return {"id": cid, "name": f"교차로{cid}", "lat": lat, "lon": lon, "status": "pending", **extra}
+
+
+def _drive(fence, lats, lon=LNG, offsets=None):
+    events = []
+    for i, lat in enumerate(lats):
+        offset = offsets[i] if offsets is not None else None
+        events += [(e.kind, e.crossroad["id"]) for e in fence.update(float(lat), lon, offset)]
+    return events
+
+
+def test_states_follow_route_order():
+    route = np.column_stack([np.linspace(37.50, 37.52, 200), np.full(200, LNG)])
+    crossroads = order_along_route(
+        [_crossroad(2, 37.515), _crossroad(1, 37.505)], route_index(route)
+    )
+    assert [c["id"] for c in crossroads] == [1, 2]
+
+    events = _drive(CrossroadGeofence(crossroads), np.linspace(37.50, 37.52, 400))
+    assert events == [
+        ("approach", 1), ("arrived", 1), ("passed", 1),
+        ("approach", 2), ("arrived", 2), ("passed", 2),
+    ]
+    assert not any(c.get("skipped") for c in crossroads)
+
+
+def test_pending_crossroad_without_offset_does_not_block_later_ones():
+    # 1번은 offset 없음 + 경로에서 1km 떨어져 있어 접근 반경에 들어오지 않음
+    crossroads = [
+        _crossroad(1, 37.505, LNG + 0.012),
+        _crossroad(2, 37.515, offset=1665.0),
+        _crossroad(3, 37.518, offset=1998.0),
+    ]
+    fence = CrossroadGeofence(crossroads)
+    lats = np.linspace(37.50, 37.52, 400)
+    events = _drive(fence, lats, offsets=(lats - 37.50) * M_PER_DEG_LAT)
+
+    assert ("passed", 1) in events and crossroads[0]["skipped"]
+    assert [e for e in events if e[1] == 2] == [("approach", 2), ("arrived", 2), ("passed", 2)]
+    assert crossroads[2]["status"] != "pending"
+
+
+def test_unknown_vehicle_offset_skips_by_later_arrival():
+    # 차량 경로상 위치를 모르는 경우 (progress 없음) 도 같은 규칙
+    crossroads = [
+        _crossroad(1, 37.505, LNG + 0.012, offset=555.0),
+        _crossroad(2, 37.515, offset=1665.0),
+    ]
+    fence = CrossroadGeofence(crossroads)
+    events = _drive(fence, np.linspace(37.50, 37.52, 400))
+    assert events[0] == ("passed", 1)
+    assert ("arrived", 2) in events
+    assert fence.done
@@ -0,0 +1,71 @@
+# tests/test_geo.py
+# -*- coding: utf-8 -*-
+"""
+utils.geo 로컬 평면 투영 정확도 (대원 거리 / 방위 기준)
+(서울권 무작위 좌표, 고정 시드)
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from utils.geo import EARTH_R, as_latlng_array, planar_bearing, project, project_point
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(12)
+
+
+def _points(rng, n):
+    lat = rng.uniform(37.3, 37.8, n)
+    lng = rng.uniform(126.7, 127.3, n)
+    return np.column_stack([lat, lng])
+
+
+def _angle_diff(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180.0) % 360.0 - 180.0)
+
+
+def _great_circle(p, q):
+    """기준값: 대원 거리 (m) / 초기 방위각 (0°=북 시계방향)"""
+    phi1, phi2 = math.radians(p[0]), math.radians(q[0])
+    dlat = phi2 - phi1
+    dlon = math.radians(q[1] - p[1])
+    a = math.sin(dlat / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlon / 2) ** 2
+    dist = 2 * EARTH_R * math.asin(math.sqrt(a))
+    y = math.sin(dlon) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlon)
+    return dist, (math.degrees(math.atan2(y, x)) + 360) % 360
+
+
+def test_as_latlng_array_accepts_dict_points(rng):
+    a = _points(rng, 5)
+    dicts = [{"lat": lat, "lng": lng} for lat, lng in a]
+    np.testing.assert_array_equal(as_latlng_array(dicts), a)
+    np.testing.assert_array_equal(as_latlng_array(a.tolist()), a)
+    assert as_latlng_array([]).shape == (0, 2)
+
+
+def test_projection_close_to_great_circle(rng):
+    # 로컬 평면 거리 / 방위는 서울권에서 대원 거리 / 방위와 거의 같아야 함
+    a, b = _points(rng, 500), _points(rng, 500)
+    xa, xb = project(a), project(b)
+    d = xb - xa
+    planar = np.hypot(d[:, 0], d[:, 1])
+    great, brng = np.array([_great_circle(p, q) for p, q in zip(a, b)]).T
+    assert np.max(np.abs(planar - great) / great) < 0.005
+
+    got = planar_bearing(d[:, 0], d[:, 1])
+    assert np.all((got >= 0) & (got < 360))
+    assert _angle_diff(got, brng).max() < 0.5
+
+
+def test_project_point_matches_project(rng):
+    a = _points(rng, 50)
+    xy = project(a)
+    for (lat, lng), (x, y) in zip(a, xy):
+        px, py = project_point(lat, lng)
+        assert math.isclose(px, x, abs_tol=1e-9)
+        assert math.isclose(py, y, abs_tol=1e-9)
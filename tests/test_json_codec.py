@@ -0,0 +1,36 @@
+# tests/test_json_codec.py
+# -*- coding: utf-8 -*-
+"""utils.json_codec 영상 프레임 envelope 가 항상 올바른 JSON 인지"""
+
+import base64
+import json
+import os
+
+import pytest
+
+from utils.json_codec import encode_frame_envelope
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        base64.b64encode(os.urandom(3000)).decode("ascii"),
+        # MIME 줄바꿈(76자마다 \n) — base64.encodebytes / Android Base64.DEFAULT
+        base64.encodebytes(os.urandom(3000)).decode("ascii"),
+        base64.encodebytes(os.urandom(3000)).decode("ascii").replace("\n", "\r\n"),
+        "abc\t=",
+        'a"b\\c',
+        "한글",
+    ],
+)
+def test_frame_envelope_round_trips(frame):
+    envelope = encode_frame_envelope("video", "12가3456", frame, tier="low")
+    data = json.loads(envelope)
+    assert data == {"event": "video", "car": "12가3456", "tier": "low", "frame": frame}
+
+
+def test_plain_base64_is_spliced_without_escaping():
+    frame = base64.b64encode(os.urandom(300)).decode("ascii")
+    envelope = encode_frame_envelope("video", "car", frame)
+    assert frame.encode("ascii") in envelope
+    assert json.loads(envelope)["frame"] == frame
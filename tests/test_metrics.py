@@ -0,0 +1,77 @@
+# tests/test_metrics.py
+# -*- coding: utf-8 -*-
+"""utils.metrics 워커 지표 합치기 (render_samples → 브리지 M 프레임 → 허브 render_all)"""
+
+import asyncio
+
+import pytest
+
+from sockets.bridge import BridgeClient, BridgeHub
+from utils import metrics
+from utils.metrics import Counter, Histogram, render_all, render_samples, set_remote_samples
+
+
+@pytest.fixture
+def local_metrics():
+    n = len(metrics._registry)
+    hits = Counter("test_hits_total", "테스트 카운터", ["kind"])
+    latency = Histogram("test_latency_seconds", "테스트 히스토그램", buckets=(0.1, 1.0))
+    yield hits, latency
+    del metrics._registry[n:]
+    metrics._remote.clear()
+
+
+def test_remote_samples_render_under_same_family(local_metrics):
+    hits, latency = local_metrics
+    hits.labels("a").inc(2)
+    latency.observe(0.5)
+    samples = render_samples("worker", 1)
+    assert samples["test_hits_total"] == ['test_hits_total{kind="a",worker="1"} 2']
+    assert 'test_latency_seconds_bucket{worker="1",le="1"} 1' in samples["test_latency_seconds"]
+    assert 'test_latency_seconds_count{worker="1"} 1' in samples["test_latency_seconds"]
+
+    set_remote_samples("1", samples)
+    hits.labels("a").inc()
+    lines = render_all().splitlines()
+    i = lines.index("# TYPE test_hits_total counter")
+    assert lines[i + 1:i + 3] == [
+        'test_hits_total{kind="a"} 3',
+        'test_hits_total{kind="a",worker="1"} 2',
+    ]
+    assert sum(line.startswith("# TYPE test_hits_total ") for line in lines) == 1
+
+    set_remote_samples("1", None)
+    assert 'worker="1"' not in render_all()
+
+
+def test_worker_metrics_reach_hub_over_bridge(tmp_path):
+    received = []
+
+    async def main():
+        path = str(tmp_path / "bridge.sock")
+        hub = BridgeHub(
+            path, 1,
+            on_reply=lambda *a: None,
+            on_broadcast=lambda *a: None,
+            on_state=lambda s: None,
+            on_metrics=lambda wid, snap: received.append((wid, snap)),
+        )
+        await hub.start()
+        client = BridgeClient(
+            path, 0,
+            on_message=None, on_close=None, on_state=lambda s: None, on_interest=lambda i: None,
+        )
+        task = asyncio.create_task(client.run())
+        while client._peer is None:
+            await asyncio.sleep(0.01)
+        client.publish_metrics({"samples": {"x": ['x{worker="0"} 1']}, "clients": []})
+        while not received:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        client._peer.writer.close()
+        while len(received) < 2:
+            await asyncio.sleep(0.01)
+        hub._server.close()
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+    assert received == [(0, {"samples": {"x": ['x{worker="0"} 1']}, "clients": []}), (0, None)]
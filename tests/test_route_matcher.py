@@ -0,0 +1,71 @@
+# tests/test_route_matcher.py
+# -*- coding: utf-8 -*-
+"""sockets.route_matcher 일반 차량 점진 매칭 (window 우선 / 통합 인덱스 조회 생략)"""
+
+import numpy as np
+import pytest
+
+from sockets import route_matcher as rm
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    for car in list(rm.ambulance_routes):
+        rm.remove_ambulance_route(car)
+    rm.normal_car_tracks.clear()
+    rm._normal_states.clear()
+
+
+def _north_route(lng=127.0, n=200):
+    # 위도 37.50 → 37.52 (약 2.2km) 북쪽으로 곧게
+    return np.column_stack([np.linspace(37.50, 37.52, n), np.full(n, lng)])
+
+
+def _drive(car, lats, lng):
+    out = []
+    for lat in lats:
+        rm.add_normal_car_point(car, float(lat), lng)
+        out = rm.match_normal_car(car)
+    return out
+
+
+def test_locked_car_skips_global_query(monkeypatch):
+    rm.set_ambulance_route("amb1", _north_route())
+    lats = np.linspace(37.501, 37.519, 60)
+
+    matches = _drive("car1", lats[:15], 127.00005)
+    assert [m.car for m in matches] == ["amb1"]
+    assert matches[0].same_dir
+
+    calls = []
+    real_query = rm.active_routes.query_xy
+    monkeypatch.setattr(
+        rm.active_routes, "query_xy", lambda *a: calls.append(a) or real_query(*a)
+    )
+    matches = _drive("car1", lats[15:], 127.00005)
+    assert calls == []
+    assert [m.car for m in matches] == ["amb1"]
+    assert matches[0].offset > 1500
+
+
+def test_window_miss_and_new_route_fall_back_to_global_query(monkeypatch):
+    rm.set_ambulance_route("amb1", _north_route())
+    _drive("car1", np.linspace(37.501, 37.503, 10), 127.00005)
+
+    calls = []
+    real_query = rm.active_routes.query_xy
+    monkeypatch.setattr(
+        rm.active_routes, "query_xy", lambda *a: calls.append(a) or real_query(*a)
+    )
+
+    # 새 구급차 경로가 생기면 한 번은 전체 조회
+    rm.set_ambulance_route("amb2", _north_route(lng=127.0001))
+    matches = _drive("car1", [37.5031], 127.00005)
+    assert len(calls) == 1
+    assert {m.car for m in matches} == {"amb1", "amb2"}
+
+    # 경로에서 벗어나면(window 실패) 매 점 전체 조회
+    calls.clear()
+    _drive("car1", [37.5032, 37.5033], 127.01)
+    assert len(calls) == 2
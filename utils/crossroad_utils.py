@@ -1,6 +1,20 @@
 # -*- coding: utf-8 -*-
+import numpy as np
 import pandas as pd
-from math import radians, cos, sin, asin, sqrt, atan2, degrees, acos
+from math import radians, cos, sqrt, degrees, acos, floor
+
+from utils.geo import (
+    PROJ_LAT0,
+    PROJ_LON0,
+    M_PER_DEG_LAT,
+    M_PER_DEG_LON,
+    as_latlng_array,
+    planar_bearing,
+    project,
+)
+from utils.log import get_logger
+
+logger = get_logger("crossroad")
 
 # -----------------------------------------
 # CSV 로드
@@ -10,16 +24,6 @@ def load_crossroad_csv(csv_path: str):
     df.columns = df.columns.str.strip()
     return df[["itstId", "itstNm", "mapCtptIntLat", "mapCtptIntLot"]]
 
-# -----------------------------------------
-# 거리 계산 (Haversine 공식, 단위 m)
-# -----------------------------------------
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371000  # 지구 반경 (m)
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    return 2 * R * asin(sqrt(a))
-
 # -----------------------------------------
 # 각도 → 8방위 문자열 변환 (북=0° 기준)
 # -----------------------------------------
@@ -29,24 +33,10 @@ def angle_to_compass(angle_deg: float) -> str:
     idx = int((angle_deg % 360) / 45.0 + 0.5) % 8  # 45° 단위 라운딩
     return dirs[idx]
 
-# -----------------------------------------
-# 항법 방위각 계산 (0°=북, 시계방향 증가)
-# -----------------------------------------
-def bearing(lat1, lon1, lat2, lon2):
-    """
-    (lat1, lon1) → (lat2, lon2) 방향의 방위각을 반환
-    0° = 북, 90° = 동, 180° = 남, 270° = 서
-    """
-    dlon = radians(lon2 - lon1)
-    lat1, lat2 = radians(lat1), radians(lat2)
-    y = sin(dlon) * cos(lat2)
-    x = cos(lat1)*sin(lat2) - sin(lat1)*cos(lat2)*cos(dlon)
-    brng = (degrees(atan2(y, x)) + 360) % 360
-    return brng
-
 # -----------------------------------------
 # 회전 유형 판정 (직진 / 좌회전 / 우회전 / 유턴)
-# 좌표는 (lng, lat) 순서 벡터 사용
+# 좌표는 로컬 평면 (x=동쪽 m, y=북쪽 m) — utils.geo.project 결과
+# (위경도 차이를 그대로 쓰면 경도 1°가 위도 1°보다 짧아서 각도가 찌그러짐)
 # -----------------------------------------
 def classify_turn(prev_xy, cross_xy, next_xy) -> tuple[str, float]:
     vin = (cross_xy[0] - prev_xy[0], cross_xy[1] - prev_xy[1])   # 진입 벡터
@@ -76,6 +66,107 @@ def classify_turn(prev_xy, cross_xy, next_xy) -> tuple[str, float]:
 
     return turn, angle
 
+# -----------------------------------------
+# 교차로 공간 인덱스 (서울 기준 등장방형 투영 + 균일 격자)
+# -----------------------------------------
+class CrossroadIndex:
+    """
+    교차로 중심 좌표를 로컬 평면(m)으로 투영해 radius 크기 격자에 담아둔 인덱스
+    - 경로 점들 주변 3x3 칸의 교차로만 후보로 보고, 최종 판정은 평면 거리
+      (교차로마다 자기 위도의 경도 축척을 미리 계산 → 대원 거리와 mm 단위까지 일치)
+    - 격자 칸은 투영 왜곡(위도에 따른 경도 축척 차이)만큼 여유를 둬서
+      반경 안의 교차로를 절대 놓치지 않음 → 전체 순회와 결과 동일
+    """
+
+    def __init__(self, crossroad_df):
+        self.rows: list[tuple[int, str, float, float]] = [
+            (int(cid), name, float(lat), float(lon))
+            for cid, name, lat, lon in zip(
+                crossroad_df["itstId"],
+                crossroad_df["itstNm"],
+                crossroad_df["mapCtptIntLat"],
+                crossroad_df["mapCtptIntLot"],
+            )
+        ]
+        self._ky = M_PER_DEG_LAT
+        self._kx = M_PER_DEG_LON
+        self._latlng = np.array([(lat, lon) for _, _, lat, lon in self.rows], dtype=np.float64).reshape(-1, 2)
+        self._xy = project(self._latlng)
+        # 교차로 위도에서의 경도 1° 길이 (m) — 반경 판정용
+        self._kx_local = M_PER_DEG_LAT * np.cos(np.radians(self._latlng[:, 0]))
+
+        # 기준 위도보다 북쪽이면 투영 거리가 실제보다 길어짐 → 그 비율만큼 칸을 키움 (+1% 여유)
+        max_abs_lat = max((abs(r[2]) for r in self.rows), default=PROJ_LAT0)
+        stretch = cos(radians(PROJ_LAT0)) / cos(radians(min(max_abs_lat, 89.0)))
+        self._margin = max(1.0, stretch) * 1.01
+
+        # 칸 크기(m) → {(cx, cy): [row 번호, ...]}
+        self._grids: dict[float, dict[tuple[int, int], list[int]]] = {}
+
+    def _grid(self, radius: float) -> tuple[float, dict]:
+        cell = max(float(radius), 1.0) * self._margin
+        grid = self._grids.get(cell)
+        if grid is None:
+            grid = {}
+            for row, (x, y) in enumerate(self._xy.tolist()):
+                grid.setdefault((floor(x / cell), floor(y / cell)), []).append(row)
+            self._grids[cell] = grid
+        return cell, grid
+
+    def points_within(self, route_points, radius: float) -> dict[int, list[int]]:
+        """교차로 row 번호 → 반경 안에 들어온 경로 점 인덱스 목록 (오름차순)"""
+        pts = as_latlng_array(route_points)
+        if not len(pts):
+            return {}
+        cell, grid = self._grid(radius)
+
+        # 경로 점들이 지나는 칸 + 이웃 칸의 교차로만 후보
+        xs = np.floor((pts[:, 1] - PROJ_LON0) * self._kx / cell).astype(np.int64)
+        ys = np.floor((pts[:, 0] - PROJ_LAT0) * self._ky / cell).astype(np.int64)
+        cells = set(zip(xs.tolist(), ys.tolist()))
+        candidates = set()
+        for cx, cy in cells:
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    candidates.update(grid.get((gx, gy), ()))
+        if not candidates:
+            return {}
+
+        rows = sorted(candidates)
+        centers = self._latlng[rows]
+        kx = self._kx_local[rows]
+        r2 = float(radius) ** 2
+        inside: dict[int, list[int]] = {}
+        # 후보 교차로를 나눠서 (경로 점 N × 후보 K) 평면 거리² 행렬 계산
+        for start in range(0, len(rows), _MATRIX_CHUNK):
+            end = start + _MATRIX_CHUNK
+            dy = (pts[:, 0:1] - centers[None, start:end, 0]) * self._ky
+            dx = (pts[:, 1:2] - centers[None, start:end, 1]) * kx[None, start:end]
+            mask = dx * dx + dy * dy <= r2
+            for j in np.flatnonzero(mask.any(axis=0)):
+                inside[rows[start + j]] = np.flatnonzero(mask[:, j]).tolist()
+        return inside
+
+
+# 거리 행렬 한 번에 계산할 후보 교차로 수 (긴 경로에서 메모리 제한)
+_MATRIX_CHUNK = 256
+
+
+# DataFrame → 인덱스 캐시 (같은 DataFrame 으로 다시 부르면 재사용)
+_index_cache: dict[int, tuple[object, CrossroadIndex]] = {}
+
+
+def get_crossroad_index(crossroad_df) -> CrossroadIndex:
+    if isinstance(crossroad_df, CrossroadIndex):
+        return crossroad_df
+    cached = _index_cache.get(id(crossroad_df))
+    if cached is not None and cached[0] is crossroad_df:
+        return cached[1]
+    index = CrossroadIndex(crossroad_df)
+    _index_cache[id(crossroad_df)] = (crossroad_df, index)
+    return index
+
+
 # -----------------------------------------
 # 경로 기반 교차로 접근/이탈 방향 + 회전 타입 계산
 # -----------------------------------------
@@ -84,22 +175,31 @@ def compute_crossroad_directions(route_points, crossroad_df, radius=50):
     각 교차로에 대해:
       - 반경(radius) 내 진입점/이탈점(first_idx/last_idx) 찾기
       - prev(first_idx-1), next(last_idx+1) 사용해 방향 계산
-      - bearing으로 진입각/이탈각 구하고 8방위 문자열 도출
+      - 방위각으로 진입각/이탈각 구하고 8방위 문자열 도출
+    crossroad_df 는 DataFrame 또는 CrossroadIndex
+    (공간 인덱스로 경로 근처 교차로만 검사, 결과 순서는 CSV 행 순서 그대로)
+    경로는 처음에 1회 평면 투영 → 방위각 / 회전 판정은 미터 단위 벡터 연산
     """
     results = []
 
-    for _, row in crossroad_df.iterrows():
-        cross_id = int(row["itstId"])
-        cross_name = row["itstNm"]
-        lat = float(row["mapCtptIntLat"])
-        lon = float(row["mapCtptIntLot"])
+    index = get_crossroad_index(crossroad_df)
+    pts = as_latlng_array(route_points)
+    inside_by_row = index.points_within(pts, radius)
+    if not inside_by_row:
+        return results
+
+    xy = project(pts)
+    n_points = len(xy)
+    # seg_bearing[i] = 점 i → 점 i+1 방위각
+    d = xy[1:] - xy[:-1]
+    seg_bearing = planar_bearing(d[:, 0], d[:, 1]).tolist()
+    xy = xy.tolist()
 
-        # 반경 내 경로 인덱스 모으기
-        inside_idxs = [i for i, p in enumerate(route_points)
-                       if haversine(p["lat"], p["lng"], lat, lon) <= radius]
+    for row in sorted(inside_by_row):
+        cross_id, cross_name, lat, lon = index.rows[row]
 
-        if not inside_idxs:
-            continue
+        # 반경 내 경로 인덱스
+        inside_idxs = inside_by_row[row]
 
         first_idx, last_idx = inside_idxs[0], inside_idxs[-1]
 
@@ -110,24 +210,19 @@ def compute_crossroad_directions(route_points, crossroad_df, radius=50):
 
         # 진입 방향 (반경 진입 직전 → 진입점)
         if first_idx > 0:
-            p_prev = route_points[first_idx-1]
-            p_in   = route_points[first_idx]
-            in_angle = bearing(p_prev["lat"], p_prev["lng"], p_in["lat"], p_in["lng"])
+            in_angle = seg_bearing[first_idx-1]
             in_dir   = angle_to_compass(in_angle)
 
         # 이탈 방향 (이탈점 → 반경 이탈 직후)
-        if last_idx < len(route_points)-1:
-            p_out  = route_points[last_idx]
-            p_next = route_points[last_idx+1]
-            out_angle = bearing(p_out["lat"], p_out["lng"], p_next["lat"], p_next["lng"])
+        if last_idx < n_points-1:
+            out_angle = seg_bearing[last_idx]
             out_dir   = angle_to_compass(out_angle)
 
-        # 회전 유형 (first_idx, last_idx 기준 벡터)
-        if first_idx > 0 and last_idx < len(route_points)-1:
-            prev_xy  = (route_points[first_idx-1]["lng"], route_points[first_idx-1]["lat"])
-            cross_xy = (route_points[(first_idx+last_idx)//2]["lng"],  # 교차로 중심 근처
-                        route_points[(first_idx+last_idx)//2]["lat"])
-            next_xy  = (route_points[last_idx+1]["lng"], route_points[last_idx+1]["lat"])
+        # 회전 유형 (first_idx, last_idx 기준 벡터, 평면 좌표 m)
+        if first_idx > 0 and last_idx < n_points-1:
+            prev_xy  = xy[first_idx-1]
+            cross_xy = xy[(first_idx+last_idx)//2]  # 교차로 중심 근처
+            next_xy  = xy[last_idx+1]
             turn, rel_angle = classify_turn(prev_xy, cross_xy, next_xy)
 
         # 설명 문자열
@@ -157,7 +252,9 @@ def compute_crossroad_directions(route_points, crossroad_df, radius=50):
             "explain": explain
         })
 
-        print(f"[DEBUG] 교차로={cross_name}, first_idx={first_idx}, last_idx={last_idx}, "
-              f"in_dir={in_dir}, out_dir={out_dir}, turn={turn}, rel_angle={rel_angle}")
+        logger.debug(
+            "교차로=%s, first_idx=%s, last_idx=%s, in_dir=%s, out_dir=%s, turn=%s, rel_angle=%s",
+            cross_name, first_idx, last_idx, in_dir, out_dir, turn, rel_angle,
+        )
 
     return results
@@ -1,10 +1,12 @@
 # csv_logger.py
 import csv
 import os
+import time
 from datetime import datetime
 
 from s3_client import s3, bucket_name
 from utils.car_utils import normalize_car_no  # 이미 있던 함수 재사용
+from utils.metrics import S3_UPLOAD_SECONDS, S3_UPLOAD_FAILURES
 
 # 전역 상태
 _csv_file = None
@@ -124,6 +126,7 @@ def stop_csv_logging(arrival_time: datetime | None = None):
 
     _csv_file.close()
 
+    t0 = time.perf_counter()
     try:
         s3_key = f"logs/{os.path.basename(_csv_file_path)}"
         s3.upload_file(
@@ -132,8 +135,10 @@ def stop_csv_logging(arrival_time: datetime | None = None):
             s3_key,
             ExtraArgs={'ContentType': 'text/csv'}
         )
+        S3_UPLOAD_SECONDS.labels("csv").time_since(t0)
         print(f"✅ CSV 업로드 완료 → https://{bucket_name}.s3.us-east-1.amazonaws.com/{s3_key}")
     except Exception as e:
+        S3_UPLOAD_FAILURES.labels("csv").inc()
         print(f"❌ CSV 업로드 실패: {e}")
 
     _csv_file = None
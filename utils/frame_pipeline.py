@@ -0,0 +1,90 @@
+# utils/frame_pipeline.py
+# -*- coding: utf-8 -*-
+"""
+영상 프레임 1회 디코드 파이프라인
+
+WS 로 들어온 video 메시지 하나를 Frame 객체 하나로 만들고,
+브로드캐스트 / VideoRecorder / YOLO 워커가 같은 객체를 공유한다.
+    - b64      : 수신한 base64 문자열 그대로 (브로드캐스트 envelope 에 사용)
+    - jpeg     : base64 디코드 결과 (처음 접근할 때 1회)
+    - image()  : JPEG → BGR ndarray (처음 호출할 때 1회, 읽기 전용)
+소비자는 retain() 으로 참조를 잡고 다 쓰면 release() → 마지막 release 에서 캐시 해제.
+"""
+
+import base64
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils.log import get_logger
+
+logger = get_logger("frame")
+
+
+class Frame:
+    __slots__ = ("car_no", "b64", "received_at", "_jpeg", "_image", "_decoded", "_lock", "_refs")
+
+    def __init__(self, car_no: str | None, frame_b64: str):
+        self.car_no = car_no
+        self.b64 = frame_b64
+        self.received_at = time.time()
+
+        self._jpeg: bytes | None = None
+        self._image: np.ndarray | None = None
+        self._decoded = False
+        self._lock = threading.Lock()
+        self._refs = 0
+
+    # ---------- 참조 카운트 ----------
+
+    def retain(self, n: int = 1) -> "Frame":
+        with self._lock:
+            self._refs += n
+        return self
+
+    def release(self) -> None:
+        with self._lock:
+            self._refs -= 1
+            if self._refs <= 0:
+                # 모든 소비자가 끝났으면 디코드 캐시 해제 (b64 는 호출자가 들고 있음)
+                self._jpeg = None
+                self._image = None
+                self._decoded = False
+
+    # ---------- 지연 디코드 ----------
+
+    @property
+    def jpeg(self) -> bytes:
+        with self._lock:
+            return self._jpeg_locked()
+
+    def _jpeg_locked(self) -> bytes:
+        if self._jpeg is None:
+            b64 = self.b64
+            # data:image/jpeg;base64,... 형식이면 앞부분 제거
+            if isinstance(b64, str) and b64.startswith("data:"):
+                b64 = b64.split(",", 1)[1]
+            self._jpeg = base64.b64decode(b64)
+        return self._jpeg
+
+    def image(self) -> np.ndarray | None:
+        """
+        BGR ndarray (읽기 전용). 디코드 실패 시 None.
+        여러 스레드가 동시에 불러도 디코드는 1회만 수행.
+        """
+        with self._lock:
+            if not self._decoded:
+                try:
+                    jpg_arr = np.frombuffer(self._jpeg_locked(), dtype=np.uint8)
+                    img = cv2.imdecode(jpg_arr, cv2.IMREAD_COLOR)
+                except Exception as e:
+                    logger.warning("[Frame] ⚠️ 디코드 실패: %s", e, extra={"rate_limit": 5})
+                    img = None
+                if img is not None:
+                    # 공유 버퍼 → 소비자가 실수로 덮어쓰지 않도록 잠금 (그릴 땐 copy())
+                    img.flags.writeable = False
+                self._image = img
+                self._decoded = True
+            return self._image
@@ -0,0 +1,59 @@
+# utils/geo.py
+# -*- coding: utf-8 -*-
+"""
+NumPy 지오 유틸 (좌표 배열 변환 / 로컬 평면 투영)
+
+- 좌표 목록은 [{"lat", "lng"}, ...] 또는 (N, 2) [lat, lng] 배열
+- 단위 m, 방위각은 0°=북 시계방향
+- project(): 서울 기준 등장방형 투영 → (N, 2) [x=동쪽 m, y=북쪽 m]
+  경로 / 교차로 / 차량 궤적은 수신 시 1회 투영해 두고 이후 거리·방위는 평면 연산
+  (축척은 기준 위도에서 미리 계산 → 서울권(±0.3°)에서 거리 오차 0.5% 미만)
+"""
+
+from math import cos, radians
+
+import numpy as np
+
+EARTH_R = 6371000.0
+
+# 로컬 평면 투영 기준점 (서울시청)
+PROJ_LAT0 = 37.5665
+PROJ_LON0 = 126.9780
+M_PER_DEG_LAT = radians(1.0) * EARTH_R
+M_PER_DEG_LON = M_PER_DEG_LAT * cos(radians(PROJ_LAT0))
+
+
+def as_latlng_array(points) -> np.ndarray:
+    """[{"lat", "lng"}, ...] / [[lat, lng], ...] → (N, 2) float64 배열"""
+    if isinstance(points, np.ndarray):
+        return points.astype(np.float64, copy=False).reshape(-1, 2)
+    n = len(points)
+    if n == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if isinstance(points[0], dict):
+        flat = np.fromiter(
+            (v for p in points for v in (p["lat"], p["lng"])),
+            dtype=np.float64,
+            count=2 * n,
+        )
+        return flat.reshape(n, 2)
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def project(points) -> np.ndarray:
+    """위경도 → 로컬 평면 좌표 (N, 2) [x, y] (m)"""
+    arr = as_latlng_array(points)
+    out = np.empty_like(arr)
+    out[:, 0] = (arr[:, 1] - PROJ_LON0) * M_PER_DEG_LON
+    out[:, 1] = (arr[:, 0] - PROJ_LAT0) * M_PER_DEG_LAT
+    return out
+
+
+def project_point(lat: float, lng: float) -> tuple[float, float]:
+    """위경도 한 점 → 로컬 평면 (x, y) (m)"""
+    return (lng - PROJ_LON0) * M_PER_DEG_LON, (lat - PROJ_LAT0) * M_PER_DEG_LAT
+
+
+def planar_bearing(dx, dy):
+    """평면 벡터 (dx=동쪽, dy=북쪽) 의 방위각 (0~360, 0°=북 시계방향)"""
+    return (np.degrees(np.arctan2(dx, dy)) + 360) % 360
@@ -0,0 +1,57 @@
+# utils/json_codec.py
+# -*- coding: utf-8 -*-
+"""
+WS 송수신용 JSON 코덱
+
+- orjson 이 설치돼 있으면 사용 (없으면 표준 json 으로 fallback)
+- 직렬화 결과는 항상 UTF-8 bytes → 한 번 인코딩한 payload 를 모든 수신자에게 그대로 전송
+- 영상 프레임은 base64 문자열을 다시 escape 하지 않고 envelope 만 씌움
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+_ORJSON_OPTS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def dumps_bytes(data) -> bytes:
+    """dict → UTF-8 JSON bytes (ensure_ascii=False 와 동일한 결과)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=_ORJSON_OPTS)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def loads(msg):
+    """str / bytes → dict"""
+    if orjson is not None:
+        return orjson.loads(msg)
+    return json.loads(msg)
+
+
+def _is_b64_safe(frame: str) -> bool:
+    # 그대로 이어붙여도 되는 문자열인지 (escape 가 필요한 문자가 없는지)
+    # - isprintable: 제어 문자(0x20 미만, MIME 줄바꿈된 base64 의 CR/LF 등) 거부
+    # - 모두 C 레벨 스캔이라 100KB 프레임도 수 μs
+    return frame.isascii() and frame.isprintable() and '"' not in frame and "\\" not in frame
+
+
+def encode_frame_envelope(event: str, car, frame: str, tier: str | None = None) -> bytes:
+    """
+    {"event": event, "car": car[, "tier": tier], "frame": frame} 를 bytes 로 직렬화
+    frame(base64) 은 escape 없이 그대로 이어붙임
+    """
+    head_obj = {"event": event, "car": car}
+    if tier is not None:
+        head_obj["tier"] = tier
+    if not isinstance(frame, str) or not _is_b64_safe(frame):
+        return dumps_bytes({**head_obj, "frame": frame})
+
+    head = dumps_bytes(head_obj)
+    return b"".join((head[:-1], b',"frame":"', frame.encode("ascii"), b'"}'))
@@ -0,0 +1,97 @@
+# utils/log.py
+# -*- coding: utf-8 -*-
+"""
+비동기 로깅 설정
+
+- 레벨: 환경변수 LOG_LEVEL (기본 INFO). 프레임/좌표 단위 로그는 DEBUG 로 남김
+- QueueHandler → 백그라운드 QueueListener 스레드가 stdout 출력
+  → WS 루프 / YOLO 스레드는 큐에 넣기만 하고 I/O 로 막히지 않음
+- 반복 메시지 제어 (extra 로 지정, 같은 메시지 템플릿 단위)
+    logger.info("...", extra={"sample": 10})       # 10번 중 1번만 기록
+    logger.warning("...", extra={"rate_limit": 5})  # 템플릿당 5초에 1번만 기록 (생략 수 표시)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname).1s [%(name)s] %(message)s"
+
+# 큐가 가득 차면 (출력이 못 따라가면) 새 로그를 버림 → 호출 스레드는 절대 블로킹 안 됨
+LOG_QUEUE_MAX = 10000
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _ThrottleFilter(logging.Filter):
+    """extra 의 sample / rate_limit 값에 따라 반복 메시지를 걸러냄"""
+
+    def __init__(self):
+        super().__init__()
+        self._sample_counts: dict[tuple, int] = {}
+        # key → (마지막 기록 시각, 그 뒤로 생략된 개수)
+        self._rate_state: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, "sample", None)
+        if sample:
+            key = (record.name, record.msg)
+            n = self._sample_counts.get(key, 0)
+            self._sample_counts[key] = n + 1
+            if n % sample != 0:
+                return False
+
+        interval = getattr(record, "rate_limit", None)
+        if interval:
+            key = (record.name, record.msg)
+            now = time.monotonic()
+            state = self._rate_state.get(key)
+            if state is not None and now - state[0] < interval:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state is not None else 0
+            self._rate_state[key] = [now, 0]
+            if suppressed:
+                record.msg = f"{record.msg} (+{suppressed}회 생략)"
+        return True
+
+
+class _DropQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_logging(level: str | None = None) -> None:
+    """루트 로거에 큐 핸들러 연결 (여러 번 불러도 1회만 설정)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.environ.get("LOG_LEVEL") or "INFO").upper()
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    qh = _DropQueueHandler(log_queue)
+    qh.addFilter(_ThrottleFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(qh)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,305 @@
+# utils/metrics.py
+# -*- coding: utf-8 -*-
+"""
+실시간 파이프라인 지표 (Prometheus text format, /metrics 에서 노출)
+
+- 수집 경로(WS 루프 / YOLO 스레드 / 레코더 스레드)에는 락 없음
+    - 값 갱신은 각 child 객체의 += 한 번 (CPython GIL 하에서 동작)
+    - 서로 다른 스레드가 같은 child 를 동시에 올리면 드물게 1 씩 유실될 수 있으나
+      모니터링 용도라 허용 (대부분 child 는 한 스레드에서만 갱신됨)
+- labels(...) 결과는 dict 에 캐시 → 자주 쓰는 child 는 호출 측에서 잡아두고 써도 됨
+- 게이지는 set() 또는 set_function(fn) (스크레이프 시점에 fn 호출)
+- 멀티 프로세스 모드: ingest 워커가 render_samples("worker", i) 결과를 주기적으로 허브에 보내고
+  허브는 set_remote_samples 로 등록 → 허브 /metrics 에 같은 지표 아래 worker 라벨로 같이 노출
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 초 단위 지연 기본 버킷 (0.5ms ~ 10s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: list = []
+# 다른 프로세스에서 받은 샘플 줄 (출처 → {지표 이름: [줄, ...]})
+_remote: Dict[str, Dict[str, list]] = {}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default()
+        _registry.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values) -> None:
+        """라벨 child 삭제 (차량 번호처럼 계속 바뀌는 라벨은 다 쓰면 지워서 /metrics 가 무한히 커지지 않게)"""
+        self._children.pop(tuple(str(v) for v in values), None)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # 라벨 없는 지표는 빈 튜플 child 하나만 사용
+        return self.labels()
+
+    def samples(self, extra: str = "") -> list[str]:
+        """HELP / TYPE 없이 샘플 줄만 (extra: 모든 샘플에 덧붙일 라벨, 예: 'worker="0"')"""
+        lines = []
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child, extra))
+        return lines
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        for remote in list(_remote.values()):
+            lines.extend(remote.get(self.name, ()))
+        return lines
+
+
+# ---------- Counter ----------
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, n: float = 1.0) -> None:
+        self._default().inc(n)
+
+    def _render_child(self, key, child, extra=""):
+        return [f"{self.name}{_fmt_labels(self.labelnames, key, extra)} {_fmt_value(child.value)}"]
+
+
+# ---------- Gauge ----------
+
+
+class _GaugeChild:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn: Optional[Callable[[], float]] = None
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+    def dec(self, n: float = 1.0) -> None:
+        self.value -= n
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self.fn = fn
+
+    def get(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, v: float) -> None:
+        self._default().set(v)
+
+    def inc(self, n: float = 1.0) -> None:
+        self._default().inc(n)
+
+    def dec(self, n: float = 1.0) -> None:
+        self._default().dec(n)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self._default().set_function(fn)
+
+    def _render_child(self, key, child, extra=""):
+        return [f"{self.name}{_fmt_labels(self.labelnames, key, extra)} {_fmt_value(child.get())}"]
+
+
+# ---------- Histogram ----------
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        # 버킷별 (비누적) 개수, 마지막 칸은 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def time_since(self, t0: float) -> None:
+        """t0 = time.perf_counter() 로 잰 시작 시각"""
+        self.observe(time.perf_counter() - t0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, v: float) -> None:
+        self._default().observe(v)
+
+    def _render_child(self, key, child, extra=""):
+        lines = []
+        acc = 0
+        counts = list(child.counts)
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            acc += n
+            le = f'le="{_fmt_value(float(bound))}"'
+            if extra:
+                le = f"{extra},{le}"
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {acc}")
+        lbl = _fmt_labels(self.labelnames, key, extra)
+        lines.append(f"{self.name}_sum{lbl} {_fmt_value(child.sum)}")
+        lines.append(f"{self.name}_count{lbl} {acc}")
+        return lines
+
+
+def render_all() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def render_samples(label: str, value) -> Dict[str, list]:
+    """이 프로세스의 샘플 줄 전체 (지표 이름 → 줄 목록, 모든 샘플에 label=value 추가) — 허브로 보내는 용도"""
+    extra = f'{label}="{_escape(value)}"'
+    out = {}
+    for metric in _registry:
+        lines = metric.samples(extra)
+        if lines:
+            out[metric.name] = lines
+    return out
+
+
+def set_remote_samples(source: str, samples: Optional[Dict[str, list]]) -> None:
+    """
+    다른 프로세스의 render_samples 결과 등록 (None 이면 제거)
+    허브에 없는 지표 이름은 무시됨 (같은 utils.metrics 를 쓰므로 보통 없음)
+    """
+    if samples is None:
+        _remote.pop(source, None)
+    else:
+        _remote[source] = samples
+
+
+# ================================================================
+# 파이프라인 지표 정의
+# ================================================================
+
+# --- WS 수신 / 핸들러 ---
+WS_MESSAGES = Counter("ws_messages_total", "수신한 WS 메시지 수 (type 별)", ["type"])
+WS_HANDLER_SECONDS = Histogram("ws_handler_seconds", "WS 메시지 핸들러 처리 시간 (type 별)", ["type"])
+WS_CLIENTS = Gauge("ws_clients", "현재 연결된 WS 클라이언트 수")
+
+# --- 브로드캐스트 ---
+WS_BROADCAST_SECONDS = Histogram(
+    "ws_broadcast_fanout_seconds", "브로드캐스트 1건을 수신자 큐에 적재하는 시간 (event 별)", ["event"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+WS_BROADCAST_BYTES = Counter("ws_broadcast_bytes_total", "송신 큐에 적재한 바이트 (payload x 수신자)", ["event"])
+WS_BROADCAST_RECIPIENTS = Counter("ws_broadcast_recipients_total", "브로드캐스트 수신자 수 누적", ["event"])
+
+# --- YOLO ---
+YOLO_QUEUE_DEPTH = Gauge("yolo_queue_depth", "YOLO 처리 대기 프레임 수 (차량별 우편함 합계, 차량당 최대 1)")
+YOLO_INFERENCE_FPS = Gauge("yolo_inference_fps", "YOLO 추론 처리율 (최근 1초 이상 구간)")
+YOLO_INFERENCE_SECONDS = Histogram("yolo_inference_seconds", "YOLO 추론(track) 1회 시간 (배치 1개)")
+YOLO_BATCH_FRAMES = Histogram(
+    "yolo_batch_frames", "YOLO 추론 1회에 묶인 프레임 수", buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32),
+)
+YOLO_FRAME_LATENCY_SECONDS = Histogram(
+    "yolo_frame_latency_seconds", "프레임 WS 수신 → YOLO 결과까지 걸린 시간",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+YOLO_TRACKED_CARS = Gauge("yolo_tracked_cars", "YOLO 추적 상태(차량별 tracker)를 가진 차량 수")
+YOLO_CAR_FRAMES = Counter("yolo_car_frames_total", "YOLO 에 들어온 프레임 수 (차량별)", ["car"])
+YOLO_CAR_FRAMES_STALE = Counter(
+    "yolo_car_frames_stale_total", "처리 전에 새 프레임으로 대체되어 건너뛴 프레임 수 (차량별)", ["car"]
+)
+YOLO_CAR_STALE_RATIO = Gauge("yolo_car_stale_ratio", "차량별 stale 스킵 비율 (건너뛴 / 들어온 프레임)", ["car"])
+YOLO_FRAMES_DROPPED = Counter("yolo_frames_dropped_total", "YOLO 에 들어가지 못한 프레임 수 (사유별)", ["reason"])
+
+# --- 경로 분석 캐시 ---
+ROUTE_CACHE_REQUESTS = Counter("route_cache_requests_total", "경로 분석 캐시 조회 수 (hit / miss)", ["result"])
+ROUTE_CACHE_HIT_RATIO = Gauge("route_cache_hit_ratio", "경로 분석 캐시 적중률 (서버 시작 이후)")
+ROUTE_CACHE_ENTRIES = Gauge("route_cache_entries", "경로 분석 캐시에 보관 중인 경로 수")
+
+# --- 녹화 ---
+RECORDER_FRAMES_WRITTEN = Counter("recorder_frames_written_total", "VideoRecorder 가 기록한 프레임 수")
+RECORDER_FRAMES_DROPPED = Counter("recorder_frames_dropped_total", "레코더 backlog 초과로 버린 프레임 수")
+
+# --- S3 ---
+S3_UPLOAD_SECONDS = Histogram(
+    "s3_upload_seconds", "S3 업로드 시간 (종류별)", ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+S3_UPLOAD_FAILURES = Counter("s3_upload_failures_total", "S3 업로드 실패 수 (종류별)", ["kind"])
@@ -0,0 +1,145 @@
+# utils/route_cache.py
+# -*- coding: utf-8 -*-
+"""
+경로 분석 (저장용 경로 정리 + compute_crossroad_directions) 과 결과 캐시
+
+내비 단말은 재탐색 / 재접속 때 같은(거의 같은) route 를 다시 보냄 → 같은 분석을 반복하지 않도록
+- 키   : 좌표를 소수 5자리(약 1m)로 반올림한 polyline + radius 의 해시
+- 정책 : LRU (최대 ROUTE_CACHE_SIZE 개) + TTL (ROUTE_CACHE_TTL 초 지나면 다시 계산)
+- 반환 : 항목 dict 를 복사해서 돌려줌 (호출 측이 status / offset 을 붙여도 캐시는 그대로)
+- analyze_route_job(): 프로세스 풀 작업 단위 (캐시 없이 계산만, 교차로 CSV 는 프로세스당 1회 로드)
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from utils.crossroad_utils import compute_crossroad_directions, get_crossroad_index, load_crossroad_csv
+from utils.geo import as_latlng_array
+from utils.route_simplify import route_keep_indices, simplify_route
+from utils.metrics import ROUTE_CACHE_REQUESTS, ROUTE_CACHE_HIT_RATIO, ROUTE_CACHE_ENTRIES
+
+# 캐시할 경로 수
+ROUTE_CACHE_SIZE = 128
+# 캐시 유효 시간 (초) — 교차로 CSV 가 바뀌는 경우 등을 고려해 무한 보관은 하지 않음
+ROUTE_CACHE_TTL = 600.0
+# 키를 만들 때 좌표 반올림 자릿수 (5 → 약 1.1m)
+KEY_PRECISION = 5
+
+
+def polyline_key(route_points, radius, precision: int = KEY_PRECISION) -> bytes:
+    """반올림한 polyline + radius → 고정 길이 해시 키"""
+    arr = np.round(as_latlng_array(route_points), precision)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+    h.update(repr(float(radius)).encode("ascii"))
+    return h.digest()
+
+
+class RouteAnalysisCache:
+    def __init__(self, maxsize: int = ROUTE_CACHE_SIZE, ttl: float = ROUTE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key → (저장 시각, 결과)
+        self._data: "OrderedDict[bytes, tuple[float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: bytes):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: bytes, value: list) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = RouteAnalysisCache()
+
+ROUTE_CACHE_HIT_RATIO.set_function(lambda: _cache.hit_ratio)
+ROUTE_CACHE_ENTRIES.set_function(lambda: len(_cache))
+
+
+class RouteAnalysis(NamedTuple):
+    route: np.ndarray   # 저장용 경로 (단순화 + 보간, (N, 2) [lat, lng], 읽기 전용)
+    crossroads: list    # compute_crossroad_directions 결과
+
+
+def compute_route_analysis(route_points, crossroad_df_or_index, radius=50) -> RouteAnalysis:
+    """캐시 없이 경로 분석 (교차로 반경 안의 점은 유지하고 경로 정리 + 교차로 방향 계산)"""
+    pts = as_latlng_array(route_points)
+    index = get_crossroad_index(crossroad_df_or_index)
+    stored = simplify_route(pts, route_keep_indices(pts, index, radius))
+    stored.flags.writeable = False
+    return RouteAnalysis(stored, compute_crossroad_directions(pts, index, radius=radius))
+
+
+# 프로세스 풀 워커: CSV 경로 → 교차로 인덱스 (프로세스마다 1회 로드)
+_worker_indexes: dict = {}
+
+
+def analyze_route_job(route_points, crossroad_csv: str, radius=50) -> RouteAnalysis:
+    index = _worker_indexes.get(crossroad_csv)
+    if index is None:
+        index = _worker_indexes[crossroad_csv] = get_crossroad_index(load_crossroad_csv(crossroad_csv))
+    return compute_route_analysis(route_points, index, radius)
+
+
+def _copy(analysis: RouteAnalysis) -> RouteAnalysis:
+    return RouteAnalysis(analysis.route, [dict(c) for c in analysis.crossroads])
+
+
+def lookup(route_points, radius=50) -> tuple[bytes, Optional[RouteAnalysis]]:
+    """캐시 조회 → (키, 결과 사본 또는 None). 없으면 계산 후 store(키, 결과)"""
+    key = polyline_key(route_points, radius)
+    cached = _cache.get(key)
+    if cached is None:
+        ROUTE_CACHE_REQUESTS.labels("miss").inc()
+        return key, None
+    ROUTE_CACHE_REQUESTS.labels("hit").inc()
+    return key, _copy(cached)
+
+
+def store(key: bytes, analysis: RouteAnalysis) -> RouteAnalysis:
+    """계산 결과 캐시 저장 → 호출 측이 쓸 사본"""
+    analysis.route.flags.writeable = False
+    _cache.put(key, analysis)
+    return _copy(analysis)
+
+
+def analyze_route(route_points, crossroad_df_or_index, radius=50) -> RouteAnalysis:
+    """캐시 + 현재 스레드에서 바로 계산 (결과 crossroads 는 호출마다 새 dict 리스트)"""
+    key, cached = lookup(route_points, radius)
+    if cached is not None:
+        return cached
+    return store(key, compute_route_analysis(route_points, crossroad_df_or_index, radius))
@@ -0,0 +1,118 @@
+# utils/route_simplify.py
+# -*- coding: utf-8 -*-
+"""
+route 수신 시 경로 polyline 정리 (저장 / 매칭용)
+
+내비가 보내는 polyline 은 밀도가 제각각 (직선 구간에 수십 개 점 / 굽은 길에 수백 m 간격)
+→ 저장 전에 한 번 정리해서 경로당 메모리 · 매칭 비용을 예측 가능하게 유지
+    1) 연속 중복 점 제거
+    2) Douglas–Peucker 단순화 (허용 오차 SIMPLIFY_TOLERANCE m)
+       단, 교차로 반경 안의 꼭짓점은 그대로 유지 (진입/이탈 방향 판정에 필요)
+    3) 선분이 RESAMPLE_MAX_SPACING m 보다 길면 등간격으로 점 보간
+       → 점 수 ≈ 경로 길이 / 간격 + 굽은 곳 꼭짓점 수
+결과는 (N, 2) [lat, lng] float64 배열 (route_matcher.ambulance_routes 저장 형식)
+"""
+
+import numpy as np
+
+from utils.geo import as_latlng_array, project
+
+# 단순화 허용 오차 (m) — 원래 경로에서 이 이상 벗어나는 꼭짓점은 남김
+SIMPLIFY_TOLERANCE = 3.0
+# 보간 후 최대 점 간격 (m)
+RESAMPLE_MAX_SPACING = 30.0
+
+
+def _segment_distances(xy: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    """xy[lo+1:hi] 각 점에서 선분 xy[lo]–xy[hi] 까지 거리"""
+    a = xy[lo]
+    v = xy[hi] - a
+    p = xy[lo + 1:hi] - a
+    len2 = float(v @ v)
+    if len2 == 0.0:
+        return np.hypot(p[:, 0], p[:, 1])
+    t = np.clip((p @ v) / len2, 0.0, 1.0)
+    d = p - t[:, None] * v
+    return np.hypot(d[:, 0], d[:, 1])
+
+
+def douglas_peucker(xy: np.ndarray, tolerance: float, keep: np.ndarray | None = None) -> np.ndarray:
+    """
+    남길 꼭짓점 bool 마스크 (N,)
+    keep 으로 지정한 점은 무조건 남기고, 그 사이 구간마다 따로 단순화 (재귀 대신 스택)
+    """
+    n = len(xy)
+    mask = np.zeros(n, dtype=bool) if keep is None else keep.astype(bool, copy=True)
+    if n == 0:
+        return mask
+    mask[0] = mask[-1] = True
+
+    anchors = np.flatnonzero(mask).tolist()
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        d = _segment_distances(xy, lo, hi)
+        k = int(np.argmax(d))
+        if d[k] > tolerance:
+            mid = lo + 1 + k
+            mask[mid] = True
+            stack.append((lo, mid))
+            stack.append((mid, hi))
+    return mask
+
+
+def resample(latlng: np.ndarray, xy: np.ndarray, max_spacing: float) -> np.ndarray:
+    """긴 선분 사이에 등간격 점 보간 (투영이 선형이라 위경도에서 바로 보간해도 동일)"""
+    if len(latlng) < 2:
+        return latlng
+    seg = np.hypot(*(xy[1:] - xy[:-1]).T)
+    parts = np.maximum(1, np.ceil(seg / max_spacing).astype(np.int64))
+    if int(parts.max()) == 1:
+        return latlng
+
+    seg_ids = np.repeat(np.arange(len(seg)), parts)
+    first = np.repeat(np.cumsum(parts) - parts, parts)
+    t = (np.arange(len(seg_ids)) - first) / parts[seg_ids]
+    a = latlng[seg_ids]
+    out = a + (latlng[seg_ids + 1] - a) * t[:, None]
+    return np.vstack([out, latlng[-1:]])
+
+
+def simplify_route(
+    route_points,
+    keep_idx=(),
+    tolerance: float = SIMPLIFY_TOLERANCE,
+    max_spacing: float = RESAMPLE_MAX_SPACING,
+) -> np.ndarray:
+    """
+    route_points: [{"lat", "lng"}, ...] 또는 (N, 2) 배열
+    keep_idx    : 반드시 남길 원본 점 인덱스 (교차로 반경 안의 점 등)
+    """
+    latlng = as_latlng_array(route_points)
+    keep = np.zeros(len(latlng), dtype=bool)
+    keep_idx = np.fromiter(keep_idx, dtype=np.int64)
+    if len(keep_idx):
+        keep[keep_idx] = True
+
+    # 연속 중복 점 제거 (중복 중 하나라도 keep 이면 남는 점도 keep)
+    if len(latlng) >= 2:
+        moved = np.concatenate(([True], np.any(latlng[1:] != latlng[:-1], axis=1)))
+        group = np.cumsum(moved) - 1
+        merged = np.zeros(int(group[-1]) + 1, dtype=bool)
+        np.logical_or.at(merged, group, keep)
+        latlng, keep = latlng[moved], merged
+    if len(latlng) < 3:
+        return np.array(latlng, dtype=np.float64)
+
+    xy = project(latlng)
+    mask = douglas_peucker(xy, tolerance, keep)
+    latlng, xy = latlng[mask], xy[mask]
+    return np.ascontiguousarray(resample(latlng, xy, max_spacing), dtype=np.float64)
+
+
+def route_keep_indices(route_points, crossroad_index, radius: float) -> list[int]:
+    """교차로 반경 안에 들어오는 경로 점 인덱스 (단순화할 때 유지할 점)"""
+    inside = crossroad_index.points_within(route_points, radius)
+    return sorted({i for idxs in inside.values() for i in idxs})
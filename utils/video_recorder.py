@@ -1,14 +1,14 @@
 # utils/video_recorder.py
 import os
 import cv2
-import base64
-import numpy as np
 import subprocess
 import time
 from datetime import datetime
 
 from s3_client import s3, bucket_name
 from utils.car_utils import normalize_car_no
+from utils.frame_pipeline import Frame
+from utils.metrics import RECORDER_FRAMES_WRITTEN, S3_UPLOAD_SECONDS, S3_UPLOAD_FAILURES
 
 SAVE_DIR = os.path.abspath("videos")
 os.makedirs(SAVE_DIR, exist_ok=True)
@@ -85,22 +85,17 @@ class VideoRecorder:
         """
         base64 인코딩된 jpg 한 프레임을 디코드해서 영상에 추가
         """
-        try:
-            if not frame_b64:
-                print("[VideoRecorder] ⚠️ 빈 frame_b64")
-                return
-
-            # data:image/jpeg;base64,... 형식이면 앞부분 제거
-            if isinstance(frame_b64, str) and frame_b64.startswith("data:"):
-                try:
-                    frame_b64 = frame_b64.split(",", 1)[1]
-                except Exception:
-                    print("[VideoRecorder] ⚠️ data URL 파싱 실패")
-                    return
+        if not frame_b64:
+            print("[VideoRecorder] ⚠️ 빈 frame_b64")
+            return
+        self.write_frame(Frame(None, frame_b64))
 
-            jpg_bytes = base64.b64decode(frame_b64)
-            jpg_arr = np.frombuffer(jpg_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(jpg_arr, cv2.IMREAD_COLOR)
+    def write_frame(self, shared: Frame):
+        """
+        공유 Frame 객체를 영상에 추가 (디코드는 Frame 이 1회만 수행, YOLO 워커와 공유)
+        """
+        try:
+            frame = shared.image()
 
             if frame is None:
                 print("[VideoRecorder] ⚠️ frame decode 실패 (None)")
@@ -122,13 +117,14 @@ class VideoRecorder:
             if self.writer and self.writer.isOpened():
                 self.writer.write(resized)
                 self.frame_count += 1
+                RECORDER_FRAMES_WRITTEN.inc()
                 # print(
                 #     f"[VideoRecorder] ✅ 프레임 기록 "
                 #     f"(count={self.frame_count}, src={w}x{h}, dst={VIDEO_W}x{VIDEO_H})"
                 # )
 
         except Exception as e:
-            print("[VideoRecorder] ❌ write_frame_b64 오류:", e)
+            print("[VideoRecorder] ❌ write_frame 오류:", e)
 
     # ---------- 내부: ffmpeg로 H.264 변환 ----------
 
@@ -230,6 +226,7 @@ class VideoRecorder:
 
         # 3) S3 업로드 (변환 성공한 경우에만)
         if encoded_ok and os.path.exists(self.final_path):
+            t0 = time.perf_counter()
             try:
                 content_type = "video/mp4"
                 s3.upload_file(
@@ -238,11 +235,13 @@ class VideoRecorder:
                     self.s3_key,
                     ExtraArgs={"ContentType": content_type},
                 )
+                S3_UPLOAD_SECONDS.labels("video").time_since(t0)
                 print(
                     f"✅ 동영상 업로드 완료 → "
                     f"https://{bucket_name}.s3.us-east-1.amazonaws.com/{self.s3_key}"
                 )
             except Exception as e:
+                S3_UPLOAD_FAILURES.labels("video").inc()
                 print(f"❌ 동영상 업로드 실패: {e}")
         else:
             print("[VideoRecorder] ⚠️ 인코딩 실패 또는 final 파일 없음 → 업로드 스킵")
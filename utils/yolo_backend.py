@@ -0,0 +1,140 @@
+# utils/yolo_backend.py
+# -*- coding: utf-8 -*-
+"""
+YOLO 추론 백엔드 선택 (best.pt → torch / onnx / openvino)
+
+GPU 없는 엣지 서버는 PyTorch CPU 추론이 느려서 변환 모델을 쓸 수 있게 함
+- torch    : best.pt 그대로 (기존 동작)
+- onnx     : ONNX Runtime (INT8 이면 onnxruntime 동적 양자화, 보정 데이터 불필요)
+- openvino : OpenVINO IR (INT8 이면 NNCF 정적 양자화 → 보정용 데이터셋 yaml 필요, YOLO_INT8_DATA)
+변환 결과는 가중치 옆에 캐시 (예: best_640.onnx, best_640_int8_openvino_model/)
+    - 가중치가 더 새것이면 다시 변환
+    - 여러 프로세스(ingest 워커)가 동시에 켜져도 파일 락으로 1번만 변환
+    - 변환 / 로드에 실패하면 torch 로 되돌아감 (서버는 계속 동작)
+      .onnx / OpenVINO 는 YOLO() 생성 시점엔 경로만 기억하므로 빈 이미지로 1회 추론해서 확인
+배치 추론을 위해 dynamic 축으로 변환 (배치 크기 / 입력 크기 가변)
+onnx / openvino 백엔드에 필요한 패키지는 requirements-cpu.txt (기본 requirements 에는 없음)
+"""
+
+import os
+import shutil
+from typing import NamedTuple
+
+import numpy as np
+from ultralytics import YOLO
+
+try:
+    import fcntl
+except ImportError:  # POSIX 가 아닌 환경 → 변환 락 없이 진행
+    fcntl = None
+
+from utils.log import get_logger
+
+logger = get_logger("yolo.backend")
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# ultralytics export format 이름
+_EXPORT_FORMAT = {"onnx": "onnx", "openvino": "openvino"}
+
+
+class LoadedModel(NamedTuple):
+    model: YOLO
+    backend: str          # 실제로 로드된 백엔드 (실패로 torch 로 되돌아갔으면 torch)
+    path: str             # 로드한 가중치 / 변환 모델 경로
+    predict_kwargs: dict  # model.predict 에 같이 넘길 인자 (imgsz, device)
+
+
+def exported_path(weights: str, backend: str, imgsz: int, int8: bool = False) -> str:
+    """변환 모델 캐시 경로 (가중치와 같은 폴더)"""
+    stem = os.path.splitext(os.path.abspath(weights))[0]
+    tag = f"{imgsz}_int8" if int8 else str(imgsz)
+    if backend == "onnx":
+        return f"{stem}_{tag}.onnx"
+    if backend == "openvino":
+        return f"{stem}_{tag}_openvino_model"
+    raise ValueError(f"unknown YOLO backend: {backend}")
+
+
+def _is_fresh(path: str, weights: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights)
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _quantize_onnx(src: str, dst: str) -> None:
+    """ONNX 동적 INT8 양자화 (가중치 INT8, 활성값은 실행 시 양자화)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+
+
+def export_model(
+    weights: str,
+    backend: str,
+    imgsz: int = 640,
+    int8: bool = False,
+    int8_data: str | None = None,
+) -> str:
+    """best.pt → 변환 모델 경로 (캐시가 있으면 그대로)"""
+    target = exported_path(weights, backend, imgsz, int8)
+    if _is_fresh(target, weights):
+        return target
+
+    with open(target + ".lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # 락 기다리는 동안 다른 프로세스가 변환했을 수 있음
+        if _is_fresh(target, weights):
+            return target
+
+        logger.info("🔧 YOLO 모델 변환: %s → %s (imgsz=%d, int8=%s)", weights, backend, imgsz, int8)
+        kwargs = {"format": _EXPORT_FORMAT[backend], "imgsz": imgsz, "dynamic": True}
+        if backend == "openvino" and int8:
+            kwargs["int8"] = True
+            if int8_data:
+                kwargs["data"] = int8_data
+        out = YOLO(weights).export(**kwargs)
+
+        _remove(target)
+        if backend == "onnx" and int8:
+            _quantize_onnx(out, target)
+            os.remove(out)
+        else:
+            os.replace(out, target)
+        logger.info("✅ YOLO 모델 변환 완료: %s", target)
+    return target
+
+
+def load_model(
+    weights: str,
+    backend: str = "torch",
+    imgsz: int = 640,
+    int8: bool = False,
+    int8_data: str | None = None,
+    device: str = "cpu",
+) -> LoadedModel:
+    """설정한 백엔드로 YOLO 모델 로드 (실패하면 torch 가중치로)"""
+    if backend not in BACKENDS:
+        logger.error("❌ 알 수 없는 YOLO 백엔드 %r → torch 사용", backend)
+        backend = "torch"
+
+    if backend != "torch":
+        try:
+            path = export_model(weights, backend, imgsz, int8, int8_data)
+            # openvino 는 CPU 전용으로 사용 (GPU 가 있으면 torch 백엔드를 쓰면 됨)
+            dev = "cpu" if backend == "openvino" else device
+            kwargs = {"imgsz": imgsz, "device": dev}
+            model = YOLO(path, task="detect")
+            # 런타임 패키지 누락 / 깨진 캐시는 실제 추론 때 드러남 → 여기서 미리 1회 실행
+            model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False, **kwargs)
+            return LoadedModel(model, backend, path, kwargs)
+        except Exception as e:
+            logger.error("❌ YOLO %s 백엔드 준비 실패 → torch 사용: %s", backend, e)
+
+    return LoadedModel(YOLO(weights), "torch", weights, {"imgsz": imgsz, "device": device})
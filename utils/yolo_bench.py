@@ -0,0 +1,175 @@
+# utils/yolo_bench.py
+# -*- coding: utf-8 -*-
+"""
+YOLO 백엔드 벤치마크 (처리율 + torch 대비 검출 일치율)
+
+    python -m utils.yolo_bench <영상 파일 | 이미지 폴더> [--backends torch onnx openvino] [--int8]
+                               [--imgsz 640] [--batch 4] [--frames 200] [--device cpu]
+
+- 같은 프레임을 백엔드별로 yolo_worker 와 같은 인자(conf / imgsz / 배치)로 검출
+- fps      : 워밍업 제외, 배치 predict 시간 합 기준 (프레임 / 초)
+- 일치율   : torch 결과를 기준으로 신고 로직과 같은 conf 이상 박스를 같은 클래스 + IoU 로 1:1 매칭
+    recall    = 기준 박스 중 매칭된 비율
+    precision = 후보 박스 중 매칭된 비율
+    IoU / Δconf = 매칭된 박스 평균
+변환 모델은 yolo_worker 와 같은 캐시(가중치 옆)를 사용
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from config import Config
+from utils.yolo_backend import BACKENDS, load_model
+
+# yolo_worker 와 같은 값 (검출 conf / 신고 판정 conf)
+DETECT_CONF = 0.1
+REPORT_CONF = 0.3
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_frames(source: str, limit: int) -> list[np.ndarray]:
+    """영상 파일 또는 이미지 폴더 → BGR 프레임 목록 (최대 limit 장)"""
+    frames = []
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(IMAGE_EXTS))
+        for p in paths[:limit]:
+            img = cv2.imread(p)
+            if img is not None:
+                frames.append(img)
+        return frames
+
+    cap = cv2.VideoCapture(source)
+    try:
+        while len(frames) < limit:
+            ok, img = cap.read()
+            if not ok:
+                break
+            frames.append(img)
+    finally:
+        cap.release()
+    return frames
+
+
+def run_backend(loaded, frames: list[np.ndarray], batch: int, warmup: int):
+    """→ (fps, 프레임별 (xyxy, conf, cls) 목록)"""
+    model, kwargs = loaded.model, loaded.predict_kwargs
+    for _ in range(warmup):
+        model.predict(frames[:batch], conf=DETECT_CONF, verbose=False, **kwargs)
+
+    dets = []
+    elapsed = 0.0
+    for i in range(0, len(frames), batch):
+        chunk = frames[i:i + batch]
+        t0 = time.perf_counter()
+        results = model.predict(chunk, conf=DETECT_CONF, verbose=False, **kwargs)
+        elapsed += time.perf_counter() - t0
+        for r in results:
+            b = r.boxes.cpu().numpy()
+            dets.append((b.xyxy, b.conf, b.cls))
+    return len(frames) / elapsed if elapsed > 0 else 0.0, dets
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def compare(ref_dets, cand_dets, conf: float = REPORT_CONF, iou_thresh: float = 0.5) -> dict:
+    """기준 / 후보 검출 결과 일치율 (프레임별 IoU 큰 순서로 greedy 1:1 매칭)"""
+    n_ref = n_cand = n_match = 0
+    ious, dconf = [], []
+    for (rb, rc, rk), (cb, cc, ck) in zip(ref_dets, cand_dets):
+        rm, cm = rc >= conf, cc >= conf
+        rb, rc, rk = rb[rm], rc[rm], rk[rm]
+        cb, cc, ck = cb[cm], cc[cm], ck[cm]
+        n_ref += len(rb)
+        n_cand += len(cb)
+        if not len(rb) or not len(cb):
+            continue
+
+        iou = _iou_matrix(rb, cb)
+        iou[rk[:, None] != ck[None, :]] = 0.0
+        used_r, used_c = set(), set()
+        for flat in np.argsort(iou, axis=None)[::-1]:
+            i, j = divmod(int(flat), iou.shape[1])
+            if iou[i, j] < iou_thresh:
+                break
+            if i in used_r or j in used_c:
+                continue
+            used_r.add(i)
+            used_c.add(j)
+            ious.append(iou[i, j])
+            dconf.append(abs(rc[i] - cc[j]))
+        n_match += len(used_r)
+
+    return {
+        "recall": n_match / n_ref if n_ref else 1.0,
+        "precision": n_match / n_cand if n_cand else 1.0,
+        "iou": float(np.mean(ious)) if ious else float("nan"),
+        "dconf": float(np.mean(dconf)) if dconf else float("nan"),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="YOLO 백엔드별 fps / 검출 일치율 비교")
+    ap.add_argument("source", help="영상 파일 또는 이미지 폴더")
+    ap.add_argument("--weights", default=Config.YOLO_WEIGHTS)
+    ap.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    ap.add_argument("--int8", action="store_true", help="onnx / openvino 는 INT8 변환도 같이 측정")
+    ap.add_argument("--int8-data", default=Config.YOLO_INT8_DATA or None, help="openvino INT8 보정용 데이터셋 yaml")
+    ap.add_argument("--imgsz", type=int, default=Config.YOLO_IMGSZ)
+    ap.add_argument("--batch", type=int, default=Config.YOLO_BATCH_SIZE)
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--device", default="cpu")
+    args = ap.parse_args(argv)
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        raise SystemExit(f"프레임을 읽지 못함: {args.source}")
+    print(f"frames={len(frames)} imgsz={args.imgsz} batch={args.batch} device={args.device}")
+
+    # 일치율 기준은 항상 torch (목록에 없어도 기준용으로 먼저 실행)
+    variants = [("torch", False)]
+    for b in args.backends:
+        if b != "torch":
+            variants.append((b, False))
+            if args.int8:
+                variants.append((b, True))
+
+    rows = []
+    ref = None
+    for backend, int8 in variants:
+        loaded = load_model(args.weights, backend, args.imgsz, int8, args.int8_data, args.device)
+        name = backend + ("-int8" if int8 else "")
+        if loaded.backend != backend:
+            print(f"{name}: 준비 실패 → 건너뜀")
+            continue
+        fps, dets = run_backend(loaded, frames, max(1, args.batch), args.warmup)
+        if ref is None:
+            ref = dets
+        rows.append((name, fps, compare(ref, dets)))
+
+    print(f"{'backend':<16}{'fps':>8}{'recall':>9}{'precision':>11}{'IoU':>7}{'Δconf':>8}")
+    for name, fps, p in rows:
+        print(
+            f"{name:<16}{fps:>8.1f}{p['recall']:>9.3f}{p['precision']:>11.3f}"
+            f"{p['iou']:>7.3f}{p['dconf']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,42 @@ import os
 # ✅ OMP 에러 방지
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-import base64
 import threading
-import queue
 import time
 from datetime import datetime
+from typing import NamedTuple
 
 import cv2
 import numpy as np
 import torch
 from ultralytics import YOLO
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import YAML, IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
 
+from config import Config
 from utils.car_utils import normalize_car_no
+from utils.frame_pipeline import Frame
+from utils.log import get_logger
+from utils.yolo_backend import load_model
+from utils.metrics import (
+    YOLO_QUEUE_DEPTH,
+    YOLO_INFERENCE_FPS,
+    YOLO_INFERENCE_SECONDS,
+    YOLO_BATCH_FRAMES,
+    YOLO_FRAME_LATENCY_SECONDS,
+    YOLO_FRAMES_DROPPED,
+    YOLO_TRACKED_CARS,
+    YOLO_CAR_FRAMES,
+    YOLO_CAR_FRAMES_STALE,
+    YOLO_CAR_STALE_RATIO,
+    S3_UPLOAD_SECONDS,
+    S3_UPLOAD_FAILURES,
+)
 from s3_client import s3, bucket_name
 
+logger = get_logger("yolo")
+
 # 중앙 ROI 기준 (0~1 비율)
 CENTER_MIN = 0.4
 CENTER_MAX = 0.6
@@ -33,34 +55,37 @@ MIN_H = 60
 IMAGE_DIR = os.path.abspath("report_images")
 S3_IMAGE_PREFIX = "images"
 
-_frame_queue: "queue.Queue[tuple[str, str, float | None, float | None]]" = queue.Queue(
-    maxsize=200
-)
 _last_gps: dict[str, tuple[float | None, float | None]] = {}
 
-# 🔹 각 차량별 출동 시작 시각 (문자열 "YYYYMMDD_HHMM%S")
-_car_start_ts: dict[str, str] = {}
-
 # 🔥 GPU / CPU 선택
 if torch.cuda.is_available():
     DEVICE = "cuda:0"
 else:
     DEVICE = "cpu"
-print(f"[YOLO 워커] Using device: {DEVICE}")
+logger.info(f"[YOLO 워커] Using device: {DEVICE}")
 
-# YOLO 모델
-_model = YOLO("best.pt")
+# YOLO 모델 (추론 워커마다 1개씩 로드 — predictor 는 스레드 간 공유 불가)
+MODEL_PATH = Config.YOLO_WEIGHTS
+# 추론 백엔드 (torch / onnx / openvino, 변환 모델은 가중치 옆에 캐시 → utils.yolo_backend)
+BACKEND = Config.YOLO_BACKEND
+IMGSZ = Config.YOLO_IMGSZ
 
-# ---------- 추적 상태 ----------
-_in_center_time: dict[tuple[str, int], float] = {}
-_best_frame: dict[tuple[str, int], np.ndarray] = {}
-_best_score: dict[tuple[str, int], float] = {}
-_last_timestamp: dict[tuple[str, int], float] = {}
-_last_bbox: dict[tuple[str, int], tuple[int, int, int, int]] = {}
-_saved_ids: set[tuple[str, int]] = set()
+# 🔽 추적: 검출은 배치로, 추적(tracker)은 차량별로
+#    model.track 의 tracker 는 모델당 1개라 여러 차량 프레임이 섞이면 ID / 움직임 예측이 꼬임
+TRACKER_CFG = Config.YOLO_TRACKER
+# tracker 에 넘길 검출 최소 confidence (model.track 기본값과 동일, 낮은 박스는 2차 매칭에 사용)
+TRACK_CONF = 0.1
+TRACKER_FRAME_RATE = 30
+
+# 추론 워커 스레드 수 (차량은 워커 하나에 고정 → 한 차량 프레임은 항상 같은 순서로 같은 tracker 에)
+N_WORKERS = max(1, Config.YOLO_WORKERS)
 
 _worker_started = False
-_worker_thread: threading.Thread | None = None
+
+# 🔽 마이크로 배치: 여러 차량의 최신 프레임을 최대 BATCH_SIZE 장 / BATCH_WAIT_MS 까지 모아서 한 번에 추론
+#    (1 이면 프레임 1장씩, 대기 시간이 길수록 처리량↑ 지연↑)
+BATCH_SIZE = max(1, Config.YOLO_BATCH_SIZE)
+BATCH_WAIT_MS = max(0.0, Config.YOLO_BATCH_WAIT_MS)
 
 # 프레임 샘플링 (1이면 스킵 없음)
 _FRAME_SKIP = 1
@@ -72,6 +97,116 @@ SAVE_H = 640
 JPEG_QUALITY = 90
 
 
+# ---------- 차량별 추적 상태 ----------
+
+
+def _new_tracker():
+    cfg = IterableSimpleNamespace(**YAML.load(check_yaml(TRACKER_CFG)))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=TRACKER_FRAME_RATE)
+
+
+class _CarState:
+    """
+    차량 1대의 출동 1회 추적 상태 (set_run_start_time 에서 생성, release_car 에서 해제)
+    - tracker : 이 차량 프레임만 들어가는 tracker
+    - 나머지  : 트랙 ID → 신고 판정 상태
+    담당 추론 워커 스레드만 읽고 씀 (큐에 상태 객체를 같이 실어 보내므로 해제 후 남은 프레임도 안전)
+    """
+
+    def __init__(self, car_no: str, start_ts: str | None = None):
+        self.car_no = car_no
+        # 출동 시작 시각 (문자열 "YYYYMMDD_HHMMSS", 이미지 파일명용)
+        self.start_ts = start_ts
+        self.tracker = _new_tracker()
+        self.in_center_time: dict[int, float] = {}
+        self.best_frame: dict[int, np.ndarray] = {}
+        self.best_score: dict[int, float] = {}
+        self.last_timestamp: dict[int, float] = {}
+        self.last_bbox: dict[int, tuple[int, int, int, int]] = {}
+        self.saved_ids: set[int] = set()
+
+
+class _InferenceWorker:
+    """
+    추론 워커 1개 = 차량별 우편함 + 전용 YOLO 모델 + 스레드
+    - 우편함: 차량마다 아직 처리 안 한 최신 프레임 1장만 (디코드 전 Frame)
+      새 프레임이 오면 이전 프레임은 버림 → 밀린 프레임이 쌓이지 않아 지연 ≈ 추론 1회
+    - 라운드 로빈: dict 삽입 순서 = 대기 순서
+      꺼내 간 차량은 다음 프레임이 오면 맨 뒤에 다시 들어가고, 대기 중 교체는 자리 유지
+      → 프레임을 많이 보내는 차량이 다른 차량 차례를 뺏지 못함
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.mailbox: dict[str, tuple[_CarState, Frame, float | None, float | None]] = {}
+        self.cond = threading.Condition()
+        self.model: YOLO | None = None
+        self.predict_kwargs: dict = {}
+        self.thread: threading.Thread | None = None
+
+    def put(self, car_no: str, state: _CarState, frame: Frame, lat, lng) -> Frame | None:
+        """최신 프레임 넣기 → 밀려난 이전 프레임 (없으면 None)"""
+        with self.cond:
+            old = self.mailbox.get(car_no)
+            self.mailbox[car_no] = (state, frame, lat, lng)
+            self.cond.notify()
+        return old[1] if old is not None else None
+
+    def discard(self, car_no: str) -> None:
+        with self.cond:
+            old = self.mailbox.pop(car_no, None)
+        if old is not None:
+            old[1].release()
+
+
+_workers = [_InferenceWorker(i) for i in range(N_WORKERS)]
+YOLO_QUEUE_DEPTH.set_function(lambda: sum(len(wk.mailbox) for wk in _workers))
+
+_car_states: dict[str, _CarState] = {}
+# 차량 → 담당 워커 번호
+_car_worker: dict[str, int] = {}
+# 도착해서 해제된 차량 (다음 set_run_start_time 전까지 들어오는 프레임은 버림)
+# release_car 에서 추가, 같은 차량의 다음 set_run_start_time 에서 제거
+_released: set[str] = set()
+# _car_states / _car_worker / _released 보호
+# 워커 cond 안에서 잡을 수 있음 (cond → _state_lock 순서, 반대로 잡지 않음)
+_state_lock = threading.Lock()
+YOLO_TRACKED_CARS.set_function(lambda: len(_car_states))
+
+
+def _assign_worker(car_no: str) -> int:
+    """담당 워커 (처음이면 맡은 차량이 가장 적은 워커, _state_lock 안에서 호출)"""
+    idx = _car_worker.get(car_no)
+    if idx is None:
+        load = [0] * N_WORKERS
+        for i in _car_worker.values():
+            load[i] += 1
+        idx = _car_worker[car_no] = min(range(N_WORKERS), key=lambda i: (load[i], i))
+    return idx
+
+
+def _state_for(car_no: str) -> tuple[_CarState, _InferenceWorker] | None:
+    """차량 상태 + 담당 워커 (도착 후 다음 출동 전이면 None)"""
+    with _state_lock:
+        if car_no in _released:
+            return None
+        state = _car_states.get(car_no)
+        if state is None:
+            # set_run_start_time 보다 영상이 먼저 온 경우
+            state = _car_states[car_no] = _CarState(car_no)
+            _watch_stale_ratio(car_no)
+        return state, _workers[_assign_worker(car_no)]
+
+
+def _watch_stale_ratio(car_no: str):
+    """차량별 stale 비율 게이지 = 처리 전에 새 프레임으로 대체된 프레임 / 들어온 프레임"""
+    received = YOLO_CAR_FRAMES.labels(car_no)
+    stale = YOLO_CAR_FRAMES_STALE.labels(car_no)
+    YOLO_CAR_STALE_RATIO.labels(car_no).set_function(
+        lambda: stale.value / received.value if received.value else 0.0
+    )
+
+
 # ---------- 공용 함수: S3 업로드 리트라이 ----------
 
 
@@ -87,6 +222,7 @@ def _upload_bytes_to_s3_with_retry(
     정해진 횟수만큼 재시도하고 실패하면 False 리턴.
     """
     for attempt in range(1, retries + 1):
+        t0 = time.perf_counter()
         try:
             s3.put_object(
                 Bucket=bucket_name,
@@ -94,17 +230,38 @@ def _upload_bytes_to_s3_with_retry(
                 Body=data,
                 ContentType=content_type,
             )
-            print(
-                f"✅ 자동 신고 찰영 "
-                f"https://{bucket_name}.s3.us-east-1.amazonaws.com/{s3_key}"
+            S3_UPLOAD_SECONDS.labels("image").time_since(t0)
+            logger.info(
+                "✅ 자동 신고 찰영 https://%s.s3.us-east-1.amazonaws.com/%s",
+                bucket_name, s3_key,
             )
             return True
         except Exception as e:
-            print(f"❌ S3 업로드 실패({attempt}/{retries}): {e}")
+            S3_UPLOAD_FAILURES.labels("image").inc()
+            logger.error(f"❌ S3 업로드 실패({attempt}/{retries}): {e}")
             time.sleep(delay)
     return False
 
 
+# ---------- 추론 처리율 (yolo_inference_fps) ----------
+
+_fps_window_start = time.perf_counter()
+_fps_window_count = 0
+_fps_lock = threading.Lock()
+
+
+def _count_inference(n: int = 1):
+    global _fps_window_start, _fps_window_count
+    with _fps_lock:
+        _fps_window_count += n
+        now = time.perf_counter()
+        elapsed = now - _fps_window_start
+        if elapsed >= 1.0:
+            YOLO_INFERENCE_FPS.set(_fps_window_count / elapsed)
+            _fps_window_start = now
+            _fps_window_count = 0
+
+
 # ---------- 외부 API ----------
 
 
@@ -123,84 +280,114 @@ def set_run_start_time(car_no: str, start_time: datetime):
       비디오/CSV/이미지 파일 네이밍을 맞출 수 있음.
     """
     ts = start_time.strftime("%Y%m%d_%H%M%S")
-    _car_start_ts[car_no] = ts
-    print(f"[YOLO 워커] set_run_start_time car={car_no}, ts={ts}")
 
-    # 🔄 이 차량에 대한 이전 추적 상태 초기화
-    keys_to_clear = [k for k in _in_center_time.keys() if k[0] == car_no]
+    # 🔄 이 차량에 대한 이전 추적 상태 초기화 (새 tracker + 빈 신고 상태)
+    with _state_lock:
+        # 새 출동 → 도착 해제 표시 제거 (_released 는 출동 중이 아닌 차량만 남음)
+        _released.discard(car_no)
+        _car_states[car_no] = _CarState(car_no, ts)
+        idx = _assign_worker(car_no)
+        _watch_stale_ratio(car_no)
+    logger.info("[YOLO 워커] set_run_start_time car=%s, ts=%s, worker=%d", car_no, ts, idx)
 
-    for k in keys_to_clear:
-        _in_center_time.pop(k, None)
-        _best_frame.pop(k, None)
-        _best_score.pop(k, None)
-        _last_timestamp.pop(k, None)
-        _last_bbox.pop(k, None)
-        _saved_ids.discard(k)
 
-
-def enqueue_frame(car_no: str, frame_b64: str):
+def release_car(car_no: str):
+    """
+    도착(ambulance_arrival) 시 호출 → 이 차량의 tracker / 신고 상태 / 담당 워커 / 대기 프레임 / 차량별 지표 해제
+    (이미 워커가 꺼내 간 프레임은 자기 상태 객체로 끝까지 처리됨)
+    다음 set_run_start_time 전까지 이 차량 프레임은 enqueue_frame 에서 버림
+    """
+    with _state_lock:
+        _released.add(car_no)
+        _car_states.pop(car_no, None)
+        idx = _car_worker.pop(car_no, None)
+    if idx is not None:
+        _workers[idx].discard(car_no)
+    _last_gps.pop(car_no, None)
+    for metric in (YOLO_CAR_FRAMES, YOLO_CAR_FRAMES_STALE, YOLO_CAR_STALE_RATIO):
+        metric.remove(car_no)
+
+
+def enqueue_frame(car_no: str, frame: Frame | str):
     """
-    WS 서버에서 video 이벤트 받을 때 프레임 큐에 넣기
+    WS 서버에서 video 이벤트 받을 때 담당 워커의 차량 우편함에 넣기 (이전 대기 프레임은 교체)
+    - 공유 Frame 을 넘기면 VideoRecorder 와 디코드 결과를 공유 (retain 된 참조 1개를 넘겨받음)
+    - base64 문자열을 넘기면 여기서 Frame 으로 감쌈
     """
     global _frame_counter
-    if not frame_b64:
+    if not frame:
         return
+    if isinstance(frame, str):
+        frame = Frame(car_no, frame).retain()
 
     _frame_counter += 1
 
     # 프레임 샘플링 (_FRAME_SKIP=1이면 스킵 없음)
     if _frame_counter % _FRAME_SKIP != 0:
+        YOLO_FRAMES_DROPPED.labels("sampling").inc()
+        frame.release()
         return
 
-    # 큐 과부하 방지
-    if _frame_queue.qsize() > 50:
-        print("⚠️ [YOLO 워커] 큐 과부하 → 이번 프레임 스킵")
+    found = _state_for(car_no)
+    if found is None:
+        # 도착 처리 후 늦게 온 프레임
+        YOLO_FRAMES_DROPPED.labels("released").inc()
+        frame.release()
         return
+    state, worker = found
+    YOLO_CAR_FRAMES.labels(car_no).inc()
 
     lat, lng = _last_gps.get(car_no, (None, None))
-    try:
-        _frame_queue.put_nowait((car_no, frame_b64, lat, lng))
-    except queue.Full:
-        print("⚠️ [YOLO 워커] frame_queue 가 가득참 → 프레임 드롭")
+    stale = worker.put(car_no, state, frame, lat, lng)
+    if stale is not None:
+        # 워커가 꺼내 가기 전에 새 프레임이 옴 → 옛 프레임은 디코드 없이 버림
+        YOLO_FRAMES_DROPPED.labels("stale").inc()
+        YOLO_CAR_FRAMES_STALE.labels(car_no).inc()
+        stale.release()
 
 
 def start_yolo_worker():
     """
-    모듈 import 시 한 번만 불러서 워커 스레드 시작
+    모듈 import 시 한 번만 불러서 워커 스레드 시작 (YOLO_WORKERS 개, 워커마다 모델 로드)
     """
-    global _worker_started, _worker_thread
+    global _worker_started
     if _worker_started:
         return
 
-    _worker_thread = threading.Thread(target=_worker_loop, daemon=True)
-    _worker_thread.start()
+    for worker in _workers:
+        loaded = load_model(
+            MODEL_PATH, BACKEND, IMGSZ, Config.YOLO_INT8, Config.YOLO_INT8_DATA or None, DEVICE
+        )
+        worker.model, worker.predict_kwargs = loaded.model, loaded.predict_kwargs
+        logger.info("🧠 YOLO 워커 %d 모델: %s (%s)", worker.index, loaded.path, loaded.backend)
+        worker.thread = threading.Thread(
+            target=_worker_loop, args=(worker,), name=f"yolo-{worker.index}", daemon=True
+        )
+        worker.thread.start()
     _worker_started = True
-    print("🧠 YOLO 워커 스레드 시작됨")
+    logger.info("🧠 YOLO 워커 스레드 시작됨 (%d개)", N_WORKERS)
 
 
 # ---------- 내부 유틸: IoU 기반 기존 트랙 매칭 ----------
 
 
 def _find_match_key_for_new_box(
-    car_no: str,
+    state: _CarState,
     x1: int,
     y1: int,
     x2: int,
     y2: int,
     iou_thresh: float = 0.5,
-) -> tuple[str, int] | None:
+) -> int | None:
     """
-    새 박스가 들어왔을 때, 같은 차량(car_no)에 대해
-    이전 bbox들과 IoU를 비교해서 충분히 겹치는 트랙이 있으면 그 key를 반환.
+    새 박스가 들어왔을 때, 같은 차량(state)의
+    이전 bbox들과 IoU를 비교해서 충분히 겹치는 트랙이 있으면 그 트랙 ID를 반환.
     없으면 None.
     """
     best_key = None
     best_iou = 0.0
 
-    for (c, tid), (ox1, oy1, ox2, oy2) in _last_bbox.items():
-        if c != car_no:
-            continue
-
+    for tid, (ox1, oy1, ox2, oy2) in state.last_bbox.items():
         # 교집합
         inter_x1 = max(x1, ox1)
         inter_y1 = max(y1, oy1)
@@ -223,335 +410,407 @@ def _find_match_key_for_new_box(
         iou = inter_area / union_area
         if iou > iou_thresh and iou > best_iou:
             best_iou = iou
-            best_key = (c, tid)
+            best_key = tid
 
     return best_key
 
 
+# ---------- 마이크로 배치 ----------
+
+
+class _BatchItem(NamedTuple):
+    car_no: str
+    state: _CarState       # 이 프레임을 넣을 차량별 tracker / 신고 상태
+    image: np.ndarray      # HUD 를 그린 BGR 프레임 (추론 입력 + 신고 이미지)
+    received_at: float     # WS 수신 시각 (time.time) → 지연 측정용
+    now: float             # 처리 시각 (중앙 유지 시간 계산용)
+
+
+def _collect_batch(worker: _InferenceWorker) -> list:
+    """
+    우편함에 프레임이 생길 때까지 대기 → 대기 순서대로 차량당 1장씩 최대 YOLO_BATCH_SIZE 장 꺼냄
+    담당 차량 중 아직 프레임이 안 온 차량이 있으면 YOLO_BATCH_WAIT_MS 까지만 더 기다려 배치를 채움
+    (차량이 1대뿐이면 기다리지 않음)
+    """
+    with worker.cond:
+        while not worker.mailbox:
+            worker.cond.wait()
+
+        with _state_lock:
+            n_cars = sum(1 for i in _car_worker.values() if i == worker.index)
+        want = min(BATCH_SIZE, n_cars)
+        deadline = time.perf_counter() + BATCH_WAIT_MS / 1000.0
+        while len(worker.mailbox) < want:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            worker.cond.wait(remaining)
+
+        cars = list(worker.mailbox)[:BATCH_SIZE]
+        return [(car_no, *worker.mailbox.pop(car_no)) for car_no in cars]
+
+
+def _prepare(car_no: str, state: _CarState, shared: Frame, lat, lng) -> _BatchItem | None:
+    """공유 Frame → HUD(시간 + GPS) 그린 복사본 (공유 참조는 여기서 반납)"""
+    try:
+        # VideoRecorder 가 먼저 디코드했으면 그 결과 재사용
+        frame = shared.image()
+        if frame is None:
+            logger.warning("[YOLO 워커] ⚠️ frame decode 실패")
+            YOLO_FRAMES_DROPPED.labels("decode").inc()
+            return None
+        # HUD 를 그려야 하므로 복사본 사용 (공유 버퍼는 읽기 전용)
+        raw_frame = frame.copy()
+        received_at = shared.received_at
+    finally:
+        shared.release()
+
+    # HUD (시간 + GPS)
+    time_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if lat is not None and lng is not None:
+        gps_text = f"GPS: {lat:.6f}, {lng:.6f}"
+    else:
+        gps_text = "GPS: -"
+
+    cv2.putText(
+        raw_frame,
+        time_text,
+        (10, 40),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.1,
+        (255, 255, 0),
+        3,
+    )
+    cv2.putText(
+        raw_frame,
+        gps_text,
+        (10, 90),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1.1,
+        (255, 255, 0),
+        3,
+    )
+    return _BatchItem(car_no, state, raw_frame, received_at, time.time())
+
+
+def _track(state: _CarState, result):
+    """
+    배치 검출 결과 1장 → 이 차량 tracker 로 트랙 ID 부여
+    (ultralytics model.track 의 후처리와 같은 방식, tracker 만 차량별)
+    """
+    det = result.boxes.cpu().numpy()
+    tracks = state.tracker.update(det, result.orig_img)
+    if len(tracks) == 0:
+        return result
+    idx = tracks[:, -1].astype(int)
+    result = result[idx]
+    result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+    return result
+
+
 # ---------- 내부 워커 루프 ----------
 
 
-def _worker_loop():
+def _worker_loop(worker: _InferenceWorker):
     os.makedirs(IMAGE_DIR, exist_ok=True)
-    print("yolo 확인 (worker loop 시작)")
+    logger.info(
+        "yolo 확인 (worker %d loop 시작, batch=%d, wait=%.0fms, tracker=%s)",
+        worker.index, BATCH_SIZE, BATCH_WAIT_MS, TRACKER_CFG,
+    )
 
     while True:
         try:
-            car_no, frame_b64, lat, lng = _frame_queue.get()
+            items = _collect_batch(worker)
+
+            batch = []
+            for car_no, state, shared, lat, lng in items:
+                item = _prepare(car_no, state, shared, lat, lng)
+                if item is not None:
+                    batch.append(item)
+
+            if batch:
+                # YOLO 검출 (여러 차량 프레임을 한 번의 forward 로)
+                t_infer = time.perf_counter()
+                results = worker.model.predict(
+                    [item.image for item in batch],
+                    conf=TRACK_CONF,
+                    verbose=False,
+                    **worker.predict_kwargs,
+                )
+                YOLO_INFERENCE_SECONDS.time_since(t_infer)
+                YOLO_BATCH_FRAMES.observe(len(batch))
+                _count_inference(len(batch))
+
+                done_at = time.time()
+                for item, result in zip(batch, results):
+                    YOLO_FRAME_LATENCY_SECONDS.observe(done_at - item.received_at)
+                    try:
+                        # 추적은 차량별 tracker 로 (배치 안 순서 = 차량별 도착 순서)
+                        result = _track(item.state, result)
+                        _handle_detections(item, result)
+                        _publish_debug_frame(item, result)
+                    except Exception as e:
+                        logger.error("❌ [YOLO 워커] 처리 중 오류 (car=%s): %s", item.car_no, e)
 
-            # 종료 신호
-            if frame_b64 is None:
-                print("🧠 YOLO 워커 종료")
-                _frame_queue.task_done()
-                break
+        except Exception as e:
+            logger.error("❌ [YOLO 워커] 처리 중 오류: %s", e)
 
-            # base64 → numpy
-            try:
-                if isinstance(frame_b64, str) and frame_b64.startswith("data:"):
-                    frame_b64 = frame_b64.split(",", 1)[1]
-
-                jpg_bytes = base64.b64decode(frame_b64)
-                jpg_arr = np.frombuffer(jpg_bytes, dtype=np.uint8)
-                frame = cv2.imdecode(jpg_arr, cv2.IMREAD_COLOR)
-                if frame is None:
-                    print("[YOLO 워커] ⚠️ frame decode 실패")
-                    _frame_queue.task_done()
-                    continue
-            except Exception as e:
-                print("[YOLO 워커] ⚠️ base64 디코드 실패:", e)
-                _frame_queue.task_done()
-                continue
 
-            raw_frame = frame.copy()
-            h, w, _ = frame.shape
-            now = time.time()
+# ---------- 신고 로직 ----------
 
-            # HUD (시간 + GPS)
-            time_text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            if lat is not None and lng is not None:
-                gps_text = f"GPS: {lat:.6f}, {lng:.6f}"
-            else:
-                gps_text = "GPS: -"
 
-            cv2.putText(
-                raw_frame,
-                time_text,
-                (10, 40),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.1,
-                (255, 255, 0),
-                3,
-            )
-            cv2.putText(
-                raw_frame,
-                gps_text,
-                (10, 90),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1.1,
-                (255, 255, 0),
-                3,
-            )
+def _handle_detections(item: _BatchItem, results):
+    car_no, state, raw_frame, now = item.car_no, item.state, item.image, item.now
+    h, w = raw_frame.shape[:2]
 
-            # YOLO 추적
-            results = _model.track(
-                raw_frame,
-                persist=True,
-                verbose=False,
-                device=DEVICE,
-            )[0]
-
-            # ---------- 신고 로직 ----------
-            if results.boxes is not None:
-                for box in results.boxes:
-                    if box.id is None:
-                        continue
-
-                    track_id = int(box.id[0])
-                    conf = float(box.conf[0])
-
-                    # 🔽 confidence 기준 이하 박스 무시
-                    if conf < CONF_THRESHOLD:
-                        continue
-
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                    # 🔽 bbox 크기 필터 (너무 작은 건 무시)
-                    w_box = x2 - x1
-                    h_box = y2 - y1
-                    if w_box < MIN_W or h_box < MIN_H:
-                        # 필요하면 아래 주석 풀어서 디버깅 로그 사용
-                        # print(f"[YOLO 워커] 작은 bbox 무시 w={w_box}, h={h_box}, id={track_id}")
-                        continue
-
-                    cx = (x1 + x2) / 2
-                    cx_norm = cx / w
-                    is_center = CENTER_MIN < cx_norm < CENTER_MAX
-
-                    key = (car_no, track_id)
-
-                    # 🔗 새 트랙인데, 이전 박스와 많이 겹치면 상태 이어받기
-                    if key not in _in_center_time:
-                        match_key = _find_match_key_for_new_box(
-                            car_no, x1, y1, x2, y2, iou_thresh=0.5
-                        )
+    if results.boxes is None:
+        return
 
-                        if match_key is not None:
-                            # 이전 키의 상태를 새 키로 옮기기
-                            _in_center_time[key] = _in_center_time.pop(match_key, 0.0)
-                            _best_score[key] = _best_score.pop(match_key, 0.0)
-                            if match_key in _best_frame:
-                                _best_frame[key] = _best_frame.pop(match_key)
-                            _last_timestamp[key] = _last_timestamp.pop(match_key, now)
-                            _last_bbox[key] = (x1, y1, x2, y2)
-
-                            if match_key in _saved_ids:
-                                _saved_ids.add(key)
-                                _saved_ids.discard(match_key)
-
-                            print(
-                                f"[YOLO 워커] 🔗 ID 머지: {match_key} → {key} (IoU 기반)"
-                            )
-                        else:
-                            # 완전히 새로운 트랙
-                            _in_center_time[key] = 0.0
-                            _best_score[key] = 0.0
-                            _last_timestamp[key] = now
-                            _last_bbox[key] = (x1, y1, x2, y2)
-                    else:
-                        # 기존 트랙이면 bbox/타임스탬프 업데이트
-                        _last_bbox[key] = (x1, y1, x2, y2)
+    for box in results.boxes:
+        if box.id is None:
+            continue
 
-                    print(
-                        f"[YOLO 워커] 감지 car={car_no}, track_id={track_id}, "
-                        f"conf={conf:.2f}, center={is_center}, "
-                        f"bbox=({x1},{y1},{x2},{y2}), size=({w_box}x{h_box})"
-                    )
+        track_id = int(box.id[0])
+        conf = float(box.conf[0])
+
+        # 🔽 confidence 기준 이하 박스 무시
+        if conf < CONF_THRESHOLD:
+            continue
+
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+
+        # 🔽 bbox 크기 필터 (너무 작은 건 무시)
+        w_box = x2 - x1
+        h_box = y2 - y1
+        if w_box < MIN_W or h_box < MIN_H:
+            # 필요하면 아래 주석 풀어서 디버깅 로그 사용
+            # print(f"[YOLO 워커] 작은 bbox 무시 w={w_box}, h={h_box}, id={track_id}")
+            continue
+
+        cx = (x1 + x2) / 2
+        cx_norm = cx / w
+        is_center = CENTER_MIN < cx_norm < CENTER_MAX
+
+        key = track_id
+
+        # 🔗 새 트랙인데, 이전 박스와 많이 겹치면 상태 이어받기
+        if key not in state.in_center_time:
+            match_key = _find_match_key_for_new_box(
+                state, x1, y1, x2, y2, iou_thresh=0.5
+            )
 
-                    if is_center:
-                        _in_center_time[key] += now - _last_timestamp.get(key, now)
-
-                        # 품질(신뢰도) 가장 좋은 프레임 저장
-                        if conf > _best_score.get(key, 0.0):
-                            _best_score[key] = conf
-                            _best_frame[key] = raw_frame.copy()
-                            _last_bbox[key] = (x1, y1, x2, y2)
-
-                        # 10초 이상 중앙 유지 + 아직 저장 안 했으면
-                        if _in_center_time[key] >= 10 and key not in _saved_ids:
-                            if key not in _best_frame:
-                                print(
-                                    f"[YOLO 워커] ⚠️ best_frame 없음 → 저장 스킵 (key={key})"
-                                )
-                            else:
-                                save_img = _best_frame[key].copy()
-                                bx1, by1, bx2, by2 = _last_bbox[key]
-
-                                cv2.rectangle(
-                                    save_img,
-                                    (bx1, by1),
-                                    (bx2, by2),
-                                    (0, 0, 255),
-                                    4,
-                                )
-
-                                # 해상도 줄이기
-                                try:
-                                    save_img_resized = cv2.resize(
-                                        save_img, (SAVE_W, SAVE_H)
-                                    )
-                                except Exception as e:
-                                    print("[YOLO 워커] ⚠️ resize 실패:", e)
-                                    save_img_resized = save_img
-
-                                safe_car_no = normalize_car_no(car_no)
-
-                                # 🔹 출동 시작 시각 기준으로 파일명 구성
-                                start_ts = _car_start_ts.get(car_no)
-                                if start_ts is None:
-                                    # 혹시 set_run_start_time을 안 부른 경우 fallback
-                                    start_ts = datetime.now().strftime(
-                                        "%Y%m%d_%H%M%S"
-                                    )
-
-                                # ➜ images/{safe_car}_track{ID}_{start_ts}.jpg
-                                filename = (
-                                    f"{safe_car_no}_track{track_id}_{start_ts}.jpg"
-                                )
-                                s3_key = f"{S3_IMAGE_PREFIX}/{filename}"
-
-                                # 메모리에서 바로 JPEG 인코딩 → S3 업로드
-                                ok, buf = cv2.imencode(
-                                    ".jpg",
-                                    save_img_resized,
-                                    [
-                                        int(cv2.IMWRITE_JPEG_QUALITY),
-                                        JPEG_QUALITY,
-                                    ],
-                                )
-                                if not ok:
-                                    print(
-                                        "❌ [YOLO 워커] JPEG 인코딩 실패 → 업로드 스킵"
-                                    )
-                                else:
-                                    img_bytes = buf.tobytes()
-                                    _upload_bytes_to_s3_with_retry(
-                                        img_bytes,
-                                        s3_key,
-                                        "image/jpeg",
-                                    )
-
-                                _saved_ids.add(key)
-                                _in_center_time[key] = 0.0
-                                _best_score[key] = 0.0
-
-                    _last_timestamp[key] = now
-
-            _frame_queue.task_done()
-
-            # ---------- 디버그 프레임 만들기 ----------
-            debug_frame = raw_frame.copy()
-
-            # 🔶 중앙 ROI 구간(40%~60%)을 주황색 세로선으로 시각화
-            x_left = int(CENTER_MIN * w)
-            x_right = int(CENTER_MAX * w)
-            cv2.line(debug_frame, (x_left, 0), (x_left, h), (0, 165, 255), 2)
-            cv2.line(debug_frame, (x_right, 0), (x_right, h), (0, 165, 255), 2)
-
-            if results.boxes is not None:
-                for box in results.boxes:
-                    if box.id is None:
-                        continue
-
-                    track_id = int(box.id[0])
-                    conf = float(box.conf[0])
-
-                    # 디버깅도 신고와 동일하게 conf 필터 적용
-                    if conf < CONF_THRESHOLD:
-                        continue
-
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                    # 🔽 bbox 크기 필터 (신고와 동일)
-                    w_box = x2 - x1
-                    h_box = y2 - y1
-                    if w_box < MIN_W or h_box < MIN_H:
-                        continue
-
-                    cx = (x1 + x2) / 2.0
-                    cy = (y1 + y2) / 2.0
-                    cx_norm = cx / w
-                    is_center = CENTER_MIN < cx_norm < CENTER_MAX
-                    color = (0, 255, 0) if is_center else (0, 0, 255)
-
-                    key = (car_no, track_id)
-                    center_time = _in_center_time.get(key, 0.0)
-
-                    # bbox 그리기
-                    cv2.rectangle(debug_frame, (x1, y1), (x2, y2), color, 2)
-
-                    # 🔴 bbox 중앙 빨간 점
-                    cv2.circle(
-                        debug_frame,
-                        (int(cx), int(cy)),
-                        5,
+            if match_key is not None:
+                # 이전 키의 상태를 새 키로 옮기기
+                state.in_center_time[key] = state.in_center_time.pop(match_key, 0.0)
+                state.best_score[key] = state.best_score.pop(match_key, 0.0)
+                if match_key in state.best_frame:
+                    state.best_frame[key] = state.best_frame.pop(match_key)
+                state.last_timestamp[key] = state.last_timestamp.pop(match_key, now)
+                state.last_bbox[key] = (x1, y1, x2, y2)
+
+                if match_key in state.saved_ids:
+                    state.saved_ids.add(key)
+                    state.saved_ids.discard(match_key)
+
+                logger.debug(
+                    "[YOLO 워커] 🔗 ID 머지: %s → %s (IoU 기반)", match_key, key
+                )
+            else:
+                # 완전히 새로운 트랙
+                state.in_center_time[key] = 0.0
+                state.best_score[key] = 0.0
+                state.last_timestamp[key] = now
+                state.last_bbox[key] = (x1, y1, x2, y2)
+        else:
+            # 기존 트랙이면 bbox/타임스탬프 업데이트
+            state.last_bbox[key] = (x1, y1, x2, y2)
+
+        logger.debug(
+            "[YOLO 워커] 감지 car=%s, track_id=%s, conf=%.2f, center=%s, "
+            "bbox=(%d,%d,%d,%d), size=(%dx%d)",
+            car_no, track_id, conf, is_center,
+            x1, y1, x2, y2, w_box, h_box,
+        )
+
+        if is_center:
+            state.in_center_time[key] += now - state.last_timestamp.get(key, now)
+
+            # 품질(신뢰도) 가장 좋은 프레임 저장
+            if conf > state.best_score.get(key, 0.0):
+                state.best_score[key] = conf
+                state.best_frame[key] = raw_frame.copy()
+                state.last_bbox[key] = (x1, y1, x2, y2)
+
+            # 10초 이상 중앙 유지 + 아직 저장 안 했으면
+            if state.in_center_time[key] >= 10 and key not in state.saved_ids:
+                if key not in state.best_frame:
+                    logger.warning(
+                        "[YOLO 워커] ⚠️ best_frame 없음 → 저장 스킵 (key=%s)", key
+                    )
+                else:
+                    save_img = state.best_frame[key].copy()
+                    bx1, by1, bx2, by2 = state.last_bbox[key]
+
+                    cv2.rectangle(
+                        save_img,
+                        (bx1, by1),
+                        (bx2, by2),
                         (0, 0, 255),
-                        -1,
+                        4,
                     )
 
-                    # 라벨: ID / conf / 중앙 카운트 시간 + bbox 크기
-                    label = (
-                        f"ID:{track_id} {conf:.2f} "
-                        f"t:{center_time:.1f}s "
-                        f"{w_box}x{h_box}"
+                    # 해상도 줄이기
+                    try:
+                        save_img_resized = cv2.resize(
+                            save_img, (SAVE_W, SAVE_H)
+                        )
+                    except Exception as e:
+                        logger.warning("[YOLO 워커] ⚠️ resize 실패: %s", e)
+                        save_img_resized = save_img
+
+                    safe_car_no = normalize_car_no(car_no)
+
+                    # 🔹 출동 시작 시각 기준으로 파일명 구성
+                    start_ts = state.start_ts
+                    if start_ts is None:
+                        # 혹시 set_run_start_time을 안 부른 경우 fallback
+                        start_ts = datetime.now().strftime(
+                            "%Y%m%d_%H%M%S"
+                        )
+
+                    # ➜ images/{safe_car}_track{ID}_{start_ts}.jpg
+                    filename = (
+                        f"{safe_car_no}_track{track_id}_{start_ts}.jpg"
                     )
-                    cv2.putText(
-                        debug_frame,
-                        label,
-                        (x1, max(0, y1 - 10)),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6,
-                        (255, 255, 255),
-                        2,
+                    s3_key = f"{S3_IMAGE_PREFIX}/{filename}"
+
+                    # 메모리에서 바로 JPEG 인코딩 → S3 업로드
+                    ok, buf = cv2.imencode(
+                        ".jpg",
+                        save_img_resized,
+                        [
+                            int(cv2.IMWRITE_JPEG_QUALITY),
+                            JPEG_QUALITY,
+                        ],
                     )
+                    if not ok:
+                        logger.error(
+                            "❌ [YOLO 워커] JPEG 인코딩 실패 → 업로드 스킵"
+                        )
+                    else:
+                        img_bytes = buf.tobytes()
+                        _upload_bytes_to_s3_with_retry(
+                            img_bytes,
+                            s3_key,
+                            "image/jpeg",
+                        )
 
-            # 신호된 차량 ID 목록 표시
-            reported_ids = [tid for (car_, tid) in _saved_ids if car_ == car_no]
-
-            y_offset = h - 30
-            if reported_ids:
-                text = f"REPORTED: {', '.join(map(str, reported_ids))}"
-                cv2.putText(
-                    debug_frame,
-                    text,
-                    (20, y_offset),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    1.0,
-                    (0, 255, 255),
-                    3,
-                )
+                    state.saved_ids.add(key)
+                    state.in_center_time[key] = 0.0
+                    state.best_score[key] = 0.0
+
+        state.last_timestamp[key] = now
+
+
+# ---------- 디버그 프레임 (yolo_debug) ----------
 
-            # 🔻 JPEG 인코딩 + WebSocket 송출
-            ok, buf = cv2.imencode(
-                ".jpg", debug_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70]
+
+def _publish_debug_frame(item: _BatchItem, results):
+    car_no, raw_frame = item.car_no, item.image
+    h, w = raw_frame.shape[:2]
+
+    # 디버그 페이지 시청자가 없거나 티어별 fps 간격이 안 됐으면 디버그 프레임 생성/인코딩 생략
+    # (순환 import 피하려고 함수 안에서 import)
+    from sockets.ws_server import active_frame_tiers, broadcast_frame_from_thread
+
+    debug_tiers = active_frame_tiers("yolo_debug", car_no)
+    if not debug_tiers:
+        return
+
+    # ---------- 디버그 프레임 만들기 ----------
+    debug_frame = raw_frame.copy()
+
+    # 🔶 중앙 ROI 구간(40%~60%)을 주황색 세로선으로 시각화
+    x_left = int(CENTER_MIN * w)
+    x_right = int(CENTER_MAX * w)
+    cv2.line(debug_frame, (x_left, 0), (x_left, h), (0, 165, 255), 2)
+    cv2.line(debug_frame, (x_right, 0), (x_right, h), (0, 165, 255), 2)
+
+    if results.boxes is not None:
+        for box in results.boxes:
+            if box.id is None:
+                continue
+
+            track_id = int(box.id[0])
+            conf = float(box.conf[0])
+
+            # 디버깅도 신고와 동일하게 conf 필터 적용
+            if conf < CONF_THRESHOLD:
+                continue
+
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+
+            # 🔽 bbox 크기 필터 (신고와 동일)
+            w_box = x2 - x1
+            h_box = y2 - y1
+            if w_box < MIN_W or h_box < MIN_H:
+                continue
+
+            cx = (x1 + x2) / 2.0
+            cy = (y1 + y2) / 2.0
+            cx_norm = cx / w
+            is_center = CENTER_MIN < cx_norm < CENTER_MAX
+            color = (0, 255, 0) if is_center else (0, 0, 255)
+
+            center_time = item.state.in_center_time.get(track_id, 0.0)
+
+            # bbox 그리기
+            cv2.rectangle(debug_frame, (x1, y1), (x2, y2), color, 2)
+
+            # 🔴 bbox 중앙 빨간 점
+            cv2.circle(
+                debug_frame,
+                (int(cx), int(cy)),
+                5,
+                (0, 0, 255),
+                -1,
             )
-            if not ok:
-                print("⚠️ YOLO 디버그 JPEG 인코딩 실패")
-            else:
-                debug_b64 = base64.b64encode(buf).decode("utf-8")
-                try:
-                    # 순환 import 피하려고 함수 안에서 import
-                    from sockets.ws_server import broadcast_from_thread
-
-                    broadcast_from_thread(
-                        {
-                            "event": "yolo_debug",
-                            "car": car_no,
-                            "frame": debug_b64,
-                        }
-                    )
-                except Exception as e:
-                    print("⚠️ YOLO 디버그 프레임 송출 실패:", e)
-            # 🔺 여기까지 디버그 송출
 
-        except Exception as e:
-            print("❌ [YOLO 워커] 처리 중 오류:", e)
+            # 라벨: ID / conf / 중앙 카운트 시간 + bbox 크기
+            label = (
+                f"ID:{track_id} {conf:.2f} "
+                f"t:{center_time:.1f}s "
+                f"{w_box}x{h_box}"
+            )
+            cv2.putText(
+                debug_frame,
+                label,
+                (x1, max(0, y1 - 10)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (255, 255, 255),
+                2,
+            )
+
+    # 신호된 차량 ID 목록 표시
+    reported_ids = sorted(item.state.saved_ids)
+
+    y_offset = h - 30
+    if reported_ids:
+        text = f"REPORTED: {', '.join(map(str, reported_ids))}"
+        cv2.putText(
+            debug_frame,
+            text,
+            (20, y_offset),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1.0,
+            (0, 255, 255),
+            3,
+        )
+
+    # 🔻 티어별 축소 + JPEG 인코딩 + WebSocket 송출
+    try:
+        broadcast_frame_from_thread("yolo_debug", car_no, debug_frame, debug_tiers)
+    except Exception as e:
+        logger.warning("⚠️ YOLO 디버그 프레임 송출 실패: %s", e)
+    # 🔺 여기까지 디버그 송출